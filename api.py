@@ -1,59 +1,59 @@
 import os
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable
+from urllib.parse import urlencode
 import asyncio
 from dotenv import load_dotenv
-from utils import make_api_request
+import config
+import logs
+from archive import (FIELD_LABELS, NUMERIC_FIELDS, PRODUCT_ULTRA_SRT, PRODUCT_ULTRA_SRT_NCST, PRODUCT_VILAGE,
+                     PRODUCTS, ForecastArchive)
+from cache import ForecastCache, HotCellTracker, ultra_srt_issuance, ultra_srt_ncst_issuance, vilage_issuance
+from decoder import (ULTRA_SRT_COLUMNS, ItemDecoder, decode_items, decode_observations, deg_to_dir, rain_type_code,
+                     sky_code)
+from forecast_table import limit_hours, render_compact, time_label, validate_fields
+from metrics import mark_stale, metrics
+from region_summary import summarize
+from shared_cache import SharedForecastStore
+from timeline import SOURCE_LABELS, merge_timeline
+from utils import gather_limited, request_json, stream_items
 
 load_dotenv()
 
-USER_AGENT = "weather-app/1.0"
-
-# 风向映射（中文）
-wind_direction_cn = {
-    'N': '北',
-    'NNE': '东北偏北',
-    'NE': '东北',
-    'ENE': '东偏北',
-    'E': '东',
-    'ESE': '东偏南',
-    'SE': '东南',
-    'SSE': '西南偏南',
-    'S': '南',
-    'SSW': '西南偏南',
-    'SW': '西南',
-    'WSW': '西偏南',
-    'W': '西',
-    'WNW': '西偏北',
-    'NW': '西北',
-    'NNW': '北偏西'
-}
-
-# 度数到风向代码映射
-deg_code = {
-    0: 'N', 360: 'N', 180: 'S', 270: 'W', 90: 'E',
-    22.5: 'NNE', 45: 'NE', 67.5: 'ENE',
-    112.5: 'ESE', 135: 'SE', 157.5: 'SSE',
-    202.5: 'SSW', 225: 'SW', 247.5: 'WSW',
-    292.5: 'WNW', 315: 'NW', 337.5: 'NNW'
-}
-
-# 天气状态代码映射
-sky_code = {
-    1: '晴',
-    3: '多云',
-    4: '阴'
-}
-
-# 降水类型代码映射
-rain_type_code = {
-    0: '无降水',
-    1: '雨',
-    2: '雨夹雪',
-    3: '雪',
-    5: '毛毛雨',
-    6: '冻雨',
-    7: '阵雪'
-}
+logger = logs.get_logger("api")
+
+# 超短期预报缓存：按 (nx, ny, 发布时次) 缓存，下一时次发布后失效
+forecast_cache = ForecastCache(
+    config.FORECAST_CACHE_MAX_ENTRIES,
+    shared=SharedForecastStore(config.SHARED_CACHE_PATH) if config.SHARED_CACHE_PATH else None,
+)
+
+# 每个网格最近一次成功获取的预报，上游不可用时作为过期数据返回
+last_good_forecasts = ForecastCache(config.FORECAST_CACHE_MAX_ENTRIES)
+
+# 预报归档：上游返回的每个发布时次解码后追加写入，由服务器生命周期定期批量落盘
+forecast_archive = ForecastArchive(
+    config.ARCHIVE_PATH or Path(__file__).parent.parent / "data" / "forecast_archive.db",
+    batch_rows=config.ARCHIVE_BATCH_ROWS,
+    flush_interval=config.ARCHIVE_FLUSH_INTERVAL,
+) if config.ARCHIVE_ENABLED else None
+
+# 缓存与归档自带的统计在读取指标时并入
+metrics.register_collector("forecast_cache", forecast_cache.stats)
+if forecast_archive is not None:
+    metrics.register_collector("archive", forecast_archive.stats)
+
+# 解码与渲染耗时（指标对象只解析一次，热点路径上直接记录）
+_decode_seconds = {product: metrics.histogram("forecast_decode_seconds", product=product) for product in PRODUCTS}
+_render_seconds = {style: metrics.histogram("forecast_render_seconds", style=style) for style in ("text", "compact")}
+_stale_forecasts = metrics.counter("stale_forecasts_total")
+
+# 最近一次短期预报响应的 totalCount，用于预估需要与首页同时请求的页数
+_vilage_total_hint = config.VILAGE_EXPECTED_ROWS
+
+# 网格请求频次统计，供后台预热挑选热点网格
+hot_cells = HotCellTracker()
 
 
 def format_weather_features(features: dict) -> str:
@@ -66,8 +66,16 @@ def format_weather_features(features: dict) -> str:
             formatted_features.append(f"降水类型: {value}")
         elif key == 'rain_amount':
             formatted_features.append(f"降水量: {value}mm")
+        elif key == 'snow':
+            formatted_features.append(f"新积雪: {value}")
+        elif key == 'pop':
+            formatted_features.append(f"降水概率: {value}%")
         elif key == 'temp':
             formatted_features.append(f"气温: {value}℃")
+        elif key == 'temp_min':
+            formatted_features.append(f"最低气温: {value}℃")
+        elif key == 'temp_max':
+            formatted_features.append(f"最高气温: {value}℃")
         elif key == 'humidity':
             formatted_features.append(f"湿度: {value}%")
         elif key == 'wind_direction':
@@ -77,145 +85,531 @@ def format_weather_features(features: dict) -> str:
     return "\n".join(formatted_features)
 
 
-def deg_to_dir(deg):
-    """将风向角度转换为方向名称"""
-    close_dir = ''
-    min_abs = 360
-    if deg not in deg_code.keys():
-        for key in deg_code.keys():
-            if abs(key - deg) < min_abs:
-                min_abs = abs(key - deg)
-                close_dir = deg_code[key]
-    else:
-        close_dir = deg_code[deg]
-    return wind_direction_cn[close_dir]
+def build_request_url(endpoint: str, service_key: str, **params) -> str:
+    """以 config.DEFAULT_REQUEST_PARAMS 为基础拼接上游请求 URL"""
+    query = urlencode({**config.DEFAULT_REQUEST_PARAMS, **params})
+    # serviceKey 通常已是 URL 编码后的形式，直接拼接以免二次编码
+    return f"{endpoint}?serviceKey={service_key}&{query}"
 
 
-async def get_forecast_api(province: str, city: str, district: str, nx: float, ny: float) -> str:
-    """获取指定地区的天气预报"""
-    try:
-        serviceKey = os.environ.get("CN_WEATHER_API_KEY")
-        if not serviceKey:
-            raise ValueError("CN_WEATHER_API_KEY 环境变量未设置")
+def _require_service_key() -> str:
+    """返回上游服务密钥，未设置时抛出 ValueError"""
+    service_key = os.environ.get("CN_WEATHER_API_KEY")
+    if not service_key:
+        raise ValueError("CN_WEATHER_API_KEY 环境变量未设置")
+    return service_key
+
+
+def _response_body(data: dict | None) -> dict:
+    """校验上游响应的 response -> body 结构并返回 body"""
+    if not data:
+        raise ValueError("API 请求返回为空")
+
+    if 'response' not in data:
+        raise KeyError("API 响应中缺少 'response' 字段")
+
+    if 'body' not in data['response']:
+        raise KeyError("API 响应中缺少 'body' 字段")
 
-        # 获取当前时间并格式化为API需要的日期和时间
-        base_date = datetime.now().strftime("%Y%m%d")  # 发布日期
-        base_time = datetime.now().strftime("%H%M")  # 发布时间
+    return data['response']['body']
 
-        # 计算输入时间（当前时间减去一小时）
-        input_d = datetime.strptime(base_date + base_time, "%Y%m%d%H%M") - timedelta(hours=1)
-        input_datetime = datetime.strftime(input_d, "%Y%m%d%H%M")
-        input_date = input_datetime[:8]
-        input_time = input_datetime[8:]
 
+def _extract_items(data: dict | None) -> list:
+    """校验上游响应的 response -> body -> items -> item 结构并返回条目列表"""
+    body = _response_body(data)
+    if 'items' not in body:
+        raise KeyError("API 响应中缺少 'items' 字段")
+
+    if 'item' not in body['items']:
+        raise KeyError("API 响应中缺少 'item' 字段")
+
+    return body['items']['item'] or []
+
+
+async def _fetch_cached(key: Hashable, stale_key: Hashable, issued_at: datetime, next_publish: datetime,
+                        fetch: Callable[[], Awaitable[Any]], allow_stale: bool) -> tuple[Any, datetime]:
+    """经缓存获取某个发布时次的数据；上游失败且允许时返回 stale_key 下最近一次成功的数据"""
+    try:
+        value = await forecast_cache.get_or_fetch(key, next_publish.timestamp(), fetch)
+    except Exception as e:
+        stale = last_good_forecasts.get(stale_key) if allow_stale else None
+        if stale is None:
+            raise
+        logger.warning("上游请求失败，返回过期预报", extra={"cache_key": stale_key, "error": str(e)})
+        _stale_forecasts.inc()
+        mark_stale()
+        value, stale_issued_at = stale
+        return value, datetime.fromtimestamp(stale_issued_at)
+
+    if value:
+        last_good_forecasts.set(stale_key, (value, issued_at.timestamp()),
+                                issued_at.timestamp() + config.STALE_FORECAST_MAX_AGE)
+    return value, issued_at
+
+
+async def fetch_ultra_srt_forecast(nx: float, ny: float, track: bool = True,
+                                   allow_stale: bool = True) -> tuple[dict[str, list], datetime]:
+    """获取指定网格当前发布时次的超短期预报，返回按列解码后的数据（带缓存）
+
+    条目只在从上游取得时解码一次，缓存、归档与各调用方共用这份列数据（调用方不应修改）。
+
+    Args:
+        nx: 网格 X 坐标
+        ny: 网格 Y 坐标
+        track: 是否计入热点网格统计（后台预热请求不计入）
+        allow_stale: 上游请求失败时是否返回该网格最近一次成功获取的预报
+
+    Returns:
+        tuple: (各列数据, 发布时次)；返回过期数据时发布时次早于当前时次，可用 is_stale() 判断
+    """
+    serviceKey = _require_service_key()
+
+    if track:
+        hot_cells.record(nx, ny)
+
+    # 对齐到上游实际的发布时次，同一小时内的请求共享缓存键
+    issued_at, next_publish = ultra_srt_issuance()
+    input_date = issued_at.strftime("%Y%m%d")
+    input_time = issued_at.strftime("%H%M")
+
+    async def fetch() -> dict[str, list]:
         # 构建API请求URL
-        url = f"http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getUltraSrtFcst?serviceKey={serviceKey}&numOfRows=60&pageNo=1&dataType=json&base_date={input_date}&base_time={input_time}&nx={nx}&ny={ny}"
+        url = build_request_url(config.WEATHER_API_URL, serviceKey,
+                                base_date=input_date, base_time=input_time, nx=nx, ny=ny)
 
         # 发送API请求
-        data = await make_api_request(url)
+        data = await request_json(url)
 
-        if not data:
-            raise ValueError("API 请求返回为空")
+        columns = decode_forecast(_extract_items(data))
+        if forecast_archive is not None and columns['fcst_time']:
+            forecast_archive.add(PRODUCT_ULTRA_SRT, nx, ny, issued_at, columns)
+        return columns
 
-        if 'response' not in data:
-            raise KeyError("API 响应中缺少 'response' 字段")
+    cell = (int(nx), int(ny))
+    key = (PRODUCT_ULTRA_SRT,) + cell + (input_date + input_time,)
+    return await _fetch_cached(key, (PRODUCT_ULTRA_SRT,) + cell, issued_at, next_publish, fetch, allow_stale)
 
-        if 'body' not in data['response']:
-            raise KeyError("API 响应中缺少 'body' 字段")
 
-        if 'items' not in data['response']['body']:
-            raise KeyError("API 响应中缺少 'items' 字段")
+async def fetch_vilage_forecast(nx: float, ny: float, allow_stale: bool = True) -> tuple[dict[str, list], datetime]:
+    """获取指定网格当前发布时次的短期（3 日）预报，返回按列解码后的数据（带缓存）
 
-        if 'item' not in data['response']['body']['items']:
-            raise KeyError("API 响应中缺少 'item' 字段")
+    按最近一次的 totalCount 预估页数并同时请求各页，首页显示还有更多页时再补请求；
+    每页响应流式解析，条目到达后直接写入列式解码结果，不保留原始 JSON 或条目列表。
 
-        res = data['response']['body']['items']['item']
-        if not res:
-            return [f"{province} {city} {district} 地区的 weather information could not be found."]
+    Args:
+        nx: 网格 X 坐标
+        ny: 网格 Y 坐标
+        allow_stale: 上游请求失败时是否返回该网格最近一次成功获取的预报
 
-        informations = dict()
-        for items in res:
-            try:
-                cate = items['category']
-                fcstTime = items['fcstTime']
-                fcstValue = items['fcstValue']
+    Returns:
+        tuple: (各列数据, 发布时次)
+    """
+    serviceKey = _require_service_key()
+
+    issued_at, next_publish = vilage_issuance()
+    input_date = issued_at.strftime("%Y%m%d")
+    input_time = issued_at.strftime("%H%M")
 
-                if fcstTime not in informations.keys():
-                    informations[fcstTime] = dict()
+    def page_url(page: int) -> str:
+        return build_request_url(config.VILAGE_FCST_API_URL, serviceKey,
+                                 numOfRows=config.VILAGE_PAGE_SIZE, pageNo=page,
+                                 base_date=input_date, base_time=input_time, nx=nx, ny=ny)
 
-                informations[fcstTime][cate] = fcstValue
-            except KeyError as e:
-                print(f"Missing weather data field: {e}")
-                continue
+    async def fetch() -> dict[str, list]:
+        global _vilage_total_hint
+        decoder = ItemDecoder()
+        semaphore = asyncio.Semaphore(config.VILAGE_PAGE_CONCURRENCY)
 
-        if not informations:
-            return [f"无法处理 {province} {city} {district} 地区的天气信息。"]
+        async def fetch_page(page: int) -> dict:
+            async with semaphore:
+                return await stream_items(page_url(page), decoder.feed)
 
-        forecasts = []
-        for key, val in zip(informations.keys(), informations.values()):
-            features = dict()
+        async def fetch_pages(pages: range) -> list[dict]:
+            # 任一页失败时取消其余页：放弃的解码不应再接收条目，也不应继续占用令牌、累计熔断失败
             try:
-                template = f"""{base_date[:4]}年 {base_date[4:6]}月 {base_date[-2:]}日 {key[:2]}时 {key[2:]}分 {province} {city} {district} 地区的天气是 """
-
-                # 天空状态
-                if 'SKY' in val and val['SKY']:
-                    try:
-                        sky_temp = sky_code[int(val['SKY'])]
-                        features['sky'] = sky_temp
-                    except (ValueError, KeyError):
-                        print(f"天空状态代码处理错误: {val['SKY']}")
-
-                # 降水类型
-                if 'PTY' in val and val['PTY']:
-                    try:
-                        pty_temp = rain_type_code[int(val['PTY'])]
-                        features['rain'] = pty_temp
-                        # 如果有降水
-                        if 'RN1' in val and val['RN1'] != '无降水':
-                            rn1_temp = val['RN1']
-                            features['rain_amount'] = rn1_temp
-                    except (ValueError, KeyError):
-                        print(f"降水类型代码处理错误: {val['PTY']}")
-
-                # 气温
-                if 'T1H' in val and val['T1H']:
-                    try:
-                        t1h_temp = float(val['T1H'])
-                        features['temp'] = t1h_temp
-                    except ValueError:
-                        print(f"温度值处理错误: {val['T1H']}")
-
-                # 湿度
-                if 'REH' in val and val['REH']:
-                    try:
-                        reh_temp = float(val['REH'])
-                        features['humidity'] = reh_temp
-                    except ValueError:
-                        print(f"湿度值处理错误: {val['REH']}")
-
-                # 风向/风速
-                if 'VEC' in val and val['VEC'] and 'WSD' in val and val['WSD']:
-                    try:
-                        vec_temp = deg_to_dir(float(val['VEC']))
-                        wsd_temp = val['WSD']
-                        features['wind_direction'] = vec_temp
-                        features['wind_speed'] = wsd_temp
-                    except ValueError:
-                        print(f"风向/风速值处理错误: VEC={val.get('VEC')}, WSD={val.get('WSD')}")
-
-                forecasts.append(template + format_weather_features(features))
-            except Exception as e:
-                print(f"处理天气信息时出错: {e}")
-                continue
-
-        if not forecasts:
-            return f"无法生成 {province} {city} {district} 地区的天气信息"
-
-        return "\n---\n".join(forecasts)
+                async with asyncio.TaskGroup() as group:
+                    tasks = [group.create_task(fetch_page(page)) for page in pages]
+            except ExceptionGroup as e:
+                # 对调用方保持与单页请求相同的异常类型（UpstreamError 等）
+                raise e.exceptions[0]
+            return [task.result() for task in tasks]
+
+        # 超出实际页数的预取页只返回空结果，不影响解码
+        guessed = max(1, -(-_vilage_total_hint // config.VILAGE_PAGE_SIZE))
+        responses = await fetch_pages(range(1, guessed + 1))
+        body = _response_body(responses[0])
+        if 'totalCount' not in body:
+            raise KeyError("API 响应中缺少 'totalCount' 字段")
+
+        total = int(body['totalCount'])
+        _vilage_total_hint = total
+        pages = -(-total // config.VILAGE_PAGE_SIZE)
+        await fetch_pages(range(guessed + 1, pages + 1))
+        with _decode_seconds[PRODUCT_VILAGE].time():
+            columns = decoder.finish().to_columns()
+        if forecast_archive is not None and columns['fcst_time']:
+            forecast_archive.add(PRODUCT_VILAGE, nx, ny, issued_at, columns)
+        return columns
+
+    cell = (int(nx), int(ny))
+    key = ("vilage",) + cell + (input_date + input_time,)
+    return await _fetch_cached(key, ("vilage",) + cell, issued_at, next_publish, fetch, allow_stale)
+
+
+async def fetch_ultra_srt_ncst(nx: float, ny: float, allow_stale: bool = True) -> tuple[dict[str, list], datetime]:
+    """获取指定网格最近一次的超短期实况（当前观测），返回按列解码后的数据（带缓存）
+
+    Args:
+        nx: 网格 X 坐标
+        ny: 网格 Y 坐标
+        allow_stale: 上游请求失败时是否返回该网格最近一次成功获取的实况
+
+    Returns:
+        tuple: (各列数据，通常只有观测时刻一行, 观测时次)
+    """
+    serviceKey = _require_service_key()
+
+    issued_at, next_publish = ultra_srt_ncst_issuance()
+    input_date = issued_at.strftime("%Y%m%d")
+    input_time = issued_at.strftime("%H%M")
+
+    async def fetch() -> dict[str, list]:
+        url = build_request_url(config.ULTRA_SRT_NCST_API_URL, serviceKey,
+                                base_date=input_date, base_time=input_time, nx=nx, ny=ny)
+        data = await request_json(url)
+
+        items = _extract_items(data)
+        return decode_observations(items).to_columns()
+
+    cell = (int(nx), int(ny))
+    key = (PRODUCT_ULTRA_SRT_NCST,) + cell + (input_date + input_time,)
+    return await _fetch_cached(key, (PRODUCT_ULTRA_SRT_NCST,) + cell, issued_at, next_publish, fetch, allow_stale)
+
+
+async def fetch_combined_forecast(nx: float, ny: float) -> tuple[dict[str, list], dict[str, datetime], dict[str, Exception]]:
+    """同时请求超短期实况、超短期预报与短期预报，合并为一条按时间排序的时间线
+
+    三个产品并发获取，总耗时取决于最慢的一个；某个产品失败时用其余产品合并，
+    失败原因单独返回。
+
+    Returns:
+        tuple: (timeline.merge_timeline 格式的各列数据, 产品 -> 发布时次, 产品 -> 异常)
+    """
+
+    fetchers = {
+        PRODUCT_ULTRA_SRT_NCST: fetch_ultra_srt_ncst(nx, ny),
+        PRODUCT_ULTRA_SRT: fetch_ultra_srt_forecast(nx, ny),
+        PRODUCT_VILAGE: fetch_vilage_forecast(nx, ny),
+    }
+    results = await asyncio.gather(*fetchers.values(), return_exceptions=True)
+
+    products, issued, errors = {}, {}, {}
+    for product, result in zip(fetchers, results):
+        if isinstance(result, Exception):
+            errors[product] = result
+        else:
+            products[product], issued[product] = result
+    return merge_timeline(products), issued, errors
+
+
+def is_stale(issued_at: datetime, issuance: Callable = ultra_srt_issuance) -> bool:
+    """判断预报是否早于当前可用的发布时次（即上游不可用时返回的过期数据）
+
+    Args:
+        issued_at: 预报的发布时次
+        issuance: 对应产品的发布时次函数，默认为超短期预报
+    """
+    return issued_at < issuance()[0]
+
+
+def stale_notice(issued_at: datetime) -> str:
+    """过期预报的提示行"""
+    return f"[过期数据] 上游服务暂不可用，以下为 {issued_at:%Y-%m-%d %H:%M} 发布的预报"
+
+
+def decode_forecast(res: list) -> dict[str, list]:
+    """将超短期预报原始条目解码为按列存放的数据
+
+    每个预报时刻占一个下标，各列等长；缺失或无法解析的值为 None。
+
+    Returns:
+        dict: fcst_date, fcst_time, temp, humidity, sky, pty, rn1, wind_vec, wind_speed 各列
+    """
+    with _decode_seconds[PRODUCT_ULTRA_SRT].time():
+        return decode_items(res).to_columns(ULTRA_SRT_COLUMNS)
+
+
+def render_forecast_text(province: str, city: str, district: str, columns: dict[str, list]) -> str:
+    """将按列存放的预报数据渲染为逐小时的文本描述"""
+    with _render_seconds["text"].time():
+        return _render_forecast_text(province, city, district, columns)
+
+
+def render_forecast(province: str, city: str, district: str, columns: dict[str, list], compact: bool = False,
+                    fields: list[str] | None = None, hours: int | None = None, max_chars: int | None = None,
+                    notices: list[str] | tuple = ()) -> str:
+    """按所选方式渲染预报，notices 为置于预报之前的提示行
+
+    Args:
+        compact: 紧凑表格（单个表头，每小时一行），否则为逐小时的完整文本
+        fields: 紧凑表格输出的列，默认为有数据的全部列（见 forecast_table.COMPACT_FIELDS）
+        hours: 只输出首个预报时刻起若干小时内的预报
+        max_chars: 紧凑表格的最大字符数，超出时截去靠后的时刻并注明
+    """
+    if hours is not None:
+        columns = limit_hours(columns, hours)
+    if compact:
+        with _render_seconds["compact"].time():
+            return render_compact(province, city, district, columns, fields, max_chars, notices)
+    return "\n".join([*notices, render_forecast_text(province, city, district, columns)])
+
+
+def _render_forecast_text(province: str, city: str, district: str, columns: dict[str, list]) -> str:
+    # 获取当前日期，预报条目缺少日期时用于输出模板
+    base_date = datetime.now().strftime("%Y%m%d")  # 发布日期
+
+    if not columns['fcst_time']:
+        return f"无法处理 {province} {city} {district} 地区的天气信息。"
+
+    forecasts = []
+    for i, key in enumerate(columns['fcst_time']):
+        date = columns['fcst_date'][i] or base_date
+        template = f"""{date[:4]}年 {date[4:6]}月 {date[-2:]}日 {key[:2]}时 {key[2:]}分 {province} {city} {district} 地区的天气是 """
+        # 合并时间线中标注每行的数据来源（实况 / 超短期预报 / 短期预报）
+        if columns.get('source'):
+            template = f"[{SOURCE_LABELS[columns['source'][i]]}] {template}"
+
+        features = dict()
+        # 天空状态
+        if columns['sky'][i] is not None:
+            features['sky'] = sky_code[columns['sky'][i]]
+
+        # 降水类型
+        if columns['pty'][i] is not None:
+            features['rain'] = rain_type_code[columns['pty'][i]]
+            # 如果有降水
+            if columns['rn1'][i] is not None and columns['rn1'][i] != '无降水':
+                features['rain_amount'] = columns['rn1'][i]
+
+        # 短期预报特有：积雪、降水概率、日最低/最高气温
+        if columns.get('sno') and columns['sno'][i] is not None and columns['sno'][i] != '无积雪':
+            features['snow'] = columns['sno'][i]
+        if columns.get('pop') and columns['pop'][i] is not None:
+            features['pop'] = f"{columns['pop'][i]:g}"
+
+        # 气温
+        if columns['temp'][i] is not None:
+            features['temp'] = columns['temp'][i]
+        if columns.get('tmn') and columns['tmn'][i] is not None:
+            features['temp_min'] = columns['tmn'][i]
+        if columns.get('tmx') and columns['tmx'][i] is not None:
+            features['temp_max'] = columns['tmx'][i]
+
+        # 湿度
+        if columns['humidity'][i] is not None:
+            features['humidity'] = columns['humidity'][i]
+
+        # 风向/风速
+        if columns['wind_vec'][i] is not None and columns['wind_speed'][i] is not None:
+            features['wind_direction'] = deg_to_dir(columns['wind_vec'][i])
+            features['wind_speed'] = f"{columns['wind_speed'][i]:g}"
+
+        forecasts.append(template + format_weather_features(features))
+
+    return "\n---\n".join(forecasts)
+
+
+async def get_forecast_api(province: str, city: str, district: str, nx: float, ny: float, compact: bool = False,
+                           fields: list[str] | None = None, hours: int | None = None,
+                           max_chars: int | None = None) -> str:
+    """获取指定地区的天气预报（渲染选项见 render_forecast）"""
+    error = validate_fields(fields)
+    if error:
+        return f"Error: {error}"
+    try:
+        columns, issued_at = await fetch_ultra_srt_forecast(nx, ny)
+        if not columns['fcst_time']:
+            return f"{province} {city} {district} 地区的 weather information could not be found."
+
+        notices = [stale_notice(issued_at)] if is_stale(issued_at) else []
+        return render_forecast(province, city, district, columns, compact, fields, hours, max_chars, notices)
+
+    except Exception as e:
+        logger.error("天气 API 请求错误", exc_info=True,
+                     extra={"location": f"{province} {city} {district}", "grid": (nx, ny)})
+        return f"获取天气信息时发生错误: {str(e)}"
+
+
+async def get_vilage_forecast_api(province: str, city: str, district: str, nx: float, ny: float,
+                                  compact: bool = False, fields: list[str] | None = None, hours: int | None = None,
+                                  max_chars: int | None = None) -> str:
+    """获取指定地区的短期（3 日）天气预报（渲染选项见 render_forecast）"""
+    error = validate_fields(fields)
+    if error:
+        return f"Error: {error}"
+    try:
+        columns, issued_at = await fetch_vilage_forecast(nx, ny)
+        if not columns['fcst_time']:
+            return f"{province} {city} {district} 地区的 weather information could not be found."
+
+        notices = [stale_notice(issued_at)] if is_stale(issued_at, vilage_issuance) else []
+        return render_forecast(province, city, district, columns, compact, fields, hours, max_chars, notices)
+
+    except Exception as e:
+        logger.error("天气 API 请求错误", exc_info=True,
+                     extra={"location": f"{province} {city} {district}", "grid": (nx, ny)})
+        return f"获取天气信息时发生错误: {str(e)}"
+
+
+async def get_combined_forecast_api(province: str, city: str, district: str, nx: float, ny: float,
+                                    compact: bool = False, fields: list[str] | None = None, hours: int | None = None,
+                                    max_chars: int | None = None) -> str:
+    """获取指定地区的实况、6 小时超短期预报与 3 日短期预报合并而成的时间线（渲染选项见 render_forecast）"""
+    error = validate_fields(fields)
+    if error:
+        return f"Error: {error}"
+    try:
+        columns, issued, errors = await fetch_combined_forecast(nx, ny)
+        if not columns['fcst_time']:
+            if errors:
+                raise next(iter(errors.values()))
+            return f"{province} {city} {district} 地区的 weather information could not be found."
+
+        notices = []
+        issuances = {PRODUCT_ULTRA_SRT_NCST: ultra_srt_ncst_issuance, PRODUCT_ULTRA_SRT: ultra_srt_issuance,
+                     PRODUCT_VILAGE: vilage_issuance}
+        for product, issued_at in issued.items():
+            if is_stale(issued_at, issuances[product]):
+                notices.append(f"{stale_notice(issued_at)}（{SOURCE_LABELS[product]}）")
+        for product, error in errors.items():
+            logger.warning("天气 API 请求错误，时间线中不含该产品",
+                           extra={"product": product, "grid": (nx, ny), "error": str(error)})
+            notices.append(f"[{SOURCE_LABELS[product]}] 获取失败，时间线中不含该产品: {str(error)}")
+
+        return render_forecast(province, city, district, columns, compact, fields, hours, max_chars, notices)
+
+    except Exception as e:
+        logger.error("天气 API 请求错误", exc_info=True,
+                     extra={"location": f"{province} {city} {district}", "grid": (nx, ny)})
+        return f"获取天气信息时发生错误: {str(e)}"
+
+
+def _cell_places(rows: list[tuple]) -> str:
+    """网格内地区的简短说明，如“朝阳区、海淀区 等 5 个地区”"""
+    names = list(dict.fromkeys(row[2] for row in rows))
+    label = "、".join(names[:3])
+    return f"{label} 等 {len(names)} 个地区" if len(names) > 3 else label
+
+
+async def get_region_summary_api(region: str, cells: dict[tuple[int, int], list[tuple]]) -> str:
+    """汇总一个区域内全部网格未来 6 小时的超短期预报
+
+    每个网格只请求一次（并发数受 config.REGION_MAX_CONCURRENCY 限制），汇总由 region_summary.summarize 整批计算。
+
+    Args:
+        region: 区域名称（用于标题）
+        cells: 网格 (nx, ny) -> 落在该网格的 (province, city, district, ...) 行
+    """
+    try:
+        fetched = await gather_limited(lambda cell: fetch_ultra_srt_forecast(*cell), cells,
+                                       config.REGION_MAX_CONCURRENCY)
+        errors = [result for result in fetched if isinstance(result, Exception)]
+        available = [(cell, result) for cell, result in zip(cells, fetched)
+                     if not isinstance(result, Exception) and result[0]['fcst_time']]
+        if not available:
+            if errors:
+                raise errors[0]
+            return f"{region} 地区的 weather information could not be found."
+
+        columns_list = [columns for _, (columns, _) in available]
+        summary = summarize(columns_list)
+        times = [time_label(date, time) for date, time in summary['times']]
+
+        def place(cell_no: int) -> str:
+            nx, ny = available[cell_no][0]
+            return f"Nx {nx}, Ny {ny}：{_cell_places(cells[(nx, ny)])}"
+
+        district_count = sum(len(rows) for rows in cells.values())
+        lines = [
+            f"{region} 区域天气汇总（超短期预报 {times[0]}–{times[-1]}，共 {len(times)} 个时刻）",
+            f"覆盖 {district_count} 个地区，合并为 {len(cells)} 个网格，其中 {len(available)} 个网格有预报数据",
+        ]
+        if errors:
+            logger.warning("部分网格获取失败", extra={"region": region, "failed_cells": len(errors),
+                                                     "error": str(errors[0])})
+            lines.append(f"[部分失败] {len(errors)} 个网格获取失败，汇总中不含这些网格: {str(errors[0])}")
+        stale = sum(1 for _, (_, issued_at) in available if is_stale(issued_at))
+        if stale:
+            lines.append(f"[过期数据] 上游服务暂不可用，其中 {stale} 个网格为较早发布的预报")
+
+        if 'temp_mean' in summary:
+            (low, low_cell), (high, high_cell) = summary['temp_min'], summary['temp_max']
+            lines.append(f"气温: 最低 {low:g}℃（{place(low_cell)}），最高 {high:g}℃（{place(high_cell)}），"
+                         f"平均 {summary['temp_mean']:.1f}℃")
+        rain, rain_cell = summary['rain_max']
+        lines.append(f"最大小时降水量: {rain:g}mm（{place(rain_cell)}）" if rain > 0 else "最大小时降水量: 无降水")
+
+        # 降水量大、开始早的网格排在前面
+        wet_cells = sorted(summary['wet_cells'], key=lambda wet: (-wet[2], wet[1]))
+        lines.append(f"有降水的网格: {len(wet_cells)}/{len(available)}")
+        for cell_no, first, amount in wet_cells[:config.REGION_LISTED_WET_CELLS]:
+            detail = f"{times[first]}起" + (f"，最大小时降水量 {amount:g}mm" if amount > 0 else "")
+            lines.append(f"  {place(cell_no)} — {detail}")
+        if len(wet_cells) > config.REGION_LISTED_WET_CELLS:
+            lines.append(f"  …另有 {len(wet_cells) - config.REGION_LISTED_WET_CELLS} 个网格有降水")
+        if wet_cells:
+            lines.append("逐小时有降水的网格数: " + " | ".join(
+                f"{label} {count}" for label, count in zip(times, summary['wet_per_hour'])))
+        return "\n".join(lines)
+
+    except Exception as e:
+        logger.error("区域天气汇总错误", exc_info=True, extra={"region": region, "cells": len(cells)})
+        return f"获取天气信息时发生错误: {str(e)}"
+
+
+async def get_forecast_history_api(province: str, city: str, district: str, nx: float, ny: float,
+                                   days: int = 7, field: str = "temp", product: str = PRODUCT_ULTRA_SRT) -> str:
+    """从本地归档查询某网格最近若干天的预报序列（不请求上游）"""
+    try:
+        if forecast_archive is None:
+            return "预报归档未启用（config.ARCHIVE_ENABLED = False）"
+        if product not in PRODUCTS:
+            return f"不支持的预报产品: {product}（可选 {', '.join(PRODUCTS)}）"
+        if field not in FIELD_LABELS:
+            return f"不支持的字段: {field}（可选 {', '.join(FIELD_LABELS)}）"
+        days = max(1, min(days, config.ARCHIVE_HISTORY_MAX_DAYS))
+
+        # 先写入缓冲区中尚未落盘的数据
+        await forecast_archive.flush()
+        # 时间范围包含最近发布时次中尚未到来的预报时刻（短期预报最长约 3 天）
+        now = datetime.now()
+        start = now - timedelta(days=days)
+        end = now + timedelta(days=4)
+        series = await asyncio.to_thread(forecast_archive.query_series, product, nx, ny, start, end, field)
+
+        label, unit = FIELD_LABELS[field]
+        header = f"{province} {city} {district} (Nx: {nx}, Ny: {ny}) 最近 {days} 天{label}历史预报"
+        if not series:
+            return f"{header}：归档中没有数据。"
+
+        lines = [f"{header}（共 {len(series)} 个时刻）"]
+        if field in NUMERIC_FIELDS:
+            values = [value for _, value, _ in series]
+            low = min(series, key=lambda entry: entry[1])
+            high = max(series, key=lambda entry: entry[1])
+            lines.append(
+                f"最低 {low[1]:g}{unit} ({low[0]:%m-%d %H:%M}) / 最高 {high[1]:g}{unit} ({high[0]:%m-%d %H:%M}) / "
+                f"平均 {sum(values) / len(values):.1f}{unit}"
+            )
+        for fcst_at, value, _ in series:
+            value = f"{value:g}" if isinstance(value, float) else value
+            lines.append(f"{fcst_at:%Y-%m-%d %H:%M} {value}{unit}")
+        return "\n".join(lines)
 
     except Exception as e:
-        print(f"天气 API 请求错误: {e}")
-        return [f"获取天气信息时发生错误: {str(e)}"]
+        logger.error("预报归档查询错误", exc_info=True,
+                     extra={"location": f"{province} {city} {district}", "grid": (nx, ny)})
+        return f"查询历史预报时发生错误: {str(e)}"
 
 
 if __name__ == "__main__":
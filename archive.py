@@ -0,0 +1,231 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import logs
+
+logger = logs.get_logger("archive")
+
+# 预报产品标识
+PRODUCT_ULTRA_SRT = "ultra"     # 超短期预报 getUltraSrtFcst
+PRODUCT_VILAGE = "vilage"       # 短期预报 getVilageFcst
+PRODUCTS = (PRODUCT_ULTRA_SRT, PRODUCT_VILAGE)
+PRODUCT_ULTRA_SRT_NCST = "ncst"  # 超短期实况 getUltraSrtNcst（观测值，不归档）
+
+# 归档的预报字段（与 decoder.FORECAST_COLUMNS 中除日期/时刻外的各列一致）
+ARCHIVE_FIELDS = ("temp", "humidity", "sky", "pty", "rn1", "wind_vec", "wind_speed", "pop", "tmn", "tmx", "sno")
+
+# 可用于趋势统计的数值字段
+NUMERIC_FIELDS = ("temp", "humidity", "wind_vec", "wind_speed", "pop", "tmn", "tmx")
+
+# 字段 -> (中文名称, 单位)
+FIELD_LABELS = {
+    "temp": ("气温", "℃"),
+    "humidity": ("湿度", "%"),
+    "sky": ("天空状况代码", ""),
+    "pty": ("降水类型代码", ""),
+    "rn1": ("降水量", ""),
+    "wind_vec": ("风向", "°"),
+    "wind_speed": ("风速", "m/s"),
+    "pop": ("降水概率", "%"),
+    "tmn": ("最低气温", "℃"),
+    "tmx": ("最高气温", "℃"),
+    "sno": ("新积雪", ""),
+}
+
+
+def to_archive_time(value: datetime) -> int:
+    """datetime -> YYYYMMDDHHMM 整数（归档表中的时间表示）"""
+    return int(value.strftime("%Y%m%d%H%M"))
+
+
+def from_archive_time(value: int) -> datetime:
+    return datetime.strptime(str(value), "%Y%m%d%H%M")
+
+
+class ForecastArchive:
+    """只追加的预报归档（WAL 模式的 SQLite）
+
+    表以 (product, nx, ny, base_datetime, fcst_datetime) 为聚簇主键（WITHOUT ROWID），
+    同一网格同一时间段的数据在磁盘上连续存放，按网格和时间范围查询只需一次范围扫描。
+    写入先进入内存缓冲区，由后台任务按批次在单个事务中写入；未启动后台任务时缓冲区满一批即同步写入。
+    """
+
+    def __init__(self, path: str | Path, batch_rows: int = 5000, flush_interval: float = 5.0):
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self._pending: list[tuple] = []
+        self._local = threading.local()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程共享，每个线程各自持有一个；首次使用时才创建文件
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._init_lock:
+                if not self._initialized:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5.0)
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if not self._initialized:
+                    self._create_schema(conn)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_archive (
+            product TEXT NOT NULL,
+            nx INTEGER NOT NULL,
+            ny INTEGER NOT NULL,
+            base_datetime INTEGER NOT NULL,
+            fcst_datetime INTEGER NOT NULL,
+            temp REAL,
+            humidity REAL,
+            sky INTEGER,
+            pty INTEGER,
+            rn1 TEXT,
+            wind_vec REAL,
+            wind_speed REAL,
+            pop REAL,
+            tmn REAL,
+            tmx REAL,
+            sno TEXT,
+            PRIMARY KEY (product, nx, ny, base_datetime, fcst_datetime)
+        ) WITHOUT ROWID
+        ''')
+        conn.commit()
+
+    def add(self, product: str, nx: int, ny: int, issued_at: datetime, columns: dict[str, list]) -> int:
+        """将一次解码后的预报加入写入缓冲区，返回加入的行数"""
+        base = to_archive_time(issued_at)
+        count = len(columns["fcst_time"])
+        fields = [columns.get(name) or [None] * count for name in ARCHIVE_FIELDS]
+        for i, (fcst_date, fcst_time) in enumerate(zip(columns["fcst_date"], columns["fcst_time"])):
+            if not fcst_date:
+                continue
+            self._pending.append(
+                (product, int(nx), int(ny), base, int(fcst_date + fcst_time)) + tuple(column[i] for column in fields)
+            )
+        if len(self._pending) >= self.batch_rows:
+            if self._wakeup is not None:
+                self._wakeup.set()
+            else:
+                # 没有后台任务（未调用 start()）时就地写入，否则缓冲区会无限增长
+                rows, self._pending = self._pending, []
+                self._write_or_drop(rows)
+        return count
+
+    def write_rows(self, rows: list[tuple]) -> int:
+        """在单个事务中批量写入，已存在的 (网格, 发布时次, 预报时刻) 保持不变"""
+        if not rows:
+            return 0
+        conn = self._connect()
+        placeholders = ", ".join("?" * (5 + len(ARCHIVE_FIELDS)))
+        with conn:
+            cursor = conn.executemany(
+                f'''
+                INSERT OR IGNORE INTO forecast_archive
+                (product, nx, ny, base_datetime, fcst_datetime, {", ".join(ARCHIVE_FIELDS)})
+                VALUES ({placeholders})
+                ''',
+                rows
+            )
+        self.rows_written += cursor.rowcount
+        return cursor.rowcount
+
+    def _write_or_drop(self, rows: list[tuple]) -> int:
+        """写入一批行，写入失败时丢弃并计数"""
+        try:
+            return self.write_rows(rows)
+        except sqlite3.Error as e:
+            self.rows_dropped += len(rows)
+            logger.error("预报归档写入失败", extra={"rows": len(rows), "error": str(e)})
+            return 0
+
+    async def flush(self) -> int:
+        """将缓冲区写入数据库"""
+        rows, self._pending = self._pending, []
+        return await asyncio.to_thread(self._write_or_drop, rows)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    def query_series(self, product: str, nx: int, ny: int, start: datetime, end: datetime,
+                     field: str, lookback_hours: int = 72) -> list[tuple[datetime, object, datetime]]:
+        """查询某网格在 [start, end] 内各预报时刻的取值
+
+        同一预报时刻有多个发布时次时取最新（预报时效最短）的一个。
+
+        Args:
+            product: 预报产品（ultra / vilage）
+            field: ARCHIVE_FIELDS 中的字段名
+            lookback_hours: 早于 start 多少小时的发布时次仍可能覆盖该时间段
+
+        Returns:
+            list: [(预报时刻, 取值, 发布时次), ...]，按预报时刻排序
+        """
+        if field not in ARCHIVE_FIELDS:
+            raise ValueError(f"不支持的字段: {field}（可选 {', '.join(ARCHIVE_FIELDS)}）")
+        earliest_base = to_archive_time(start - timedelta(hours=lookback_hours))
+        rows = self._connect().execute(
+            f'''
+            SELECT base_datetime, fcst_datetime, {field}
+            FROM forecast_archive
+            WHERE product = ? AND nx = ? AND ny = ?
+              AND base_datetime BETWEEN ? AND ?
+              AND fcst_datetime BETWEEN ? AND ?
+              AND {field} IS NOT NULL
+            ORDER BY base_datetime, fcst_datetime
+            ''',
+            (product, int(nx), int(ny), earliest_base, to_archive_time(end),
+             to_archive_time(start), to_archive_time(end))
+        ).fetchall()
+
+        # 行按 (发布时次, 预报时刻) 顺序返回，后出现的发布时次覆盖先出现的
+        latest: dict[int, tuple[int, object]] = {}
+        for base, fcst, value in rows:
+            latest[fcst] = (base, value)
+        return [(from_archive_time(fcst), value, from_archive_time(base))
+                for fcst, (base, value) in sorted(latest.items())]
+
+    def stats(self) -> dict[str, int]:
+        """已写入、待写入及因写入失败丢弃的行数"""
+        return {"rows_written": self.rows_written, "pending_rows": len(self._pending),
+                "rows_dropped": self.rows_dropped}
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM forecast_archive").fetchone()[0]
@@ -0,0 +1,83 @@
+"""Measure forecast archive ingestion throughput and range-query latency at millions of rows.
+
+    python benchmarks/bench_archive.py --cells 2000 --days 7 --queries 500
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from archive import ARCHIVE_FIELDS, PRODUCT_ULTRA_SRT, ForecastArchive, to_archive_time  # noqa: E402
+
+# 超短期预报：每小时一个发布时次，每个时次 6 个预报时刻
+ROWS_PER_ISSUANCE = 6
+
+
+def synthetic_rows(cells: list[tuple[int, int]], start: datetime, hours: int):
+    """Yield archive rows issuance by issuance, the order in which the server produces them."""
+    for h in range(hours):
+        issued_at = start + timedelta(hours=h, minutes=30)
+        base = to_archive_time(issued_at)
+        for nx, ny in cells:
+            for step in range(1, ROWS_PER_ISSUANCE + 1):
+                fcst = to_archive_time(issued_at.replace(minute=0) + timedelta(hours=step))
+                temp = 15 + 8 * random.random()
+                values = {"temp": temp, "humidity": 60.0, "sky": 1, "pty": 0, "rn1": "无降水",
+                          "wind_vec": 250.0, "wind_speed": 2.5}
+                yield (PRODUCT_ULTRA_SRT, nx, ny, base, fcst) + tuple(values.get(name) for name in ARCHIVE_FIELDS)
+
+
+def main(cell_count: int, days: int, queries: int, batch: int) -> None:
+    cells = [(random.randint(1, 150), random.randint(1, 250)) for _ in range(cell_count)]
+    cells = list(dict.fromkeys(cells))
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ForecastArchive(Path(tmp) / "archive.db", batch_rows=batch)
+        total = 0
+        ingest = 0.0
+        pending = []
+        for row in synthetic_rows(cells, start, days * 24):
+            pending.append(row)
+            if len(pending) >= batch:
+                t = time.perf_counter()
+                total += archive.write_rows(pending)
+                ingest += time.perf_counter() - t
+                pending = []
+        t = time.perf_counter()
+        total += archive.write_rows(pending)
+        ingest += time.perf_counter() - t
+        size = (Path(tmp) / "archive.db").stat().st_size + (Path(tmp) / "archive.db-wal").stat().st_size
+        print(f"cells={len(cells)} days={days} rows={total:,} batch={batch}")
+        print(f"ingest (write time only): {ingest:.1f}s ({total / ingest:,.0f} rows/s), db size {size / 2**20:.0f} MiB")
+
+        for label, window in (("24h", timedelta(days=1)), (f"{days}d", timedelta(days=days))):
+            latencies = []
+            points = 0
+            for _ in range(queries):
+                nx, ny = random.choice(cells)
+                t = time.perf_counter()
+                series = archive.query_series(PRODUCT_ULTRA_SRT, nx, ny, end - window, end, "temp")
+                latencies.append(time.perf_counter() - t)
+                points += len(series)
+            latencies.sort()
+            print(f"query {label:<4} trend: p50={statistics.median(latencies) * 1000:6.2f}ms "
+                  f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:6.2f}ms "
+                  f"({points / queries:.0f} points/query)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.cells, args.days, args.queries, args.batch)
@@ -0,0 +1,217 @@
+"""Measure cold start of the stdio server: import time and spawn-to-first-response latency.
+
+    python benchmarks/bench_cold_start.py --runs 5 --output cold_start.json
+    python benchmarks/bench_cold_start.py --baseline cold_start.json --tolerance 0.2
+
+Stdio MCP clients spawn server.py once per session, so every session pays for
+interpreter start-up, imports and whatever the server does before answering.
+
+Import time is the wall-clock time of fresh interpreters running a single
+statement: the bare interpreter and the MCP SDK alone are measured as
+reference points next to `import server`, since the SDK dominates.
+
+Startup spawns the server over stdio the way an MCP client does and records,
+per run, the time until the initialize response, the first get_grid_location
+response and the first get_forecast_by_name response (served by the local
+stub). It runs once with the weather_grid snapshot next to the database and
+once with only the SQLite database. In the second case the snapshot is deleted
+before each run, and the server writes it again on that first load.
+Each value is the median over --runs processes. With --baseline the exit
+status is 1 when any median grew by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from grid_fixture import build_grid_db  # noqa: E402
+from location_snapshot import export_snapshot, snapshot_path  # noqa: E402
+from stub_upstream import start_stub_process  # noqa: E402
+
+IMPORTS = {
+    "python": "pass",
+    "mcp.server.fastmcp": "import mcp.server.fastmcp",
+    "server": "import server",
+}
+
+# 与 `python server.py` 相同，只是把位置数据库指向基准测试生成的表
+LAUNCHER = "import sys; from pathlib import Path; import server; server.DB_PATH = Path(sys.argv[1]); server.mcp.run()"
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_time(statement: str, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def deferred_modules(env: dict) -> list[str]:
+    """Project modules that `import server` leaves for later (imported on first use)."""
+    statement = "import sys, server; print(' '.join(m for m in ('api', 'prewarm') if m not in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", statement], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return output.split()
+
+
+async def start_once(db: Path, env: dict, location: tuple[str, str, str]) -> dict[str, float]:
+    params = StdioServerParameters(command=sys.executable, args=["-c", LAUNCHER, str(db)], env=env, cwd=ROOT)
+    arguments = dict(zip(("province", "city", "district"), location))
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter()
+                lookup = await session.call_tool("get_grid_location", arguments)
+                located = time.perf_counter()
+                forecast = await session.call_tool("get_forecast_by_name", arguments)
+                forecasted = time.perf_counter()
+    for result in (lookup, forecast):
+        text = result.content[0].text
+        if result.isError or text.startswith(("Error", "No location found")):
+            raise RuntimeError(f"unexpected tool result: {text[:200]}")
+    return {
+        "initialize_ms": (initialized - start) * 1000,
+        "first_lookup_ms": (located - start) * 1000,
+        "first_forecast_ms": (forecasted - start) * 1000,
+    }
+
+
+def pick_location(db: Path) -> tuple[str, str, str]:
+    """A location from the middle of the table, looked up by its full names."""
+    conn = sqlite3.connect(db)
+    try:
+        count = conn.execute("SELECT COUNT(*) FROM weather_grid").fetchone()[0]
+        return conn.execute("SELECT province, city, district FROM weather_grid ORDER BY id LIMIT 1 OFFSET ?",
+                            (count // 2,)).fetchone()
+    finally:
+        conn.close()
+
+
+def median_of(runs: list[dict[str, float]]) -> dict[str, float]:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+async def measure_startup(db: Path, env: dict, location: tuple[str, str, str], runs: int,
+                          with_snapshot: bool) -> dict[str, float]:
+    snapshot = snapshot_path(db)
+    samples = []
+    for _ in range(runs):
+        if with_snapshot:
+            export_snapshot(db, snapshot)
+        else:
+            snapshot.unlink(missing_ok=True)
+        samples.append(await start_once(db, env, location))
+    return median_of(samples)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against a baseline report; return True if any median grew beyond tolerance."""
+    print(f"\ncompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    regressed = False
+    for section in ("imports", "startup"):
+        for name, values in report[section].items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            for key, value in values.items():
+                if key not in old:
+                    continue
+                change = value / old[key] - 1
+                flag = change > tolerance
+                regressed |= flag
+                print(f"{section:<8} {name:<20} {key:<18} {change:+7.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--db", type=Path, help="weather_grid database (default: synthetic national-size table)")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    process, base_url = start_stub_process()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       CN_WEATHER_API_KEY="bench",
+                       CN_WEATHER_API_BASE_URL=base_url,
+                       CN_WEATHER_API_RATE_LIMIT="1e9",
+                       CN_WEATHER_ARCHIVE=str(Path(tmp) / "archive.db"))
+            env.pop("CN_WEATHER_SHARED_CACHE", None)
+            env.pop("CN_WEATHER_METRICS_PORT", None)
+            if args.db:
+                # 快照写在数据库旁边，复制一份以免改动调用方的目录
+                db = Path(tmp) / "weather_grid.db"
+                db.write_bytes(args.db.read_bytes())
+            else:
+                db = build_grid_db(Path(tmp) / "weather_grid.db")
+
+            print(f"runs={args.runs} python={platform.python_version()} cpus={os.cpu_count()}")
+            imports = {}
+            for name, statement in IMPORTS.items():
+                samples = [import_time(statement, env) for _ in range(args.runs)]
+                imports[name] = {"wall_ms": statistics.median(samples) * 1000}
+                print(f"import {name:<22} {imports[name]['wall_ms']:8.1f}ms")
+            deferred = deferred_modules(env)
+            print(f"deferred until first use: {', '.join(deferred) or 'none'}")
+
+            location = pick_location(db)
+            startup = {}
+            for name, with_snapshot in (("snapshot", True), ("sqlite", False)):
+                startup[name] = asyncio.run(measure_startup(db, env, location, args.runs, with_snapshot))
+                result = startup[name]
+                print(f"startup {name:<21} initialize={result['initialize_ms']:7.1f}ms  "
+                      f"first lookup={result['first_lookup_ms']:7.1f}ms  "
+                      f"first forecast={result['first_forecast_ms']:7.1f}ms")
+    finally:
+        process.terminate()
+
+    report = {
+        "benchmark": "cold_start",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"runs": args.runs},
+        "deferred_modules": deferred,
+        "imports": imports,
+        "startup": startup,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"report written to {args.output}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
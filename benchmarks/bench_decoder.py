@@ -0,0 +1,136 @@
+"""Micro-benchmark: legacy per-item dict decoding vs the single-pass columnar decoder.
+
+    python benchmarks/bench_decoder.py --cells 2000
+
+The decoder writes each value straight into its list column and skips the
+categories it does not decode before looking up the row. It is reported both
+alone and with to_columns(), which is how api.py consumes it. The legacy loop
+does less work (it keys rows by fcstTime only and skips RN1).
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from decoder import decode_items, deg_to_dir, rain_type_code, sky_code  # noqa: E402
+from stub_upstream import build_ultra_srt_payload  # noqa: E402
+
+# 旧实现使用的度数 -> 风向代码表（17 个键，逐个比较）
+LEGACY_DEG_CODE = {
+    0: 'N', 360: 'N', 180: 'S', 270: 'W', 90: 'E',
+    22.5: 'NNE', 45: 'NE', 67.5: 'ENE',
+    112.5: 'ESE', 135: 'SE', 157.5: 'SSE',
+    202.5: 'SSW', 225: 'SW', 247.5: 'WSW',
+    292.5: 'WNW', 315: 'NW', 337.5: 'NNW'
+}
+
+
+def legacy_deg_to_dir(deg):
+    close_dir = ''
+    min_abs = 360
+    if deg not in LEGACY_DEG_CODE.keys():
+        for key in LEGACY_DEG_CODE.keys():
+            if abs(key - deg) < min_abs:
+                min_abs = abs(key - deg)
+                close_dir = LEGACY_DEG_CODE[key]
+    else:
+        close_dir = LEGACY_DEG_CODE[deg]
+    return close_dir
+
+
+def legacy_decode(res: list) -> dict:
+    """The pre-decoder loop: nested dicts, int()/float() per reading, linear wind lookup."""
+    informations = dict()
+    for items in res:
+        fcstTime = items['fcstTime']
+        if fcstTime not in informations.keys():
+            informations[fcstTime] = dict()
+        informations[fcstTime][items['category']] = items['fcstValue']
+
+    decoded = {}
+    for key, val in informations.items():
+        features = dict()
+        if 'SKY' in val and val['SKY']:
+            features['sky'] = sky_code[int(val['SKY'])]
+        if 'PTY' in val and val['PTY']:
+            features['rain'] = rain_type_code[int(val['PTY'])]
+        if 'T1H' in val and val['T1H']:
+            features['temp'] = float(val['T1H'])
+        if 'REH' in val and val['REH']:
+            features['humidity'] = float(val['REH'])
+        if 'VEC' in val and val['VEC'] and 'WSD' in val and val['WSD']:
+            features['wind_direction'] = legacy_deg_to_dir(float(val['VEC']))
+            features['wind_speed'] = val['WSD']
+        decoded[key] = features
+    return decoded
+
+
+def make_cells(count: int, seed: int = 3) -> list[list]:
+    rng = random.Random(seed)
+    cells = []
+    for i in range(count):
+        items = build_ultra_srt_payload(i, i, "20261017", "1330")["response"]["body"]["items"]["item"]
+        for item in items:
+            if item["category"] == "VEC":
+                item["fcstValue"] = str(rng.randint(0, 359))
+            elif item["category"] == "T1H":
+                item["fcstValue"] = f"{rng.uniform(-10, 35):.1f}"
+        cells.append(items)
+    return cells
+
+
+def bench(fn, cells) -> float:
+    start = time.perf_counter()
+    for items in cells:
+        fn(items)
+    return time.perf_counter() - start
+
+
+def retained_bytes(fn, cells) -> int:
+    """Memory held by the decoded results of every cell (e.g. a region workload)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [fn(items) for items in cells]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del results
+    return retained
+
+
+def main(count: int) -> None:
+    cells = make_cells(count)
+    items_total = sum(len(items) for items in cells)
+
+    legacy = min(bench(legacy_decode, cells) for _ in range(5))
+    columnar = min(bench(decode_items, cells) for _ in range(5))
+    with_columns = min(bench(lambda items: decode_items(items).to_columns(), cells) for _ in range(5))
+    print(f"cells={count} items={items_total}")
+    print(f"legacy dict decode         {legacy * 1000:8.1f}ms ({items_total / legacy:,.0f} items/s)")
+    print(f"columnar decoder           {columnar * 1000:8.1f}ms ({legacy / columnar:.2f}x legacy)")
+    print(f"columnar + to_columns()    {with_columns * 1000:8.1f}ms ({legacy / with_columns:.2f}x legacy)")
+
+    legacy_mem = retained_bytes(legacy_decode, cells)
+    columnar_mem = retained_bytes(decode_items, cells)
+    print(f"retained memory: legacy {legacy_mem / count:,.0f} B/cell, columnar {columnar_mem / count:,.0f} B/cell")
+
+    degrees = [random.uniform(0, 360) for _ in range(200_000)]
+    start = time.perf_counter()
+    for deg in degrees:
+        legacy_deg_to_dir(deg)
+    linear = time.perf_counter() - start
+    start = time.perf_counter()
+    for deg in degrees:
+        deg_to_dir(deg)
+    binned = time.perf_counter() - start
+    print(f"wind lookup: linear scan {linear / len(degrees) * 1e9:.0f}ns, 16-bin table {binned / len(degrees) * 1e9:.0f}ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.cells)
@@ -0,0 +1,62 @@
+"""Micro-benchmark: lat/lon -> grid projection (NumPy vs per-point math) and nearest-district lookup
+(grid-bucket index vs linear scan).
+
+    python benchmarks/bench_grid_projection.py --points 100000 --lookups 2000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from grid_fixture import synthetic_rows  # noqa: E402
+from grid_projection import _project_python, project  # noqa: E402
+from location_index import GridBucketIndex  # noqa: E402
+
+
+def linear_nearest(rows: list[tuple], x: float, y: float) -> tuple:
+    return min(rows, key=lambda row: (row[3] - x) ** 2 + (row[4] - y) ** 2)
+
+
+def main(points: int, lookups: int) -> None:
+    lats = [random.uniform(33.0, 38.5) for _ in range(points)]
+    lons = [random.uniform(125.0, 130.0) for _ in range(points)]
+
+    project(lats[:1], lons[:1])  # 首次调用会导入 NumPy，不计入耗时
+    start = time.perf_counter()
+    _project_python(lats, lons)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    project(lats, lons)
+    vectorized = time.perf_counter() - start
+    print(f"projection of {points:,} points: per-point {scalar * 1000:.1f}ms, "
+          f"numpy {vectorized * 1000:.1f}ms ({scalar / vectorized:.1f}x)")
+
+    rows = synthetic_rows()
+    start = time.perf_counter()
+    index = GridBucketIndex(rows)
+    build = time.perf_counter() - start
+    queries = [(random.uniform(1, 149), random.uniform(1, 253)) for _ in range(lookups)]
+
+    start = time.perf_counter()
+    for x, y in queries:
+        index.nearest(x, y)
+    bucket = time.perf_counter() - start
+    sample = queries[:max(1, lookups // 20)]
+    start = time.perf_counter()
+    for x, y in sample:
+        linear_nearest(rows, x, y)
+    linear = (time.perf_counter() - start) / len(sample) * lookups
+    print(f"nearest district over {len(rows):,} rows: index build {build * 1000:.1f}ms, "
+          f"bucket {bucket / lookups * 1e6:.1f}us/lookup, linear scan {linear / lookups * 1e6:.1f}us/lookup "
+          f"({linear / bucket:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.points, args.lookups)
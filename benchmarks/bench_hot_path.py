@@ -0,0 +1,355 @@
+"""Drive the request hot path at fixed concurrency against the local stub and record the results as JSON.
+
+    python benchmarks/bench_hot_path.py --requests 2000 --concurrency 32 --output hot_path.json
+    python benchmarks/bench_hot_path.py --baseline hot_path.json --tolerance 0.15
+
+Scenarios, each run inside the real server lifespan (location index, pooled
+client, archive writer; pre-warming disabled):
+
+    get_grid_location        tool call through FastMCP, in-memory location index
+    get_forecast             tool call through FastMCP, every request a cache miss
+    get_forecast_api         direct call, every request a cache miss
+    get_forecast_api (hit)   direct call over a small set of already cached cells
+
+Each scenario reports throughput, p50/p95/p99 latency and errors from a timed
+pass, then allocations from a separate sequential pass under tracemalloc
+(tracing slows the interpreter, so it is kept out of the timed numbers).
+Logging is active throughout (JSON records to a temporary app.log, stderr
+off). A final pass measures the cost per log record of a record below the
+level, a queued JSON record, a record dropped by sampling, and for comparison
+a synchronous JSON file handler and the print() the server used before the
+logging queue; caller CPU is what the event loop thread pays, wall also
+includes the listener thread formatting and writing on the same cores.
+With --baseline the run is compared with an earlier JSON report and the exit
+status is 1 when throughput or p95 regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from grid_fixture import build_grid_db  # noqa: E402
+from stub_upstream import ERROR_KINDS, start_stub_process  # noqa: E402
+
+# 网格范围内的全部网格，每个缓存未命中的请求使用一个尚未请求过的网格
+GRID_CELLS = [(nx, ny) for ny in range(1, 254) for nx in range(1, 150)]
+HIT_CELLS = 16
+ERROR_PREFIXES = ("Error", "No location found", "获取天气信息时发生错误")
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, int(round(len(ordered) * q)) - 1))]
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def tool_text(result) -> str:
+    """Text of a FastMCP call_tool result (content blocks, optionally with structured output)."""
+    if isinstance(result, tuple):
+        result = result[0]
+    return "".join(getattr(block, "text", "") for block in result)
+
+
+class Scenarios:
+    """The operations to benchmark; each takes a request index and returns the text shown to the client."""
+
+    def __init__(self, server, api, grid_rows: list[tuple]):
+        self.server = server
+        self.api = api
+        self.grid_rows = grid_rows
+        self.next_cell = 0
+
+    def fresh_cells(self, count: int) -> list[tuple[int, int]]:
+        """Cells not requested earlier in this run, so the forecast cache cannot answer them."""
+        start = self.next_cell
+        self.next_cell += count
+        if self.next_cell > len(GRID_CELLS):
+            raise SystemExit(f"at most {len(GRID_CELLS)} cache-miss requests per run")
+        return GRID_CELLS[start:self.next_cell]
+
+    async def prepare(self, name: str, count: int):
+        if name == "get_grid_location":
+            rows = self.grid_rows
+
+            async def op(i):
+                province, city, district = rows[i * 7919 % len(rows)][:3]
+                return tool_text(await self.server.mcp.call_tool(
+                    "get_grid_location", {"province": province, "city": city, "district": district}))
+
+        elif name == "get_forecast":
+            cells = self.fresh_cells(count)
+
+            async def op(i):
+                nx, ny = cells[i]
+                return tool_text(await self.server.mcp.call_tool(
+                    "get_forecast", {"province": "p", "city": "c", "district": "d", "nx": nx, "ny": ny}))
+
+        elif name == "get_forecast_api":
+            cells = self.fresh_cells(count)
+
+            async def op(i):
+                nx, ny = cells[i]
+                return await self.api.get_forecast_api("p", "c", "d", nx, ny)
+
+        elif name == "get_forecast_api (hit)":
+            cells = self.fresh_cells(HIT_CELLS)
+            for nx, ny in cells:
+                await self.api.get_forecast_api("p", "c", "d", nx, ny)
+
+            async def op(i):
+                nx, ny = cells[i % len(cells)]
+                return await self.api.get_forecast_api("p", "c", "d", nx, ny)
+
+        else:
+            raise ValueError(name)
+        return op
+
+
+SCENARIOS = ("get_grid_location", "get_forecast", "get_forecast_api", "get_forecast_api (hit)")
+
+
+async def timed_pass(op, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            text = await op(i)
+            latencies.append(time.perf_counter() - start)
+            if text.startswith(ERROR_PREFIXES):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed,
+        "latency_ms": {
+            "mean": sum(ordered) / len(ordered) * 1000,
+            "p50": percentile(ordered, 0.50) * 1000,
+            "p95": percentile(ordered, 0.95) * 1000,
+            "p99": percentile(ordered, 0.99) * 1000,
+            "max": ordered[-1] * 1000,
+        },
+    }
+
+
+async def allocation_pass(op, requests: int) -> dict:
+    """Sequential requests under tracemalloc: mean per-request peak and bytes still held afterwards."""
+    await op(0)  # 预热（首次调用的导入与缓存），不计入
+    tracemalloc.start()
+    peak_total = 0
+    baseline, _ = tracemalloc.get_traced_memory()
+    start_blocks = sys.getallocatedblocks()
+    for i in range(1, requests + 1):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await op(i)
+        peak_total += tracemalloc.get_traced_memory()[1] - before
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    blocks = sys.getallocatedblocks() - start_blocks
+    tracemalloc.stop()
+    return {
+        "requests": requests,
+        "peak_bytes_per_request": peak_total / requests,
+        "retained_bytes_per_request": retained / requests,
+        "retained_blocks_per_request": blocks / requests,
+    }
+
+
+def per_record_ns(emit, records: int) -> dict[str, float]:
+    """Wall time and CPU time of the calling thread per record (the listener thread's work shows only in wall)."""
+    start, start_cpu = time.perf_counter_ns(), time.thread_time_ns()
+    for i in range(records):
+        emit(i)
+    return {"caller_cpu": (time.thread_time_ns() - start_cpu) / records,
+            "wall": (time.perf_counter_ns() - start) / records}
+
+
+def wait_for_queue(logs, timeout: float = 10.0) -> None:
+    """Let the listener thread write out queued records so one measurement does not slow the next."""
+    deadline = time.monotonic() + timeout
+    while logs._queue_handler is not None and not logs._queue_handler.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def logging_overhead(logs, records: int, tmp: Path) -> dict:
+    """Caller-side nanoseconds per record for each way of reporting an error on the hot path."""
+    logger = logs.get_logger("bench")
+    extra = {"grid": (61, 125), "error": "upstream timeout"}
+    sync_logger = logging.getLogger("bench_sync")
+    sync_logger.propagate = False
+    sync_handler = logging.FileHandler(tmp / "sync.log", encoding="utf-8")
+    sync_handler.setFormatter(logs.JsonFormatter())
+    sync_logger.addHandler(sync_handler)
+
+    results = {}
+    wait_for_queue(logs)
+    results["below level"] = per_record_ns(lambda i: logger.debug("请求完成", extra=extra), records)
+    dropped = logs.stats()["records_dropped"]
+    results["queued json"] = per_record_ns(lambda i: logger.warning("天气 API 请求错误", extra=extra), records)
+    dropped = logs.stats()["records_dropped"] - dropped
+    wait_for_queue(logs)
+    sampled = {**extra, "sample_key": "bench:sampled"}
+    results["sampled out"] = per_record_ns(lambda i: logger.warning("温度值处理错误", extra=sampled), records)
+    results["sync json file"] = per_record_ns(lambda i: sync_logger.warning("天气 API 请求错误", extra=extra), records)
+    with open(tmp / "print.log", "w", encoding="utf-8") as out:
+        results["print (flushed)"] = per_record_ns(
+            lambda i: print(f"天气 API 请求错误: {extra['error']}", file=out, flush=True), records)
+    sync_handler.close()
+    wait_for_queue(logs)
+    for name, ns in results.items():
+        print(f"log {name:<20} caller cpu {ns['caller_cpu']:8.0f} ns/record  wall {ns['wall']:8.0f} ns/record")
+    return {"records": records, "queue_dropped": dropped, "ns_per_record": results}
+
+
+async def run(args, base_url: str, grid_db: Path, grid_rows: list[tuple]) -> tuple[list[dict], dict]:
+    import api
+    import config
+    import logs
+    import server
+
+    config.PREWARM_ENABLED = False
+    config.LOG_STDERR = False
+    # FastMCP 启用的 INFO 日志会为每个上游请求打印一行
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.DB_PATH = grid_db
+    # 位置索引按需加载；这里预先建好，计时只反映稳态的查找开销
+    server.preload_location_index()
+    scenarios = Scenarios(server, api, grid_rows)
+    results = []
+    async with server.server_lifespan(server.mcp):
+        for name in args.scenarios:
+            op = await scenarios.prepare(name, args.requests)
+            timed = await timed_pass(op, args.requests, args.concurrency)
+            alloc_op = await scenarios.prepare(name, args.alloc_requests + 1)
+            allocations = await allocation_pass(alloc_op, args.alloc_requests)
+            results.append({"scenario": name, **timed, "allocations": allocations})
+            latency = timed["latency_ms"]
+            print(f"{name:<24} {timed['throughput_rps']:9.1f} req/s  p50={latency['p50']:8.3f}ms "
+                  f"p95={latency['p95']:8.3f}ms p99={latency['p99']:8.3f}ms  errors={timed['errors']:<4} "
+                  f"peak={allocations['peak_bytes_per_request'] / 1024:7.1f}KiB/req "
+                  f"retained={allocations['retained_bytes_per_request'] / 1024:6.1f}KiB/req")
+        overhead = logging_overhead(logs, args.log_records, Path(config.LOG_FILE).parent)
+    return results, overhead
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against a baseline report; return True if any scenario regressed beyond tolerance."""
+    previous = {entry["scenario"]: entry for entry in baseline["results"]}
+    print(f"\ncompared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    regressed = False
+    for entry in report["results"]:
+        old = previous.get(entry["scenario"])
+        if old is None:
+            continue
+        throughput = entry["throughput_rps"] / old["throughput_rps"] - 1
+        p95 = entry["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        peak = (entry["allocations"]["peak_bytes_per_request"]
+                / max(old["allocations"]["peak_bytes_per_request"], 1) - 1)
+        flag = throughput < -tolerance or p95 > tolerance
+        regressed |= flag
+        print(f"{entry['scenario']:<24} throughput {throughput:+7.1%}  p95 {p95:+7.1%}  "
+              f"peak alloc {peak:+7.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--alloc-requests", type=int, default=200, help="requests in the tracemalloc pass")
+    parser.add_argument("--log-records", type=int, default=5000, help="records per logging-overhead measurement")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--delay", type=float, default=0.0, help="stub response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random stub delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub responses that are faults")
+    parser.add_argument("--errors", nargs="+", default=list(ERROR_KINDS), choices=ERROR_KINDS)
+    parser.add_argument("--replay", help="recorded getUltraSrtFcst response (.json) or a directory of them")
+    parser.add_argument("--db", type=Path, help="weather_grid database (default: synthetic national-size table)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    stub_settings = {"response_delay": args.delay, "latency_jitter": args.jitter, "error_rate": args.error_rate,
+                     "error_kinds": tuple(args.errors), "replay": args.replay, "seed": args.seed}
+    process, base_url = start_stub_process(**stub_settings)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 配置在导入服务器模块之前通过环境变量指向本地桩服务和临时文件
+            os.environ["CN_WEATHER_API_BASE_URL"] = base_url
+            os.environ["CN_WEATHER_API_KEY"] = "bench"
+            os.environ["CN_WEATHER_API_RATE_LIMIT"] = "1e9"
+            os.environ["CN_WEATHER_ARCHIVE"] = str(Path(tmp) / "archive.db")
+            os.environ["CN_WEATHER_LOG_FILE"] = str(Path(tmp) / "app.log")
+            os.environ.pop("CN_WEATHER_SHARED_CACHE", None)
+            grid_db = args.db or build_grid_db(Path(tmp) / "weather_grid.db")
+            conn = sqlite3.connect(grid_db)
+            try:
+                grid_rows = conn.execute("SELECT province, city, district FROM weather_grid").fetchall()
+            finally:
+                conn.close()
+
+            print(f"requests={args.requests} concurrency={args.concurrency} delay={args.delay * 1000:.0f}ms "
+                  f"jitter={args.jitter * 1000:.0f}ms error_rate={args.error_rate:.0%} "
+                  f"upstream={'replay' if args.replay else 'synthetic'} grid_rows={len(grid_rows):,}")
+            results, overhead = asyncio.run(run(args, base_url, grid_db, grid_rows))
+    finally:
+        process.terminate()
+
+    report = {
+        "benchmark": "hot_path",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "alloc_requests": args.alloc_requests,
+            "grid_rows": len(grid_rows),
+            "stub": {key: list(value) if isinstance(value, tuple) else value for key, value in stub_settings.items()},
+        },
+        "results": results,
+        "logging": overhead,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"report written to {args.output}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if compare(report, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
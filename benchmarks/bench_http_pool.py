@@ -0,0 +1,77 @@
+"""Compare per-call and pooled upstream latency against the local stub.
+
+    python benchmarks/bench_http_pool.py --requests 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# 基准测试针对本地桩服务，不受 API 密钥配额的速率限制
+os.environ.setdefault("CN_WEATHER_API_RATE_LIMIT", "1e9")
+
+import utils  # noqa: E402
+from stub_upstream import start_stub_server  # noqa: E402
+
+
+async def run_requests(url: str, total: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            data = await utils.make_api_request(url)
+            latencies.append(time.perf_counter() - start)
+            if data is None:
+                raise RuntimeError("stub request failed")
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def summarize(name: str, latencies: list[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{name:<10} n={len(ordered):<6} mean={statistics.mean(ordered) * 1000:7.3f}ms "
+        f"p50={statistics.median(ordered) * 1000:7.3f}ms p95={p95 * 1000:7.3f}ms "
+        f"throughput={len(ordered) / elapsed:8.1f} req/s"
+    )
+
+
+async def main(total: int, concurrency: int) -> None:
+    stub = start_stub_server()
+    url = f"{stub.base_url}/getUltraSrtFcst?nx=61&ny=125"
+
+    # 每次调用新建客户端（旧行为）
+    utils.set_shared_client(None)
+    start = time.perf_counter()
+    per_call = await run_requests(url, total, concurrency)
+    summarize("per-call", per_call, time.perf_counter() - start)
+
+    # 共享连接池客户端
+    client = utils.create_http_client()
+    utils.set_shared_client(client)
+    try:
+        start = time.perf_counter()
+        pooled = await run_requests(url, total, concurrency)
+        summarize("pooled", pooled, time.perf_counter() - start)
+    finally:
+        utils.set_shared_client(None)
+        await client.aclose()
+        stub.shutdown()
+
+    print(f"mean speedup: {statistics.mean(per_call) / statistics.mean(pooled):.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
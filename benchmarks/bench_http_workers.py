@@ -0,0 +1,154 @@
+"""Measure streamable-HTTP throughput of server.py with different worker counts against the local stub.
+
+    python benchmarks/bench_http_workers.py --workers 1 2 4 --clients 4 --concurrency 32 --duration 10
+
+Each run starts `server.py --transport streamable-http --stateless` with the
+given number of workers, then drives it from several load-generator processes.
+Each generator sends JSON-RPC tools/call requests for get_forecast over a
+small set of cells, so after warm-up the forecast cache answers every request
+and the numbers reflect the server's own per-request cost.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from stub_upstream import start_stub_process  # noqa: E402
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+CELLS = [(60 + i, 127) for i in range(16)]
+
+
+def tool_call(request_id: int) -> bytes:
+    nx, ny = CELLS[request_id % len(CELLS)]
+    return json.dumps({
+        "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+        "params": {"name": "get_forecast",
+                   "arguments": {"province": "p", "city": "c", "district": "d", "nx": nx, "ny": ny}},
+    }).encode()
+
+
+async def drive(url: str, concurrency: int, duration: float) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, content=tool_call(i), headers=HEADERS)
+                    ok = response.status_code == 200 and '"isError":false' in response.text
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+                i += concurrency
+
+        await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(url: str, concurrency: int, duration: float, barrier, results) -> None:
+    barrier.wait()
+    results.put(asyncio.run(drive(url, concurrency, duration)))
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = httpx.post(url, content=tool_call(0), headers=HEADERS, timeout=5)
+            if response.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run(workers: int, port: int, stub_url: str, tmp: str, args) -> dict:
+    env = dict(os.environ,
+               CN_WEATHER_API_KEY="bench",
+               CN_WEATHER_API_BASE_URL=stub_url,
+               CN_WEATHER_API_RATE_LIMIT="1e9",
+               CN_WEATHER_ARCHIVE=str(Path(tmp) / f"archive-{workers}.db"),
+               CN_WEATHER_HTTP_SHARED_CACHE=str(Path(tmp) / f"shared-{workers}.db"))
+    server = subprocess.Popen(
+        [sys.executable, str(ROOT / "server.py"), "--transport", "streamable-http", "--stateless",
+         "--port", str(port), "--workers", str(workers)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+    try:
+        wait_until_ready(url)
+        # 预热：让每个工作进程的缓存都装入全部网格
+        asyncio.run(drive(url, len(CELLS), 1.0))
+
+        barrier = multiprocessing.Barrier(args.clients)
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client_process,
+                                           args=(url, args.concurrency, args.duration, barrier, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            part, part_errors = results.get()
+            latencies.extend(part)
+            errors += part_errors
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4, help="load-generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per load generator")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=8932)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_process()
+    print(f"clients={args.clients} concurrency={args.concurrency} duration={args.duration:.0f}s cpus={os.cpu_count()}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for workers in args.workers:
+                result = run(workers, args.port, stub_url, tmp, args)
+                print(f"workers={workers:<3} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:7.1f}ms "
+                      f"p95={result['p95_ms']:7.1f}ms  requests={result['requests']} errors={result['errors']}")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
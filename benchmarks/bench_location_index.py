@@ -0,0 +1,88 @@
+"""Compare per-call SQLite LIKE lookups with the in-memory LocationIndex.
+
+    python benchmarks/bench_location_index.py [--db data/weather_grid.db] [--queries 2000]
+
+Uses the real weather_grid database when present, otherwise a synthetic
+national-size table.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from location_index import LocationIndex  # noqa: E402
+from grid_fixture import build_grid_db  # noqa: E402
+
+
+def sqlite_like_lookup(db_path: Path, province: str, city: str, district: str):
+    """The lookup_grid SQLite fallback: one connection and full scan per call, exact match first."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT province, city, district, grid_x, grid_y FROM weather_grid "
+            "WHERE province LIKE ? AND city LIKE ? AND district LIKE ? "
+            "ORDER BY (province = ? AND city = ? AND district = ?) DESC, id LIMIT 1",
+            (f"%{province}%", f"%{city}%", f"%{district}%", province, city, district),
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def make_queries(rows: list[tuple], count: int, seed: int = 11) -> list[tuple[str, str, str]]:
+    """Mix of exact names, trimmed names (substring) and misses."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        province, city, district = rng.choice(rows)[:3]
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append((province, city, district))
+        elif kind < 0.9:
+            queries.append((province[:2], city[:2], district[:-1] or district))
+        else:
+            queries.append((province, city, district + "不存在"))
+    return queries
+
+
+def timed(fn, queries) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        fn(*query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main(db: Path | None, count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if db is None or not db.exists():
+            db = build_grid_db(Path(tmp) / "weather_grid.db")
+            print(f"using synthetic table at {db}")
+
+        start = time.perf_counter()
+        index = LocationIndex.from_sqlite(db)
+        print(f"rows={len(index)} index build={(time.perf_counter() - start) * 1000:.1f}ms")
+
+        queries = make_queries(index.rows, count)
+        sqlite_queries = queries[:max(1, count // 20)]  # 全表扫描较慢，取子集
+
+        per_sqlite = timed(lambda p, c, d: sqlite_like_lookup(db, p, c, d), sqlite_queries)
+        per_index = timed(index.lookup, queries)
+        print(f"sqlite LIKE  {per_sqlite * 1e6:10.1f} us/lookup ({len(sqlite_queries)} queries)")
+        print(f"memory index {per_index * 1e6:10.1f} us/lookup ({len(queries)} queries)")
+        print(f"speedup: {per_sqlite / per_index:.0f}x")
+
+        mismatches = [q for q in sqlite_queries if index.lookup(*q) != sqlite_like_lookup(db, *q)]
+        print(f"rows differing from SQLite: {len(mismatches)}")
+        assert not mismatches, f"index and SQLite resolve differently: {mismatches[:5]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, default=None)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.db, args.queries)
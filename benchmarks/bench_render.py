@@ -0,0 +1,121 @@
+"""Compare the full text rendering of forecasts with the compact table: output size and render time.
+
+    python benchmarks/bench_render.py --cells 500 --output render.json
+
+Forecasts are decoded from the synthetic stub payloads (with randomised
+temperature, wind direction and sky per hour) for three shapes: the 6-hour
+ultra-short-term forecast, the 3-day short-term forecast and the combined
+timeline of observation, nowcast and 3-day forecast. Each shape is rendered
+as full text and as a compact table with the default fields, and, for the
+3-day shapes, as a compact table restricted to a few fields and 24 hours.
+
+Size is reported in characters and UTF-8 bytes (what an MCP client pays for
+in context), time as the mean per render over --cells cells. The exit
+status is 1 when any default compact table is more than half the size of
+the full text.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import decode_forecast, render_forecast  # noqa: E402
+from decoder import decode_items, decode_observations  # noqa: E402
+from stub_upstream import (build_ultra_srt_ncst_payload, build_ultra_srt_payload,  # noqa: E402
+                           build_vilage_items)
+from timeline import merge_timeline  # noqa: E402
+
+LOCATION = ("北京市", "北京市", "朝阳区")
+NARROW = {"fields": ["temp", "pop", "wind"], "hours": 24}
+
+
+def _items(payload: dict) -> list:
+    return payload["response"]["body"]["items"]["item"]
+
+
+def randomise(items: list, rng: random.Random) -> list:
+    """Vary the readings that change per hour so rows do not all render alike."""
+    values = {"T1H": lambda: f"{rng.uniform(-10, 35):.1f}", "TMP": lambda: str(rng.randint(-10, 35)),
+              "VEC": lambda: str(rng.randint(0, 359)), "SKY": lambda: rng.choice("134")}
+    return [dict(item, fcstValue=values[item["category"]]()) if item["category"] in values else item
+            for item in items]
+
+
+def make_shapes(cells: int, seed: int = 7) -> dict[str, list[dict]]:
+    rng = random.Random(seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    ultra_base = now - timedelta(minutes=30)
+    vilage_base = now.replace(hour=now.hour // 3 * 3) - timedelta(hours=1)
+    shapes = {"ultra 6h": [], "vilage 3d": [], "combined": []}
+    for i in range(cells):
+        ultra = decode_forecast(randomise(_items(build_ultra_srt_payload(
+            i, i, ultra_base.strftime("%Y%m%d"), ultra_base.strftime("%H30"))), rng))
+        vilage = decode_items(randomise(list(build_vilage_items(
+            i, i, vilage_base.strftime("%Y%m%d"), vilage_base.strftime("%H00"))), rng)).to_columns()
+        observed = decode_observations(_items(build_ultra_srt_ncst_payload(
+            i, i, now.strftime("%Y%m%d"), now.strftime("%H00")))).to_columns()
+        shapes["ultra 6h"].append(ultra)
+        shapes["vilage 3d"].append(vilage)
+        shapes["combined"].append(merge_timeline({"ncst": observed, "ultra": ultra, "vilage": vilage}))
+    return shapes
+
+
+def measure(columns_list: list[dict], **options) -> dict[str, float]:
+    start = time.perf_counter()
+    outputs = [render_forecast(*LOCATION, columns, **options) for columns in columns_list]
+    elapsed = time.perf_counter() - start
+    return {
+        "chars": sum(len(text) for text in outputs) / len(outputs),
+        "bytes": sum(len(text.encode("utf-8")) for text in outputs) / len(outputs),
+        "render_us": elapsed / len(outputs) * 1e6,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=500, help="forecasts rendered per shape and mode")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    args = parser.parse_args()
+
+    shapes = make_shapes(args.cells)
+    print(f"cells={args.cells} python={platform.python_version()}")
+    print(f"{'shape':<10} {'mode':<16} {'chars':>8} {'bytes':>8} {'render':>10} {'size':>7}")
+    results, failed = {}, False
+    for shape, columns_list in shapes.items():
+        modes = {"text": {}, "compact": {"compact": True}}
+        if shape != "ultra 6h":
+            modes["compact narrow"] = {"compact": True, **NARROW}
+        results[shape] = {}
+        for mode, options in modes.items():
+            result = measure(columns_list, **options)
+            result["ratio"] = result["bytes"] / results[shape]["text"]["bytes"] if mode != "text" else 1.0
+            results[shape][mode] = result
+            print(f"{shape:<10} {mode:<16} {result['chars']:8.0f} {result['bytes']:8.0f} "
+                  f"{result['render_us']:8.1f}us {result['ratio']:6.0%}")
+        failed |= results[shape]["compact"]["ratio"] > 0.5
+
+    report = {
+        "benchmark": "render",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"cells": args.cells, "narrow": NARROW},
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"report written to {args.output}")
+    if failed:
+        print("compact output is more than half the size of the text output")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
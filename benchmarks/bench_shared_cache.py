@@ -0,0 +1,84 @@
+"""Count upstream calls when several server processes request the same cells.
+
+    python benchmarks/bench_shared_cache.py --processes 8 --cells 50
+
+Runs the workload twice against the local stub: once with per-process
+caches only and once with a shared WAL-mode SQLite cache file.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from stub_upstream import start_stub_server  # noqa: E402
+
+
+def worker(base_url: str, shared_path: str | None, cells: int, rounds: int, barrier) -> None:
+    os.environ["CN_WEATHER_API_BASE_URL"] = base_url
+    os.environ["CN_WEATHER_API_KEY"] = "bench"
+    os.environ["CN_WEATHER_API_RATE_LIMIT"] = "1e9"
+    if shared_path:
+        os.environ["CN_WEATHER_SHARED_CACHE"] = shared_path
+    sys.path.insert(0, str(ROOT))
+    import api
+    import utils
+
+    async def run():
+        client = utils.create_http_client()
+        utils.set_shared_client(client)
+        try:
+            barrier.wait()
+            for _ in range(rounds):
+                await asyncio.gather(*(
+                    api.get_forecast_api("p", "c", "d", 50 + i, 100 + i) for i in range(cells)
+                ))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def run_case(stub, shared_path: str | None, processes: int, cells: int, rounds: int) -> tuple[int, float]:
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(processes)
+    before = stub.request_count
+    procs = [
+        ctx.Process(target=worker, args=(stub.base_url, shared_path, cells, rounds, barrier))
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    return stub.request_count - before, time.perf_counter() - start
+
+
+def main(processes: int, cells: int, rounds: int) -> None:
+    stub = start_stub_server()
+    try:
+        upstream, elapsed = run_case(stub, None, processes, cells, rounds)
+        print(f"per-process cache  upstream calls={upstream:<6} elapsed={elapsed:6.2f}s")
+        with tempfile.TemporaryDirectory() as tmp:
+            shared_path = str(Path(tmp) / "shared_cache.db")
+            upstream_shared, elapsed = run_case(stub, shared_path, processes, cells, rounds)
+        print(f"shared cache       upstream calls={upstream_shared:<6} elapsed={elapsed:6.2f}s")
+        print(f"upstream reduction: {upstream / max(upstream_shared, 1):.1f}x (ideal {processes}x)")
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--cells", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    main(args.processes, args.cells, args.rounds)
@@ -0,0 +1,89 @@
+"""Compare single-page vs paginated streaming getVilageFcst fetches against the local stub.
+
+    python benchmarks/bench_vilage_fetch.py --cells 20 --delay 0.05 --days 3 6 12
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# 基准测试针对本地桩服务，不受 API 密钥配额的速率限制
+os.environ.setdefault("CN_WEATHER_API_RATE_LIMIT", "1e9")
+os.environ.setdefault("CN_WEATHER_API_KEY", "bench")
+
+import api  # noqa: E402
+import config  # noqa: E402
+import utils  # noqa: E402
+from cache import vilage_issuance  # noqa: E402
+from decoder import decode_items  # noqa: E402
+from stub_upstream import start_stub_process  # noqa: E402
+
+
+async def fetch_single_page(nx: int, ny: int) -> dict:
+    """Baseline: one request with a page large enough for every row, parsed in full, then decoded."""
+    issued_at, _ = vilage_issuance()
+    url = api.build_request_url(config.VILAGE_FCST_API_URL, "bench", numOfRows=100000, pageNo=1,
+                                base_date=issued_at.strftime("%Y%m%d"), base_time=issued_at.strftime("%H%M"),
+                                nx=nx, ny=ny)
+    data = await utils.request_json(url)
+    return decode_items(data["response"]["body"]["items"]["item"]).to_columns()
+
+
+async def fetch_paginated(nx: int, ny: int) -> dict:
+    api.forecast_cache.clear()
+    api.last_good_forecasts.clear()
+    columns, _ = await api.fetch_vilage_forecast(nx, ny, allow_stale=False)
+    return columns
+
+
+async def measure(fetch, cells: int) -> tuple[float, int, int]:
+    """Return (mean latency, max per-fetch peak traced bytes, rows) for fetching `cells` cells one after another."""
+    await fetch(60, 127)  # 预热连接池
+    elapsed = 0.0
+    peak = rows = 0
+    tracemalloc.start()
+    for i in range(cells):
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        columns = await fetch(60 + i, 127)
+        elapsed += time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        rows = len(columns["fcst_time"])
+        del columns
+    tracemalloc.stop()
+    return elapsed / cells, peak, rows
+
+
+async def main(cells: int, delay: float, days_list: list[int]) -> None:
+    print(f"cells={cells} delay={delay * 1000:.0f}ms page_size={config.VILAGE_PAGE_SIZE} "
+          f"page_concurrency={config.VILAGE_PAGE_CONCURRENCY}")
+    for days in days_list:
+        # 每个预报时长启动一个独立的桩服务进程
+        process, base_url = start_stub_process(delay, days)
+        config.VILAGE_FCST_API_URL = f"{base_url}/getVilageFcst"
+        client = utils.create_http_client()
+        utils.set_shared_client(client)
+        try:
+            single = await measure(fetch_single_page, cells)
+            paged = await measure(fetch_paginated, cells)
+        finally:
+            utils.set_shared_client(None)
+            await client.aclose()
+            process.terminate()
+        print(f"days={days:<3} rows={single[2]:<5} "
+              f"single page {single[0] * 1000:7.1f}ms peak {single[1] / 1024:7.0f}KiB | "
+              f"paginated stream {paged[0] * 1000:7.1f}ms peak {paged[1] / 1024:7.0f}KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cells", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05, help="stub response delay in seconds")
+    parser.add_argument("--days", type=int, nargs="+", default=[3, 6, 12])
+    args = parser.parse_args()
+    asyncio.run(main(args.cells, args.delay, args.days))
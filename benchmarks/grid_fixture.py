@@ -0,0 +1,60 @@
+"""Synthetic national-size weather_grid table for benchmarks without nxy.xlsx."""
+import random
+import sqlite3
+from pathlib import Path
+
+PROVINCE_SUFFIXES = ("省", "市", "自治区")
+CITY_SUFFIXES = ("市", "州", "地区")
+DISTRICT_SUFFIXES = ("区", "县", "街道", "镇", "乡")
+CHARS = "东南西北中安平阳山河江湖海林春朝华兴宁德明光新城昌永和丰泰康福清长乐云龙凤金玉"
+
+
+def _name(rng: random.Random, suffixes: tuple[str, ...]) -> str:
+    return "".join(rng.choice(CHARS) for _ in range(rng.randint(2, 3))) + rng.choice(suffixes)
+
+
+def synthetic_rows(provinces: int = 34, cities: int = 12, districts: int = 100, seed: int = 7) -> list[tuple]:
+    """Generate (province, city, district, grid_x, grid_y) rows; defaults give ~40k rows."""
+    rng = random.Random(seed)
+    rows = []
+    seen = set()
+    for _ in range(provinces):
+        province = _name(rng, PROVINCE_SUFFIXES)
+        for _ in range(cities):
+            city = _name(rng, CITY_SUFFIXES)
+            base_x, base_y = rng.randint(1, 140), rng.randint(1, 240)
+            for _ in range(districts):
+                district = _name(rng, DISTRICT_SUFFIXES)
+                if (province, city, district) in seen:
+                    continue
+                seen.add((province, city, district))
+                rows.append((province, city, district,
+                             max(1, base_x + rng.randint(-5, 5)), max(1, base_y + rng.randint(-5, 5))))
+    return rows
+
+
+def build_grid_db(path: Path, rows: list[tuple] | None = None) -> Path:
+    """Create a weather_grid table matching migrate.py's schema at path."""
+    rows = rows if rows is not None else synthetic_rows()
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("DROP TABLE IF EXISTS weather_grid")
+        conn.execute('''
+        CREATE TABLE weather_grid (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            province TEXT NOT NULL,
+            city TEXT NOT NULL,
+            district TEXT NOT NULL,
+            grid_x INTEGER NOT NULL,
+            grid_y INTEGER NOT NULL,
+            UNIQUE(province, city, district)
+        )
+        ''')
+        conn.executemany(
+            "INSERT INTO weather_grid (province, city, district, grid_x, grid_y) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
@@ -0,0 +1,334 @@
+"""Local stand-in for the data.go.kr forecast service used by the benchmarks.
+
+Serves synthetic ``getUltraSrtNcst``, ``getUltraSrtFcst`` and paginated
+``getVilageFcst`` payloads over HTTP/1.1 keep-alive so client-side changes can be measured without
+touching the real endpoint.
+
+``getUltraSrtFcst`` can instead replay recorded responses: save real response
+bodies as ``*.json`` files (e.g. with ``curl '<getUltraSrtFcst URL>&dataType=JSON'``)
+and pass the file or directory as ``--replay``. Recordings are served round-robin
+with their issuance and grid coordinates rewritten to match each request.
+
+Latency (fixed delay plus uniform jitter) and error injection (HTTP 429/500/503,
+dropped connections, ``NO_DATA`` result codes) can be configured to exercise
+the client's retry, circuit-breaker and stale-fallback paths:
+
+    python benchmarks/stub_upstream.py --port 8765 --delay 0.05 --jitter 0.02 --error-rate 0.05
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import threading
+import time
+from functools import lru_cache
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# 超短期预报每小时包含的类别
+ULTRA_SRT_CATEGORIES = {
+    "T1H": "21", "RN1": "无降水", "SKY": "1", "UUU": "-1.2", "VVV": "0.8",
+    "REH": "55", "PTY": "0", "LGT": "0", "VEC": "245", "WSD": "2",
+}
+
+# 超短期实况包含的观测类别（RN1 为以毫米计的数值）
+ULTRA_SRT_NCST_CATEGORIES = {
+    "T1H": "20.4", "RN1": "0", "UUU": "-1.0", "VVV": "0.6", "REH": "58", "PTY": "0", "VEC": "240", "WSD": "1.8",
+}
+
+# 短期预报每小时包含的类别（TMN / TMX 只出现在 06 时和 15 时）
+VILAGE_CATEGORIES = {
+    "TMP": "18", "UUU": "1.5", "VVV": "-0.4", "VEC": "290", "WSD": "3.1",
+    "SKY": "3", "PTY": "0", "POP": "20", "WAV": "0", "PCP": "无降水",
+    "REH": "60", "SNO": "无积雪",
+}
+VILAGE_DAILY_CATEGORIES = {"0600": ("TMN", "9.0"), "1500": ("TMX", "21.0")}
+
+
+# 可注入的故障类型：HTTP 状态码、直接断开连接、上游业务错误（resultCode 非 00）
+ERROR_KINDS = ("429", "500", "503", "reset", "no_data")
+
+
+def _wrap_items(items: list, page_no: int = 1, total_count: int | None = None) -> dict:
+    return {
+        "response": {
+            "header": {"resultCode": "00", "resultMsg": "NORMAL_SERVICE"},
+            "body": {
+                "dataType": "JSON",
+                "items": {"item": items},
+                "pageNo": page_no,
+                "numOfRows": len(items),
+                "totalCount": len(items) if total_count is None else total_count,
+            },
+        }
+    }
+
+
+@lru_cache(maxsize=64)
+def build_vilage_items(nx: int, ny: int, base_date: str, base_time: str, days: int = 3) -> tuple[dict, ...]:
+    """Build getVilageFcst items (time-major, one row per category per hour).
+
+    Cached so that serving many pages of one cell does not rebuild every row per page.
+    """
+    base = datetime.strptime(base_date + base_time[:2], "%Y%m%d%H")
+    items = []
+    for h in range(1, days * 24 + 1):
+        fcst = base + timedelta(hours=h)
+        fcst_time = fcst.strftime("%H00")
+        categories = dict(VILAGE_CATEGORIES)
+        if fcst_time in VILAGE_DAILY_CATEGORIES:
+            category, value = VILAGE_DAILY_CATEGORIES[fcst_time]
+            categories[category] = value
+        for category, value in categories.items():
+            items.append({
+                "baseDate": base_date,
+                "baseTime": base_time,
+                "category": category,
+                "fcstDate": fcst.strftime("%Y%m%d"),
+                "fcstTime": fcst_time,
+                "fcstValue": value,
+                "nx": nx,
+                "ny": ny,
+            })
+    return tuple(items)
+
+
+def build_vilage_payload(nx: int, ny: int, base_date: str, base_time: str,
+                         page_no: int = 1, num_of_rows: int = 1000, days: int = 3) -> dict:
+    """Build one page of a getVilageFcst-shaped response body."""
+    items = build_vilage_items(nx, ny, base_date, base_time, days)
+    start = (page_no - 1) * num_of_rows
+    return _wrap_items(list(items[start:start + num_of_rows]), page_no, len(items))
+
+
+def build_ultra_srt_payload(nx: int, ny: int, base_date: str, base_time: str, hours: int = 6) -> dict:
+    """Build a getUltraSrtFcst-shaped response body for one grid cell."""
+    base = datetime.strptime(base_date + base_time[:2], "%Y%m%d%H")
+    items = []
+    for category, value in ULTRA_SRT_CATEGORIES.items():
+        for h in range(1, hours + 1):
+            fcst = base + timedelta(hours=h)
+            items.append({
+                "baseDate": base_date,
+                "baseTime": base_time,
+                "category": category,
+                "fcstDate": fcst.strftime("%Y%m%d"),
+                "fcstTime": fcst.strftime("%H00"),
+                "fcstValue": value,
+                "nx": nx,
+                "ny": ny,
+            })
+    return _wrap_items(items)
+
+
+def build_ultra_srt_ncst_payload(nx: int, ny: int, base_date: str, base_time: str) -> dict:
+    """Build a getUltraSrtNcst-shaped response body (one observation per category)."""
+    items = [{
+        "baseDate": base_date,
+        "baseTime": base_time,
+        "category": category,
+        "nx": nx,
+        "ny": ny,
+        "obsrValue": value,
+    } for category, value in ULTRA_SRT_NCST_CATEGORIES.items()]
+    return _wrap_items(items)
+
+
+def load_recordings(path: str | Path) -> list[dict]:
+    """Load recorded getUltraSrtFcst response bodies from a JSON file or a directory of them."""
+    path = Path(path)
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    recordings = []
+    for file in files:
+        payload = json.loads(file.read_text(encoding="utf-8"))
+        items = payload["response"]["body"]["items"]["item"]
+        if not items:
+            raise ValueError(f"recording has no forecast items: {file}")
+        recordings.append(payload)
+    if not recordings:
+        raise ValueError(f"no recordings found in {path}")
+    return recordings
+
+
+def replay_payload(recording: dict, nx: int, ny: int, base_date: str, base_time: str) -> dict:
+    """Re-issue a recorded response for the requested cell and issuance.
+
+    Forecast times keep their offset from the recorded issuance, so the replayed
+    forecast looks as fresh as the original did when it was captured.
+    """
+    items = recording["response"]["body"]["items"]["item"]
+    recorded_base = datetime.strptime(items[0]["baseDate"] + items[0]["baseTime"], "%Y%m%d%H%M")
+    shift = datetime.strptime(base_date + base_time, "%Y%m%d%H%M") - recorded_base
+    replayed = []
+    for item in items:
+        fcst = datetime.strptime(item["fcstDate"] + item["fcstTime"], "%Y%m%d%H%M") + shift
+        replayed.append(dict(item, baseDate=base_date, baseTime=base_time, nx=nx, ny=ny,
+                             fcstDate=fcst.strftime("%Y%m%d"), fcstTime=fcst.strftime("%H%M")))
+    return _wrap_items(replayed)
+
+
+def build_error_payload(code: str = "03", message: str = "NO_DATA") -> dict:
+    """Upstream business error: HTTP 200 with a non-00 resultCode and no body."""
+    return {"response": {"header": {"resultCode": code, "resultMsg": message}}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        now = datetime.now()
+        args = (
+            int(float(query.get("nx", ["60"])[0])),
+            int(float(query.get("ny", ["127"])[0])),
+            query.get("base_date", [now.strftime("%Y%m%d")])[0],
+            query.get("base_time", [now.strftime("%H%M")])[0],
+        )
+        server = self.server
+        server.request_count += 1
+        delay = server.next_delay()
+        if delay:
+            time.sleep(delay)
+
+        status = 200
+        error = server.next_error()
+        if error == "reset":
+            # 不返回任何响应直接断开，客户端表现为连接错误
+            self.close_connection = True
+            return
+        if error == "no_data":
+            payload = build_error_payload()
+        elif error is not None:
+            status = int(error)
+            payload = build_error_payload(error, "INJECTED_ERROR")
+        elif url.path.endswith("/getVilageFcst"):
+            payload = build_vilage_payload(
+                *args,
+                page_no=int(query.get("pageNo", ["1"])[0]),
+                num_of_rows=int(query.get("numOfRows", ["1000"])[0]),
+                days=server.vilage_days,
+            )
+        elif url.path.endswith("/getUltraSrtNcst"):
+            payload = build_ultra_srt_ncst_payload(*args)
+        elif server.recordings:
+            payload = replay_payload(server.next_recording(), *args)
+        else:
+            payload = build_ultra_srt_payload(*args)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, StubHandler)
+        self.request_count = 0
+        self.error_count = 0
+        self.response_delay = 0.0   # 每个响应的附加延迟（秒），模拟上游往返时间
+        self.latency_jitter = 0.0   # 在附加延迟上再随机增加 [0, jitter] 秒
+        self.error_rate = 0.0       # 注入故障的请求比例
+        self.error_kinds: tuple[str, ...] = ERROR_KINDS
+        self.vilage_days = 3        # getVilageFcst 覆盖的天数
+        self.recordings: list[dict] = []
+        self._recording_cycle = None
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def configure(self, response_delay: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                  error_kinds: tuple[str, ...] = ERROR_KINDS, vilage_days: int = 3,
+                  replay: str | Path | None = None, seed: int | None = None) -> "StubServer":
+        unknown = set(error_kinds) - set(ERROR_KINDS)
+        if unknown:
+            raise ValueError(f"unknown error kinds: {', '.join(sorted(unknown))}")
+        self.response_delay = response_delay
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_kinds = tuple(error_kinds)
+        self.vilage_days = vilage_days
+        self.recordings = load_recordings(replay) if replay else []
+        self._recording_cycle = itertools.cycle(self.recordings) if self.recordings else None
+        self._random = random.Random(seed)
+        return self
+
+    def next_delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+        return self.response_delay + jitter
+
+    def next_error(self) -> str | None:
+        """Pick the fault to inject for this request, or None to answer normally."""
+        if not self.error_rate:
+            return None
+        with self._lock:
+            if self._random.random() >= self.error_rate:
+                return None
+            self.error_count += 1
+            return self._random.choice(self.error_kinds)
+
+    def next_recording(self) -> dict:
+        with self._lock:
+            return next(self._recording_cycle)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(address=("127.0.0.1", 0)) -> StubServer:
+    """Start the stub server on a background thread and return it."""
+    server = StubServer(address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve_in_process(ready, settings: dict) -> None:
+    server = StubServer().configure(**settings)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+def start_stub_process(response_delay: float = 0.0, vilage_days: int = 3,
+                       **settings) -> tuple[multiprocessing.Process, str]:
+    """Start the stub server in a separate process so payload generation does not share the
+    benchmark's GIL. Extra keyword arguments are passed to StubServer.configure().
+    Returns (process, base_url); terminate the process when done."""
+    settings.update(response_delay=response_delay, vilage_days=vilage_days)
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_in_process, args=(ready, settings), daemon=True)
+    process.start()
+    return process, ready.get(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="fixed response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a fault")
+    parser.add_argument("--errors", nargs="+", default=list(ERROR_KINDS), choices=ERROR_KINDS)
+    parser.add_argument("--replay", help="recorded getUltraSrtFcst response (.json) or a directory of them")
+    parser.add_argument("--days", type=int, default=3, help="days covered by getVilageFcst")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    server = StubServer((args.host, args.port)).configure(
+        response_delay=args.delay, latency_jitter=args.jitter, error_rate=args.error_rate,
+        error_kinds=tuple(args.errors), vilage_days=args.days, replay=args.replay, seed=args.seed,
+    )
+    source = f"replaying {len(server.recordings)} recording(s)" if server.recordings else "synthetic payloads"
+    print(f"Stub upstream listening on {server.base_url} ({source})")
+    server.serve_forever()
@@ -0,0 +1,230 @@
+import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Hashable
+
+import logs
+from shared_cache import SharedForecastStore
+
+logger = logs.get_logger("cache")
+
+# 超短期预报（getUltraSrtFcst）每小时以 HH30 为发布时次，约在 HH45 之后可供查询
+ULTRA_SRT_BASE_MINUTE = 30
+ULTRA_SRT_PUBLISH_MINUTE = 45
+
+
+def ultra_srt_issuance(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """返回当前可用的超短期预报发布时次及其失效时间（即下一时次发布时间）
+
+    Args:
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        tuple: (发布时次 base datetime, 下一时次发布时间)
+    """
+    now = now or datetime.now()
+    base = now.replace(minute=ULTRA_SRT_BASE_MINUTE, second=0, microsecond=0)
+    if now.minute < ULTRA_SRT_PUBLISH_MINUTE:
+        base -= timedelta(hours=1)
+    next_publish = base + timedelta(hours=1, minutes=ULTRA_SRT_PUBLISH_MINUTE - ULTRA_SRT_BASE_MINUTE)
+    return base, next_publish
+
+
+# 超短期实况（getUltraSrtNcst）每小时整点观测一次，约在 HH40 之后可供查询
+ULTRA_SRT_NCST_PUBLISH_MINUTE = 40
+
+
+def ultra_srt_ncst_issuance(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """返回当前可用的超短期实况观测时次及其失效时间（即下一次观测可供查询的时间）
+
+    Args:
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        tuple: (观测时次 base datetime, 下一时次发布时间)
+    """
+    now = now or datetime.now()
+    base = now.replace(minute=0, second=0, microsecond=0)
+    if now.minute < ULTRA_SRT_NCST_PUBLISH_MINUTE:
+        base -= timedelta(hours=1)
+    next_publish = base + timedelta(hours=1, minutes=ULTRA_SRT_NCST_PUBLISH_MINUTE)
+    return base, next_publish
+
+
+# 短期预报（getVilageFcst）每天 8 个发布时次，约在发布时次 10 分钟后可供查询
+VILAGE_BASE_HOURS = (2, 5, 8, 11, 14, 17, 20, 23)
+VILAGE_PUBLISH_DELAY = timedelta(minutes=10)
+
+
+def vilage_issuance(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """返回当前可用的短期预报发布时次及其失效时间（即下一时次可供查询的时间）
+
+    Args:
+        now: 参考时间，默认为当前时间
+
+    Returns:
+        tuple: (发布时次 base datetime, 下一时次发布时间)
+    """
+    now = now or datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # 候选时次：前一天 23 时及当天各时次，取最后一个已可查询的
+    candidates = [midnight - timedelta(hours=1)] + [midnight + timedelta(hours=h) for h in VILAGE_BASE_HOURS]
+    available = [base for base in candidates if base + VILAGE_PUBLISH_DELAY <= now]
+    base = available[-1]
+    following = candidates[len(available)] if len(available) < len(candidates) else midnight + timedelta(days=1, hours=VILAGE_BASE_HOURS[0])
+    return base, following + VILAGE_PUBLISH_DELAY
+
+
+class ForecastCache:
+    """按发布时次失效的进程内 TTL 缓存，并对并发的相同请求做 single-flight 合并
+
+    配置 shared 后，本地未命中时先查询跨进程共享缓存，并通过租约保证同一 key
+    在整台主机上只有一个进程请求上游。
+    """
+
+    def __init__(self, max_entries: int = 4096, shared: SharedForecastStore | None = None,
+                 lease_ttl: float = 10.0, poll_interval: float = 0.05):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """返回未过期的缓存值，不存在或已过期时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, expires_at: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """命中则直接返回；否则调用 fetch，并让同一 key 的并发请求共享这一次上游调用
+
+        fetch 返回 None 或抛出异常时不写入缓存。
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fetch_and_store(key, expires_at, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # shield: 单个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: Hashable, expires_at: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if self.shared is not None:
+            value = await self._fetch_shared(key, expires_at, fetch)
+        else:
+            value = await fetch()
+        if value is not None:
+            self.set(key, value, expires_at)
+        return value
+
+    async def _fetch_shared(self, key: Hashable, expires_at: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """经由共享缓存获取：命中则直接使用，否则持有租约的进程请求上游，其余进程等待其写回"""
+        shared = self.shared
+        holds_lease = False
+        try:
+            deadline = time.monotonic() + self.lease_ttl
+            while True:
+                value = await asyncio.to_thread(shared.get, key)
+                if value is not None:
+                    self.shared_hits += 1
+                    return value
+                holds_lease = await asyncio.to_thread(shared.acquire_lease, key, self.lease_ttl)
+                if holds_lease:
+                    # 上一个持有者可能恰好在两次查询之间写回并释放了租约
+                    value = await asyncio.to_thread(shared.get, key)
+                    if value is not None:
+                        await asyncio.to_thread(shared.release_lease, key)
+                        self.shared_hits += 1
+                        return value
+                    break
+                # 租约持有者超时未写回时不再等待，自行请求上游
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        except sqlite3.Error as e:
+            logger.warning("共享缓存读取失败，直接请求上游",
+                           extra={"error": str(e), "sample_key": "shared_cache:read"})
+            return await fetch()
+
+        value = None
+        try:
+            value = await fetch()
+        finally:
+            try:
+                if value is not None:
+                    await asyncio.to_thread(shared.set, key, value, expires_at)
+                elif holds_lease:
+                    await asyncio.to_thread(shared.release_lease, key)
+            except sqlite3.Error as e:
+                logger.warning("共享缓存写入失败", extra={"error": str(e), "sample_key": "shared_cache:write"})
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        """返回命中、未命中与合并请求的计数"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "shared_hits": self.shared_hits,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class HotCellTracker:
+    """统计各网格被请求的频次，用于挑选需要预热的热点网格"""
+
+    def __init__(self, max_cells: int = 10000):
+        self.max_cells = max_cells
+        self._counts: dict[tuple[int, int], float] = {}
+
+    def record(self, nx: int, ny: int) -> None:
+        cell = (int(nx), int(ny))
+        self._counts[cell] = self._counts.get(cell, 0) + 1
+        if len(self._counts) > self.max_cells:
+            # 超出上限时丢弃计数最少的一半
+            keep = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:self.max_cells // 2]
+            self._counts = dict(keep)
+
+    def top(self, n: int) -> list[tuple[int, int]]:
+        """返回请求频次最高的 n 个网格"""
+        return [cell for cell, _ in sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:n]]
+
+    def decay(self, factor: float = 0.5) -> None:
+        """按比例衰减历史计数，使热点排名跟随近期请求变化"""
+        self._counts = {cell: count * factor for cell, count in self._counts.items() if count * factor >= 0.5}
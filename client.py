@@ -35,51 +35,17 @@ async def run():
             tools = await session.list_tools()
             print(f"Available tools: {tools}")
 
-            # 示例：调用 get_grid_location 工具获取网格坐标
+            # 示例：调用 get_forecast_by_name 工具，一次完成网格坐标解析与天气预报查询
             province = "北京市"
             city = "北京市"
             district = "朝阳区"
 
-            grid_result = await session.call_tool(
-                "get_grid_location",
-                arguments={
-                    "province": province,
-                    "city": city,
-                    "district": district
-                }
-            )
-            print(f"Grid location result: {grid_result}")
-
-            # 解析返回结果中的 Nx 和 Ny 值
-            nx, ny = None, None
-            try:
-                if grid_result.content and len(grid_result.content) > 0:
-                    result_text = grid_result.content[0].text
-                    if not result_text.startswith("No location") and not result_text.startswith("Error"):
-                        parts = result_text.split(", ")
-                        for part in parts:
-                            if part.startswith("Grid X:"):
-                                nx = int(part.split(": ")[1])
-                            elif part.startswith("Grid Y:"):
-                                ny = int(part.split(": ")[1])
-            except Exception as e:
-                print(f"解析网格坐标时出错: {e}")
-
-            if nx is None or ny is None:
-                print("无法获取有效的网格坐标，请检查输入地区是否正确。")
-                return
-
-            print(f"获取到网格坐标: Grid X={nx}, Grid Y={ny}")
-
-            # 调用 get_forecast 工具获取天气预报
             forecast_result = await session.call_tool(
-                "get_forecast",
+                "get_forecast_by_name",
                 arguments={
                     "province": province,
                     "city": city,
-                    "district": district,
-                    "nx": nx,
-                    "ny": ny
+                    "district": district
                 }
             )
 
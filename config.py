@@ -1,7 +1,13 @@
 # config.py
+import os
 
-# API 配置
-WEATHER_API_URL = "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getUltraSrtFcst"
+# API 配置（可通过环境变量指向本地桩服务等替代地址）
+WEATHER_API_BASE_URL = os.environ.get(
+    "CN_WEATHER_API_BASE_URL", "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0"
+)
+WEATHER_API_URL = f"{WEATHER_API_BASE_URL}/getUltraSrtFcst"
+VILAGE_FCST_API_URL = f"{WEATHER_API_BASE_URL}/getVilageFcst"  # 短期（3 日）预报
+ULTRA_SRT_NCST_API_URL = f"{WEATHER_API_BASE_URL}/getUltraSrtNcst"  # 超短期实况（当前观测）
 WEATHER_API_SERVICE_KEY_ENV_NAME = "CN_WEATHER_API_KEY"  # 环境变量名
 
 # 默认请求参数
@@ -11,8 +17,100 @@ DEFAULT_REQUEST_PARAMS = {
     "pageNo": 1,
 }
 
-# 请求超时时间（秒）
-REQUEST_TIMEOUT = 30.0
+# 短期预报分页：每个网格约 1000 条，按预计条数与首页同时并发请求各页，
+# 首页返回的 totalCount 多于预计时再补请求其余页
+VILAGE_PAGE_SIZE = 250
+VILAGE_PAGE_CONCURRENCY = 4
+VILAGE_EXPECTED_ROWS = 1000          # 初始预计条数，之后使用最近一次响应的 totalCount
+
+# 单次请求超时时间（秒），可通过环境变量覆盖
+REQUEST_TIMEOUT = float(os.environ.get("CN_WEATHER_REQUEST_TIMEOUT", 10.0))
+
+# 上游请求速率限制（令牌桶），应与 API 密钥的调用配额保持一致
+API_RATE_LIMIT_PER_SECOND = float(os.environ.get("CN_WEATHER_API_RATE_LIMIT", 10.0))
+API_RATE_LIMIT_BURST = 20            # 允许的突发请求数
+API_RATE_LIMIT_MAX_WAIT = 5.0        # 等待令牌的最长时间（秒），超过则视为失败
+
+# 重试：仅针对超时、连接错误、429 及 5xx 等临时性错误
+RETRY_MAX_ATTEMPTS = 3               # 含首次请求在内的最多尝试次数
+RETRY_BACKOFF_BASE = 0.5             # 指数退避基数（秒），实际等待时间随机抖动
+RETRY_BACKOFF_MAX = 4.0              # 单次退避上限（秒）
+RETRY_TOTAL_DEADLINE = 20.0          # 单次调用（含所有重试）的总时限（秒）
+
+# 熔断器：连续失败达到阈值后快速失败，冷却期后放行一个探测请求
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30.0         # 熔断冷却时间（秒）
+
+# 上游不可用时返回最近一次成功获取的预报（标记为过期数据）的最长时效（秒）
+STALE_FORECAST_MAX_AGE = 6 * 3600
+
+# HTTP 连接池配置（由服务器生命周期持有的共享客户端使用）
+HTTP_POOL_MAX_CONNECTIONS = 100      # 最大并发连接数
+HTTP_POOL_MAX_KEEPALIVE = 20         # 最大保持存活的空闲连接数
+HTTP_KEEPALIVE_EXPIRY = 30.0         # 空闲连接保持时间（秒）
+HTTP2_ENABLED = False                # 是否启用 HTTP/2（需要安装 h2）
+
+# 预报缓存最大条目数（按 (nx, ny, 发布时次) 计）
+FORECAST_CACHE_MAX_ENTRIES = 4096
+
+# 跨进程共享缓存文件路径（WAL 模式 SQLite），未设置时仅使用进程内缓存
+SHARED_CACHE_PATH = os.environ.get("CN_WEATHER_SHARED_CACHE") or None
+
+# 预报归档：每次从上游获取的预报解码后追加写入本地 SQLite，供 get_forecast_history 查询
+ARCHIVE_ENABLED = True
+ARCHIVE_PATH = os.environ.get("CN_WEATHER_ARCHIVE") or None   # 默认为 data/forecast_archive.db
+ARCHIVE_BATCH_ROWS = 5000          # 缓冲区达到该行数时立即写入
+ARCHIVE_FLUSH_INTERVAL = 5.0       # 定期写入间隔（秒）
+ARCHIVE_HISTORY_MAX_DAYS = 90      # get_forecast_history 单次查询的最大天数
+
+# 后台预热：每次超短期预报发布后刷新热点网格（SUPPORTED_LOCATIONS + 请求最频繁的网格）
+# 未设置 CN_WEATHER_PREWARM 时只在长期运行的 HTTP 服务器中启用：stdio 客户端每个会话启动一个进程，
+# 预热会让只解析地名的会话也消耗上游配额；设为 1 / 0 可强制开启或关闭
+PREWARM_ENABLED: bool | None = os.environ["CN_WEATHER_PREWARM"] != "0" if os.environ.get("CN_WEATHER_PREWARM") else None
+PREWARM_TOP_N = 200             # 按请求频次挑选的热点网格数
+PREWARM_BUDGET = 300            # 每个发布时次最多预热的网格数（上游调用预算）
+PREWARM_CONCURRENCY = 4         # 预热并发请求数
+PREWARM_JITTER_SECONDS = 60.0   # 发布后随机延迟的上限，避免多个实例同时请求
+PREWARM_START_DELAY_SECONDS = 5.0   # 启动后首轮预热的延迟，避免与会话的首个请求争用（stdio 客户端每个会话启动一个进程）
+
+# 预报订阅（weather://forecast/{nx}/{ny}）：每个发布时次刷新已订阅的网格，只在变化超过以下阈值时通知
+SUBSCRIPTION_TEMP_DELTA = 2.0           # 气温变化（℃）
+SUBSCRIPTION_HUMIDITY_DELTA = 10.0      # 湿度变化（%）
+SUBSCRIPTION_WIND_SPEED_DELTA = 2.0     # 风速变化（m/s）
+SUBSCRIPTION_MAX_CELLS = 500            # 每个进程最多订阅的网格数
+SUBSCRIPTION_CONCURRENCY = 8            # 刷新订阅网格的并发请求数
+SUBSCRIPTION_JITTER_SECONDS = 10.0      # 发布后随机延迟的上限
+
+# 经纬度转网格：单次调用最多转换的坐标点数
+GRID_COORDINATES_MAX_POINTS = 5000
+
+# 批量解析地区网格坐标（resolve_locations）：单次调用最多解析的地区数
+RESOLVE_MAX_LOCATIONS = 50000
+
+# HTTP 传输（python server.py --transport streamable-http / sse），命令行参数可覆盖以下默认值
+HTTP_HOST = os.environ.get("CN_WEATHER_HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("CN_WEATHER_HTTP_PORT", "8000"))
+HTTP_WORKERS = int(os.environ.get("CN_WEATHER_HTTP_WORKERS", "1"))   # 工作进程数（共享同一监听端口）
+HTTP_BACKLOG = 2048                   # 监听队列长度
+HTTP_LIMIT_CONCURRENCY = 512          # 每个工作进程的最大并发连接数，超出时返回 503
+HTTP_KEEPALIVE_TIMEOUT = 15           # 空闲 keep-alive 连接保留时间（秒）
+HTTP_GRACEFUL_TIMEOUT = 30.0          # 收到停止信号后等待进行中请求完成的时间（秒）
+HTTP_MAX_SESSIONS = 1000              # 有状态会话模式下每个工作进程的最大会话数
+HTTP_SESSION_IDLE_TIMEOUT = 600.0     # 有状态会话的空闲超时（秒）
+HTTP_SHARED_CACHE_PATH = os.environ.get("CN_WEATHER_HTTP_SHARED_CACHE") or None   # 多工作进程时未设置 SHARED_CACHE_PATH 的默认共享缓存，默认为 data/shared_cache.db
+
+# 运行指标：weather://metrics 资源始终可用；设置端口后另在本地提供 Prometheus 文本格式（/metrics）
+METRICS_HOST = os.environ.get("CN_WEATHER_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ["CN_WEATHER_METRICS_PORT"]) if os.environ.get("CN_WEATHER_METRICS_PORT") else None
+
+# 批量预报：单次最多地区数与上游并发请求数
+BATCH_MAX_LOCATIONS = 100
+BATCH_MAX_CONCURRENCY = 8
+
+# 区域汇总（get_region_summary）：单次最多请求的网格数、上游并发请求数与列出的有降水网格数
+REGION_MAX_CELLS = 1000
+REGION_MAX_CONCURRENCY = 16
+REGION_LISTED_WET_CELLS = 20
 
 # 用户代理标识
 USER_AGENT = "cn-weather-app/1.0"
@@ -26,6 +124,14 @@ SUPPORTED_LOCATIONS = {
     "成都市": {"province": "四川省", "city": "成都市", "district": "武侯区", "nx": 54, "ny": 105},
 }
 
-# 日志配置
-LOG_LEVEL = "INFO"  # 可选: DEBUG, INFO, WARNING, ERROR, CRITICAL
-LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
\ No newline at end of file
+# 日志配置：记录经有界队列交给后台线程写入，调用方不做格式化与文件 IO；不写 stdout（stdio 传输的协议通道）
+LOG_LEVEL = os.environ.get("CN_WEATHER_LOG_LEVEL", "INFO").upper()  # 可选: DEBUG, INFO, WARNING, ERROR, CRITICAL
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"   # LOG_JSON 关闭时使用
+LOG_JSON = os.environ.get("CN_WEATHER_LOG_JSON", "1") != "0"   # 每行一个 JSON 对象（含请求关联 ID 与结构化字段）
+LOG_FILE = os.environ.get("CN_WEATHER_LOG_FILE")   # 默认为项目根目录下的 app.log，设为空字符串时不写文件
+LOG_MAX_BYTES = 10 * 1024 * 1024     # 日志文件达到该大小时轮转
+LOG_BACKUP_COUNT = 5                 # 保留的轮转文件数（app.log.1 ... app.log.5）
+LOG_STDERR = True                    # 同时输出到 stderr
+LOG_QUEUE_SIZE = 10000               # 待写入队列长度，队列满时丢弃新记录并计数
+LOG_SAMPLE_BURST = 5                 # 同类重复日志（如解码错误）每个时间窗口内最多记录的条数
+LOG_SAMPLE_WINDOW_SECONDS = 60.0     # 采样时间窗口（秒）
\ No newline at end of file
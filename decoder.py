@@ -0,0 +1,311 @@
+import re
+
+import logs
+
+logger = logs.get_logger("decoder")
+
+# 风向映射（中文）
+wind_direction_cn = {
+    'N': '北',
+    'NNE': '东北偏北',
+    'NE': '东北',
+    'ENE': '东偏北',
+    'E': '东',
+    'ESE': '东偏南',
+    'SE': '东南',
+    'SSE': '东南偏南',
+    'S': '南',
+    'SSW': '西南偏南',
+    'SW': '西南',
+    'WSW': '西偏南',
+    'W': '西',
+    'WNW': '西偏北',
+    'NW': '西北',
+    'NNW': '西北偏北'
+}
+
+# 16 方位风向代码，下标即方位序号（每 22.5 度一个方位，以正北为中心）
+WIND_BINS = ('N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+             'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW')
+WIND_BINS_CN = tuple(wind_direction_cn[code] for code in WIND_BINS)
+
+# 天气状态代码映射
+sky_code = {
+    1: '晴',
+    3: '多云',
+    4: '阴'
+}
+
+# 降水类型代码映射
+rain_type_code = {
+    0: '无降水',
+    1: '雨',
+    2: '雨夹雪',
+    3: '雪',
+    5: '毛毛雨',
+    6: '冻雨',
+    7: '阵雪'
+}
+
+# 上游原始字符串 -> 代码的预计算查找表，常见取值无需 int() 转换
+SKY_LOOKUP = {str(code): code for code in sky_code}
+PTY_LOOKUP = {str(code): code for code in rain_type_code}
+
+# 数值矩阵（如地区汇总）中代码与数值的缺失取值；解码结果的各列以 None 表示缺失
+MISSING_CODE = -1
+NAN = float('nan')
+
+# 按列解码后的预报字段（超短期预报只包含其中前 9 列）
+ULTRA_SRT_COLUMNS = ("fcst_date", "fcst_time", "temp", "humidity", "sky", "pty", "rn1", "wind_vec", "wind_speed")
+FORECAST_COLUMNS = ULTRA_SRT_COLUMNS + ("pop", "tmn", "tmx", "sno")
+
+# 类别 -> (数值列名, 错误提示)
+FLOAT_CATEGORIES = {
+    'T1H': ('temp', "温度值处理错误"),
+    'TMP': ('temp', "温度值处理错误"),     # 短期预报的逐小时气温
+    'POP': ('pop', "降水概率处理错误"),
+    'TMN': ('tmn', "最低气温处理错误"),
+    'TMX': ('tmx', "最高气温处理错误"),
+    'REH': ('humidity', "湿度值处理错误"),
+    'VEC': ('wind_vec', "风向值处理错误"),
+    'WSD': ('wind_speed', "风速值处理错误"),
+}
+# 类别 -> 文本列名（取值为上游原始文本，如“1.0mm”“无降水”）
+TEXT_CATEGORIES = {
+    'RN1': 'rn1',
+    'PCP': 'rn1',     # 短期预报的 1 小时降水量
+    'SNO': 'sno',
+}
+# 类别 -> (代码列名, 查找表, 合法代码, 错误提示)
+CODE_CATEGORIES = {
+    'SKY': ('sky', SKY_LOOKUP, sky_code, "天空状态代码处理错误"),
+    'PTY': ('pty', PTY_LOOKUP, rain_type_code, "降水类型代码处理错误"),
+}
+
+
+def wind_bin(deg: float) -> int:
+    """返回风向角度所在的 16 方位序号"""
+    return int((deg % 360 + 11.25) // 22.5) % 16
+
+
+def deg_to_dir(deg):
+    """将风向角度转换为方向名称"""
+    return WIND_BINS_CN[wind_bin(deg)]
+
+
+# 取值列（除预报日期、时刻外的各列）
+VALUE_COLUMNS = FORECAST_COLUMNS[2:]
+
+
+class DecodedForecast:
+    """按列存放的预报数据：每列一个与预报时刻等长的列表，缺失值为 None"""
+
+    __slots__ = FORECAST_COLUMNS
+
+    def __init__(self, fcst_date: list[str] | None = None, fcst_time: list[str] | None = None,
+                 columns: dict[str, list] | None = None):
+        """按预报时刻与已填好的列创建结果，未给出的列全部为 None"""
+        self.fcst_date = fcst_date if fcst_date is not None else []
+        self.fcst_time = fcst_time if fcst_time is not None else []
+        columns = columns or {}
+        for name in VALUE_COLUMNS:
+            column = columns.get(name)
+            setattr(self, name, column if column is not None else [None] * len(self.fcst_time))
+
+    def __len__(self) -> int:
+        return len(self.fcst_time)
+
+    def to_columns(self, names: tuple[str, ...] = FORECAST_COLUMNS) -> dict[str, list]:
+        """返回各列（用于 JSON / 结构化输出）；列表与本对象共用，调用方不应修改
+
+        Args:
+            names: 需要输出的列，默认为全部列
+        """
+        return {name: getattr(self, name) for name in names}
+
+
+def _invalid_value(message: str, category: str, value: str) -> None:
+    # 上游格式变化时同一类别的每个时刻都会出错，按类别采样，避免逐条写日志
+    logger.warning(message, extra={"category": category, "value": value, "sample_key": f"decode:{category}"})
+
+
+def _convert_code(category: str, value: str) -> int | None:
+    """转换查找表之外的代码取值（如 "1.0"），无效时记录日志并返回 None"""
+    name, lookup, valid, message = CODE_CATEGORIES[category]
+    try:
+        code = int(float(value))
+    except ValueError:
+        code = None
+    if code not in valid:
+        _invalid_value(message, category, value)
+        return None
+    return code
+
+
+# 列绑定类别
+_SKIP, _FLOAT, _CODE, _TEXT = "skip", "float", "code", "text"
+
+# 类别 -> (转换方式, 目标列, 代码查找表)；其他类别（UUU、VVV、LGT、WAV 等）暂不解码
+_BINDINGS = {category: (_FLOAT, target[0], None) for category, target in FLOAT_CATEGORIES.items()}
+_BINDINGS.update((category, (_CODE, target[0], target[1])) for category, target in CODE_CATEGORIES.items())
+_BINDINGS.update((category, (_TEXT, name, None)) for category, name in TEXT_CATEGORIES.items())
+
+
+class ItemDecoder:
+    """增量解码器：条目可分多次输入（如分页或流式到达），最后由 finish() 取得结果
+
+    同一 (fcstDate, fcstTime, category) 重复输入时后写覆盖先写，因此失败重试的页面
+    可以直接重新输入。
+    """
+
+    def __init__(self):
+        self._slots: dict[tuple[str, str], int] = {}
+        self._dates: list[str] = []
+        self._times: list[str] = []
+        self._columns: dict[str, list] = {}
+        self._bound: dict[str, tuple] = {}
+        self._last_key = ('', '')
+        self._ordered = True
+
+    def _bind(self, category: str) -> tuple:
+        """返回某类别的 (转换方式, 目标列, 代码查找表)，目标列在第一次用到时才创建"""
+        kind, name, lookup = _BINDINGS.get(category, (_SKIP, None, None))
+        column = None
+        if name is not None:
+            column = self._columns.get(name)
+            if column is None:
+                column = self._columns[name] = [None] * len(self._times)
+        bound = self._bound[category] = (kind, column, lookup)
+        return bound
+
+    def feed(self, items) -> None:
+        """单遍解码一批上游 item，取值直接写入所属时刻的列，按 (fcstDate, fcstTime) 一行一时刻
+
+        上游按类别（超短期预报）或按时刻（短期预报）连续排列条目，因此只在类别切换时
+        取一次目标列，行号先按上一条的位置猜测，不符时再查表。
+        """
+        slots = self._slots
+        bound = self._bound
+        columns = self._columns
+        dates = self._dates
+        times = self._times
+        slot_count = len(times)
+        current = column = lookup = None
+        kind = _SKIP
+        i = position = 0
+
+        for item in items:
+            try:
+                category = item['category']
+                value = item['fcstValue']
+                fcst_time = item['fcstTime']
+            except KeyError as e:
+                logger.warning("预报条目缺少字段", extra={"field": str(e), "sample_key": "decode:missing_field"})
+                continue
+            try:
+                fcst_date = item['fcstDate']
+            except KeyError:
+                fcst_date = ''
+
+            if category != current:
+                current = category
+                kind, column, lookup = bound.get(category) or self._bind(category)
+                # 按时刻排列时，新类别的条目通常与上一条属于同一时刻
+                position = i
+            # 不解码的类别（约占超短期预报条目的三成）直接跳过，不查找行号
+            if kind is _SKIP:
+                continue
+
+            if position < slot_count and times[position] == fcst_time and dates[position] == fcst_date:
+                i = position
+            else:
+                key = (fcst_date, fcst_time)
+                i = slots.get(key)
+                if i is None:
+                    i = slots[key] = slot_count
+                    slot_count += 1
+                    dates.append(fcst_date)
+                    times.append(fcst_time)
+                    for values in columns.values():
+                        values.append(None)
+                    # 记录新时刻是否按时间顺序到达，乱序时在 finish() 中重排
+                    if key < self._last_key:
+                        self._ordered = False
+                    else:
+                        self._last_key = key
+            position = i + 1
+
+            if not value:
+                continue
+
+            if kind is _FLOAT:
+                try:
+                    column[i] = float(value)
+                except ValueError:
+                    _invalid_value(FLOAT_CATEGORIES[category][1], category, value)
+            elif kind is _CODE:
+                code = lookup.get(value)
+                if code is None:
+                    code = _convert_code(category, value)
+                if code is not None:
+                    column[i] = code
+            else:
+                column[i] = value
+
+    def finish(self) -> DecodedForecast:
+        """返回按预报时刻排序的解码结果"""
+        dates, times, columns = self._dates, self._times, self._columns
+        if not self._ordered:
+            keys = list(zip(dates, times))
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            dates = [dates[i] for i in order]
+            times = [times[i] for i in order]
+            columns = {name: [column[i] for i in order] for name, column in columns.items()}
+        return DecodedForecast(dates, times, columns)
+
+
+def decode_items(items: list) -> DecodedForecast:
+    """解码一次性取得的上游 item 列表"""
+    decoder = ItemDecoder()
+    decoder.feed(items)
+    return decoder.finish()
+
+
+# 超短期实况条目字段 -> 预报条目字段（观测时刻记作预报时刻）
+OBSERVATION_FIELDS = {'category': 'category', 'baseDate': 'fcstDate', 'baseTime': 'fcstTime', 'obsrValue': 'fcstValue'}
+
+
+def _observed_rain(value: str) -> str | None:
+    """实况的 1 小时降水量为毫米数值，改写为与预报一致的文本（0 为“无降水”，缺测为 None）"""
+    try:
+        amount = float(value)
+    except ValueError:
+        return value
+    if amount < 0:
+        return None
+    return '无降水' if amount == 0 else f"{amount:g}"
+
+
+_RAIN_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def rain_amount(value: str | None) -> float:
+    """降水量文本 -> 毫米数（“无降水”为 0，缺失为 NaN）
+
+    区间或“未满”“以上”等文本取其中最大的数值，如“30.0~50.0mm” -> 50.0、“1mm 未满” -> 1.0。
+    """
+    if value is None:
+        return NAN
+    numbers = _RAIN_NUMBER.findall(value)
+    return max(map(float, numbers)) if numbers else 0.0
+
+
+def decode_observations(items: list) -> DecodedForecast:
+    """解码超短期实况（getUltraSrtNcst）条目，每个观测时刻一行"""
+    converted = []
+    for item in items:
+        entry = {target: item[source] for source, target in OBSERVATION_FIELDS.items() if source in item}
+        if entry.get('category') == 'RN1' and entry.get('fcstValue') is not None:
+            entry['fcstValue'] = _observed_rain(entry['fcstValue'])
+        converted.append(entry)
+    return decode_items(converted)
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+from decoder import deg_to_dir, rain_type_code, sky_code
+from timeline import SOURCE_LABELS
+
+# 紧凑表格可选的列：字段名 -> 表头（含单位）
+COMPACT_FIELDS = {
+    "source": "来源",
+    "sky": "天空",
+    "pty": "降水",
+    "rn1": "降水量mm",
+    "pop": "降水概率%",
+    "temp": "气温℃",
+    "tmn": "最低℃",
+    "tmx": "最高℃",
+    "humidity": "湿度%",
+    "wind": "风向风速m/s",
+    "sno": "新积雪",
+}
+
+MISSING = "-"
+
+
+def validate_fields(fields: list[str] | None) -> str | None:
+    """检查紧凑表格的列名，含有不支持的字段时返回错误说明，否则返回 None"""
+    unknown = [field for field in fields or () if field not in COMPACT_FIELDS]
+    if unknown:
+        return f"不支持的字段: {', '.join(unknown)}（可选 {', '.join(COMPACT_FIELDS)}）"
+    return None
+
+
+def _number(value: float | None) -> str:
+    return MISSING if value is None else f"{value:g}"
+
+
+def _amount(value: str | None) -> str:
+    # “无降水”“无积雪”与降水类型列重复，表中只保留有量的取值
+    return MISSING if value is None or value.startswith("无") else value
+
+
+def _wind(vec: float | None, speed: float | None) -> str:
+    return _number(speed) if vec is None or speed is None else f"{deg_to_dir(vec)}{speed:g}"
+
+
+# 各字段的单元格文本：代码转为中文，数值去掉多余的小数位，缺失为 "-"
+_FORMATTERS = {
+    "source": lambda value: MISSING if value is None else SOURCE_LABELS[value],
+    "sky": lambda value: MISSING if value is None else sky_code[value],
+    "pty": lambda value: MISSING if value is None else rain_type_code[value],
+    "rn1": _amount,
+    "sno": _amount,
+}
+
+
+def _cells(columns: dict[str, list], field: str) -> list[str]:
+    """整列单元格文本（逐列格式化，避免逐个单元格按字段分派）"""
+    count = len(columns['fcst_time'])
+    if field == "wind":
+        return list(map(_wind, columns.get('wind_vec') or [None] * count, columns.get('wind_speed') or [None] * count))
+    values = columns.get(field)
+    if values is None:
+        return [MISSING] * count
+    return list(map(_FORMATTERS.get(field, _number), values))
+
+
+def _has_data(columns: dict[str, list], field: str) -> bool:
+    if field == "wind":
+        return any(value is not None for value in columns.get('wind_speed') or ())
+    return any(value is not None for value in columns.get(field) or ())
+
+
+def time_label(date: str, time: str) -> str:
+    label = f"{date[6:]}日{time[:2]}时" if date else f"{time[:2]}时"
+    return label if time[2:] in ("", "00") else f"{label}{time[2:]}分"
+
+
+def _truncated(count: int) -> str:
+    return f"…另有 {count} 个时刻未显示（可缩短 hours 或减少 fields）"
+
+
+def limit_hours(columns: dict[str, list], hours: int) -> dict[str, list]:
+    """只保留首个预报时刻起 hours 小时内的各行"""
+    times = columns['fcst_time']
+    if not times:
+        return columns
+    dates = [date or datetime.now().strftime("%Y%m%d") for date in columns['fcst_date']]
+    start = datetime.strptime(dates[0] + times[0], "%Y%m%d%H%M")
+    end = (start + timedelta(hours=max(1, hours))).strftime("%Y%m%d%H%M")
+    count = sum(1 for date, time in zip(dates, times) if date + time < end)
+    return {name: values[:count] for name, values in columns.items()}
+
+
+def render_compact(province: str, city: str, district: str, columns: dict[str, list],
+                   fields: list[str] | None = None, max_chars: int | None = None,
+                   notices: list[str] | tuple = ()) -> str:
+    """渲染为紧凑表格：一行地区标题，一行表头，之后每个预报时刻一行（以 | 分隔）
+
+    Args:
+        province: 省名
+        city: 市名
+        district: 区县名
+        columns: 按列存放的预报数据（可含合并时间线的 source 列）
+        fields: 输出的列（COMPACT_FIELDS 中的字段名），默认为有数据的全部列
+        max_chars: 输出的最大字符数；超出时截去靠后的时刻，并在末行注明未显示的小时数
+        notices: 置于标题之后的提示行（如过期数据说明）
+
+    Raises:
+        ValueError: fields 中含有不支持的字段
+    """
+    if fields is None:
+        fields = [field for field in COMPACT_FIELDS if _has_data(columns, field)]
+    else:
+        error = validate_fields(fields)
+        if error:
+            raise ValueError(error)
+
+    lines = [f"{province} {city} {district} 逐小时预报", *notices]
+    if not columns['fcst_time']:
+        lines.append("无预报数据")
+        return "\n".join(lines)
+    lines.append("|".join(["时间"] + [COMPACT_FIELDS[field] for field in fields]))
+
+    times = list(map(time_label, columns['fcst_date'], columns['fcst_time']))
+    rows = list(map("|".join, zip(times, *(_cells(columns, field) for field in fields))))
+    length = sum(len(line) + 1 for line in lines) - 1
+    for i, row in enumerate(rows):
+        remaining = len(rows) - i - 1
+        reserve = len(_truncated(remaining)) + 1 if remaining else 0
+        if max_chars is not None and length + 1 + len(row) + reserve > max_chars:
+            lines.append(_truncated(len(rows) - i))
+            break
+        lines.append(row)
+        length += 1 + len(row)
+    return "\n".join(lines)
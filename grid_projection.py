@@ -0,0 +1,83 @@
+import math
+from typing import Sequence
+
+# 预报接口使用的兰伯特等角圆锥投影（Lambert Conformal Conic）网格参数
+EARTH_RADIUS_KM = 6371.00877   # 地球半径
+GRID_SPACING_KM = 5.0          # 网格间距
+STANDARD_LAT1 = 30.0           # 第一标准纬线
+STANDARD_LAT2 = 60.0           # 第二标准纬线
+ORIGIN_LON = 126.0             # 基准点经度
+ORIGIN_LAT = 38.0              # 基准点纬度
+ORIGIN_X = 43                  # 基准点网格 X
+ORIGIN_Y = 136                 # 基准点网格 Y
+
+# 网格范围（超出范围的坐标没有预报数据）
+GRID_X_RANGE = (1, 149)
+GRID_Y_RANGE = (1, 253)
+
+_DEGRAD = math.pi / 180.0
+_re = EARTH_RADIUS_KM / GRID_SPACING_KM
+_slat1 = STANDARD_LAT1 * _DEGRAD
+_slat2 = STANDARD_LAT2 * _DEGRAD
+_olon = ORIGIN_LON * _DEGRAD
+_olat = ORIGIN_LAT * _DEGRAD
+_sn = math.log(math.cos(_slat1) / math.cos(_slat2)) / math.log(
+    math.tan(math.pi * 0.25 + _slat2 * 0.5) / math.tan(math.pi * 0.25 + _slat1 * 0.5)
+)
+_sf = math.tan(math.pi * 0.25 + _slat1 * 0.5) ** _sn * math.cos(_slat1) / _sn
+_ro = _re * _sf / math.tan(math.pi * 0.25 + _olat * 0.5) ** _sn
+
+
+def _project_python(lats: Sequence[float], lons: Sequence[float]) -> tuple[list[float], list[float]]:
+    xs, ys = [], []
+    for lat, lon in zip(lats, lons):
+        ra = _re * _sf / math.tan(math.pi * 0.25 + lat * _DEGRAD * 0.5) ** _sn
+        theta = lon * _DEGRAD - _olon
+        if theta > math.pi:
+            theta -= 2.0 * math.pi
+        if theta < -math.pi:
+            theta += 2.0 * math.pi
+        theta *= _sn
+        xs.append(ra * math.sin(theta) + ORIGIN_X)
+        ys.append(_ro - ra * math.cos(theta) + ORIGIN_Y)
+    return xs, ys
+
+
+def project(lats: Sequence[float], lons: Sequence[float]) -> tuple[list[float], list[float]]:
+    """将经纬度批量投影为连续的网格坐标 (x, y)，四舍五入后即为 (nx, ny)
+
+    已安装 NumPy 时整批向量化计算，否则逐点计算。
+
+    Returns:
+        tuple: (x 列表, y 列表)
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return _project_python(lats, lons)
+
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    ra = _re * _sf / np.tan(np.pi * 0.25 + lat * _DEGRAD * 0.5) ** _sn
+    # 经差归一化到 [-π, π]
+    theta = (lon * _DEGRAD - _olon + np.pi) % (2.0 * np.pi) - np.pi
+    theta *= _sn
+    x = ra * np.sin(theta) + ORIGIN_X
+    y = _ro - ra * np.cos(theta) + ORIGIN_Y
+    return x.tolist(), y.tolist()
+
+
+def to_cell(x: float, y: float) -> tuple[int, int]:
+    """连续网格坐标 -> 网格编号 (nx, ny)"""
+    return int(math.floor(x + 0.5)), int(math.floor(y + 0.5))
+
+
+def in_grid(nx: int, ny: int) -> bool:
+    """网格编号是否在预报范围内"""
+    return GRID_X_RANGE[0] <= nx <= GRID_X_RANGE[1] and GRID_Y_RANGE[0] <= ny <= GRID_Y_RANGE[1]
+
+
+def latlon_to_grid(lat: float, lon: float) -> tuple[int, int]:
+    """单个经纬度 -> 网格编号 (nx, ny)"""
+    xs, ys = _project_python([lat], [lon])
+    return to_cell(xs[0], ys[0])
@@ -0,0 +1,251 @@
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from pathlib import Path
+from typing import Callable
+
+import config
+import logs
+
+logger = logs.get_logger("http_server")
+
+TRANSPORTS = ("streamable-http", "sse")
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# 多工作进程且未配置 SHARED_CACHE_PATH 时使用的共享预报缓存
+DEFAULT_SHARED_CACHE_PATH = Path(__file__).parent.parent / "data" / "shared_cache.db"
+
+# 工作进程异常退出后至少间隔多久再重启（秒），避免启动即崩溃时反复 fork
+RESTART_INTERVAL = 1.0
+
+
+def create_app(mcp, resources: Callable[[], AbstractAsyncContextManager], transport: str,
+               stateless: bool, host: str):
+    """构建 HTTP 传输的 ASGI 应用
+
+    FastMCP 为每个会话（无状态模式下为每个请求）进入一次服务器 lifespan；这里让进程级资源
+    （位置索引、连接池、归档、预热）在应用的整个生命周期内常驻，会话的 lifespan 只增减引用计数。
+    """
+    mcp.settings.host = host
+    mcp.settings.stateless_http = stateless
+    mcp.settings.max_sessions = config.HTTP_MAX_SESSIONS
+    mcp.settings.session_idle_timeout = config.HTTP_SESSION_IDLE_TIMEOUT
+    if host not in LOOPBACK_HOSTS:
+        # 与 FastMCP 一致：只在监听本机地址时启用 DNS rebinding 防护（其允许的 Host 仅限本机）
+        mcp.settings.transport_security = None
+    app = mcp.streamable_http_app() if transport == "streamable-http" else mcp.sse_app()
+    inner = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with resources():
+            async with inner(app) as state:
+                yield state
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def bind_socket(host: str, port: int, backlog: int = config.HTTP_BACKLOG) -> socket.socket:
+    """在主进程中绑定监听端口，各工作进程继承同一个套接字并各自 accept"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_uvicorn(app, sock: socket.socket) -> None:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        backlog=config.HTTP_BACKLOG,
+        limit_concurrency=config.HTTP_LIMIT_CONCURRENCY,
+        timeout_keep_alive=config.HTTP_KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=config.HTTP_GRACEFUL_TIMEOUT,
+        log_level=config.LOG_LEVEL.lower(),
+        access_log=False,
+        lifespan="on",
+    ))
+    server.run(sockets=[sock])
+
+
+def _configure_worker(index: int, workers: int, shared_cache_path: Path) -> None:
+    """fork 之后、启动事件循环之前调整工作进程内的全局对象"""
+    import api
+    import utils
+    from resilience import TokenBucket
+    from shared_cache import SharedForecastStore
+
+    # 主进程的日志后台线程没有跟随 fork，工作进程写各自的日志文件
+    logs.configure_logging(worker=index)
+    # 上游配额按 API 密钥计算，由各工作进程平分
+    utils.upstream_limiter = TokenBucket(config.API_RATE_LIMIT_PER_SECOND / workers,
+                                         max(1.0, config.API_RATE_LIMIT_BURST / workers))
+    # 各进程经共享缓存复用彼此的上游结果；SQLite 连接在子进程中创建，不跨 fork 共享
+    if api.forecast_cache.shared is None:
+        api.forecast_cache.shared = SharedForecastStore(shared_cache_path)
+    # 预热写入共享缓存，只需一个工作进程执行
+    if index != 0:
+        config.PREWARM_ENABLED = False
+    # 每个工作进程的指标各自独立，依次使用相邻端口
+    if config.METRICS_PORT:
+        config.METRICS_PORT += index
+
+
+class WorkerPool:
+    """pre-fork 工作进程池：主进程加载位置索引并绑定端口后 fork 出各工作进程
+
+    工作进程异常退出时自动重启；收到 SIGTERM / SIGINT 后向各工作进程转发 SIGTERM，
+    uvicorn 停止接受新连接并等待进行中的请求完成（最多 HTTP_GRACEFUL_TIMEOUT 秒），
+    超时仍未退出的进程被强制结束。
+    """
+
+    def __init__(self, sock: socket.socket, workers: int, app_factory: Callable, shared_cache_path: Path,
+                 graceful_timeout: float = config.HTTP_GRACEFUL_TIMEOUT):
+        self.sock = sock
+        self.workers = workers
+        self.app_factory = app_factory
+        self.shared_cache_path = shared_cache_path
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, int] = {}   # pid -> 工作进程编号
+        self.started_at: dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                _configure_worker(index, self.workers, self.shared_cache_path)
+                run_uvicorn(self.app_factory(), self.sock)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                # os._exit 不执行 atexit，先写完队列中的日志
+                logs.shutdown_logging()
+                os._exit(code)
+        self.children[pid] = index
+        self.started_at[index] = time.monotonic()
+
+    def _request_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def run(self) -> None:
+        for index in range(self.workers):
+            self.spawn(index)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        pending_restarts: dict[int, float] = {}
+        while not self.stopping:
+            self._reap(pending_restarts)
+            now = time.monotonic()
+            for index, due in list(pending_restarts.items()):
+                if now >= due:
+                    del pending_restarts[index]
+                    self.spawn(index)
+            time.sleep(0.2)
+        self.drain()
+
+    def _reap(self, pending_restarts: dict[int, float]) -> None:
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            logger.warning("Worker exited, restarting",
+                           extra={"worker": index, "pid": pid, "status": os.waitstatus_to_exitcode(status)})
+            pending_restarts[index] = self.started_at[index] + RESTART_INTERVAL
+
+    def drain(self) -> None:
+        """停止所有工作进程：先等待进行中的请求完成，超时后强制结束"""
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 5.0
+        while self.children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                self.children.pop(pid, None)
+        for pid in self.children:
+            logger.warning("Worker did not stop in time, killing it",
+                           extra={"pid": pid, "graceful_timeout": self.graceful_timeout})
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ChildProcessError, ProcessLookupError):
+                pass
+        self.children.clear()
+
+
+def serve(mcp, resources: Callable[[], AbstractAsyncContextManager], preload: Callable[[], object],
+          transport: str = "streamable-http", host: str = config.HTTP_HOST, port: int = config.HTTP_PORT,
+          workers: int = config.HTTP_WORKERS, stateless: bool | None = None) -> None:
+    """以 HTTP 传输运行服务器
+
+    Args:
+        mcp: FastMCP 实例
+        resources: 进入后持有进程级资源的上下文管理器工厂（server.server_resources）
+        preload: 启动前（多工作进程时在 fork 之前）于主进程执行的加载函数（server.preload_location_index）
+        transport: streamable-http 或 sse
+        workers: 工作进程数；大于 1 时要求无状态会话（同一会话的请求可能落在不同进程）
+        stateless: 是否使用无状态会话，默认在多工作进程时启用
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError(f"unsupported transport: {transport}")
+    logs.configure_logging()
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need os.fork(), which this platform lacks; running a single worker")
+        workers = 1
+    if stateless is None:
+        stateless = workers > 1
+    if workers > 1 and transport == "sse":
+        raise SystemExit("SSE sessions are bound to one process; use --workers 1 or --transport streamable-http")
+    if workers > 1 and not stateless:
+        raise SystemExit("Stateful sessions are bound to one process; use --workers 1 or stateless sessions")
+
+    sock = bind_socket(host, port)
+    path = mcp.settings.streamable_http_path if transport == "streamable-http" else mcp.settings.sse_path
+    logger.info("Serving %s on http://%s:%d%s with %d worker(s), %s sessions", transport, host,
+                sock.getsockname()[1], path, workers, "stateless" if stateless else "stateful")
+
+    def app_factory():
+        return create_app(mcp, resources, transport, stateless, host)
+
+    # 长期运行的服务器在接受连接前就建好位置索引，避免第一个请求承担构建开销
+    preload()
+    # 未显式设置时，HTTP 服务器启用后台预热（多工作进程时只在 0 号工作进程运行）
+    if config.PREWARM_ENABLED is None:
+        config.PREWARM_ENABLED = True
+    if workers == 1:
+        run_uvicorn(app_factory(), sock)
+        return
+
+    # 位置索引在主进程加载一次，工作进程以写时复制方式继承；
+    # gc.freeze 把已有对象移入永久代，之后的 GC 不再遍历（改写）它们，减少被复制的内存页
+    gc.freeze()
+    shared_cache_path = Path(config.SHARED_CACHE_PATH or config.HTTP_SHARED_CACHE_PATH or DEFAULT_SHARED_CACHE_PATH)
+    shared_cache_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        WorkerPool(sock, workers, app_factory, shared_cache_path).run()
+    finally:
+        sock.close()
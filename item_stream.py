@@ -0,0 +1,75 @@
+import codecs
+import json
+import re
+
+# 上游响应中预报条目数组的起始位置：{"response": {..., "body": {"items": {"item": [ ... ]}}}}
+_ITEM_ARRAY = re.compile(r'"item"\s*:\s*\[')
+_SKIP_SEPARATORS = re.compile(r'[\s,]*')
+
+
+class ItemStreamParser:
+    """增量解析上游 JSON 响应：随数据块到达逐个解出 item 对象，不在内存中保留完整响应
+
+    条目数组之外的部分（header、totalCount 等）在 close() 时拼成去掉条目的响应骨架返回。
+    每个条目由 json 模块的 C 实现解析（raw_decode），无需额外依赖。
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._prefix: str | None = None   # 条目数组之前的文本（含 "["）
+        self._suffix: list[str] = []      # 条目数组之后的文本
+        self._done = False
+        self.item_count = 0
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        """输入一块响应数据，返回其中已完整到达的条目"""
+        text = self._text.decode(chunk)
+        if self._done:
+            self._suffix.append(text)
+            return []
+
+        self._buffer += text
+        if self._prefix is None:
+            match = _ITEM_ARRAY.search(self._buffer)
+            if match is None:
+                return []
+            self._prefix = self._buffer[:match.end()]
+            self._buffer = self._buffer[match.end():]
+        return self._drain()
+
+    def _drain(self) -> list[dict]:
+        items = []
+        buffer = self._buffer
+        pos = 0
+        raw_decode = self._decoder.raw_decode
+        while True:
+            pos = _SKIP_SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._done = True
+                self._suffix.append(buffer[pos + 1:])
+                pos = len(buffer)
+                break
+            try:
+                item, end = raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 条目尚未完整到达，等待下一块数据
+                break
+            items.append(item)
+            pos = end
+        self._buffer = buffer[pos:]
+        self.item_count += len(items)
+        return items
+
+    def close(self) -> dict:
+        """结束解析，返回去掉条目数组的响应骨架；响应不完整或不是 JSON 时抛出 ValueError"""
+        tail = self._text.decode(b"", final=True)
+        if self._prefix is None:
+            # 没有条目数组（如错误响应），整体解析
+            return json.loads(self._buffer + tail)
+        if not self._done:
+            raise ValueError("响应在条目数组结束前中断")
+        return json.loads(self._prefix + "]" + "".join(self._suffix) + tail)
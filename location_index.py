@@ -0,0 +1,225 @@
+import math
+import sqlite3
+from bisect import bisect_left
+from collections import defaultdict
+from functools import cached_property
+from pathlib import Path
+
+from location_snapshot import read_snapshot
+
+# 行格式与 SQLite 查询一致: (province, city, district, grid_x, grid_y)
+FIELDS = ("province", "city", "district")
+MATCH_MODES = ("exact", "prefix", "substring")
+
+
+def _grams(value: str) -> set[str]:
+    """返回字符串的单字与二元组（用于子串检索的倒排键）"""
+    grams = set(value)
+    grams.update(value[i:i + 2] for i in range(len(value) - 1))
+    return grams
+
+
+class _FieldIndex:
+    """单个字段的索引：取值 -> 行号列表与 n-gram 倒排表随索引一起构建，有序取值表在用到时才构建"""
+
+    def __init__(self, values_to_rows: dict[str, list[int]]):
+        self.rows_by_value = values_to_rows
+        gram_values: dict[str, set[str]] = defaultdict(set)
+        for value in values_to_rows:
+            for gram in _grams(value):
+                gram_values[gram].add(value)
+        self.gram_values = dict(gram_values)
+
+    @cached_property
+    def sorted_values(self) -> list[str]:
+        return sorted(self.rows_by_value)
+
+    def match_values(self, term: str, mode: str) -> list[str]:
+        """返回按指定方式与 term 匹配的字段取值"""
+        if mode == "exact":
+            return [term] if term in self.rows_by_value else []
+
+        if mode == "prefix":
+            start = bisect_left(self.sorted_values, term)
+            matched = []
+            for value in self.sorted_values[start:]:
+                if not value.startswith(term):
+                    break
+                matched.append(value)
+            return matched
+
+        # 子串匹配（等价于 LIKE '%term%'）：用 n-gram 倒排表缩小候选，再逐一校验
+        if not term:
+            return list(self.rows_by_value)
+        keys = [term] if len(term) == 1 else [term[i:i + 2] for i in range(len(term) - 1)]
+        postings = sorted((self.gram_values.get(key, set()) for key in keys), key=len)
+        if not postings[0]:
+            return []
+        if len(postings) == 1:
+            # 单字或二字检索词的倒排键就是检索词本身，无需校验
+            return list(postings[0])
+        candidates = set.intersection(*postings)
+        return [value for value in candidates if term in value]
+
+    def count_rows(self, values: list[str]) -> int:
+        return sum(map(len, map(self.rows_by_value.__getitem__, values)))
+
+
+class GridBucketIndex:
+    """按网格坐标分桶的空间索引，用于查找离某个（连续）网格坐标最近的地区
+
+    每个桶覆盖 bucket_size × bucket_size 个网格；查询时从所在桶开始按环向外扩展，
+    当已找到的最近距离不大于下一环的最小可能距离时停止，无需扫描全表。
+    """
+
+    def __init__(self, rows: list[tuple], bucket_size: int = 4):
+        self.rows = rows
+        self.bucket_size = bucket_size
+        self.buckets: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for row_id, row in enumerate(rows):
+            self.buckets[(row[3] // bucket_size, row[4] // bucket_size)].append(row_id)
+        self.buckets = dict(self.buckets)
+        # 桶编号的外接矩形 (min_bx, min_by, max_bx, max_by)
+        if self.buckets:
+            bx = [key[0] for key in self.buckets]
+            by = [key[1] for key in self.buckets]
+            self._bounds = (min(bx), min(by), max(bx), max(by))
+        else:
+            self._bounds = None
+
+    def nearest(self, x: float, y: float) -> tuple[tuple, float] | None:
+        """返回离 (x, y) 最近的行及其距离（网格单位）；距离相同时取原表中靠前的行"""
+        if self._bounds is None:
+            return None
+        size = self.bucket_size
+        cx, cy = int(math.floor(x / size)), int(math.floor(y / size))
+        min_bx, min_by, max_bx, max_by = self._bounds
+        # 外接矩形以内的环才可能有数据：查询点在范围外时直接从矩形所在的环开始
+        first_ring = max(0, min_bx - cx, cx - max_bx, min_by - cy, cy - max_by)
+        last_ring = max(abs(cx - min_bx), abs(cx - max_bx), abs(cy - min_by), abs(cy - max_by))
+        best: tuple[float, int] | None = None
+        for ring in range(first_ring, last_ring + 1):
+            if best is not None:
+                # 第 ring 环内的点与查询点的距离至少为 (ring - 1) 个桶宽
+                if best[0] <= ((ring - 1) * size) ** 2:
+                    break
+            for key in self._ring_keys(cx, cy, ring):
+                for row_id in self.buckets.get(key, ()):
+                    row = self.rows[row_id]
+                    distance = (row[3] - x) ** 2 + (row[4] - y) ** 2
+                    if best is None or (distance, row_id) < best:
+                        best = (distance, row_id)
+        if best is None:
+            return None
+        return self.rows[best[1]], math.sqrt(best[0])
+
+    @staticmethod
+    def _ring_keys(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+
+class LocationIndex:
+    """weather_grid 表的内存索引，支持对省/市/区的精确、前缀与子串查找
+
+    精确匹配哈希表与各字段的 n-gram 倒排表在加载时构建，首次子串查找即可走索引；
+    有序前缀表与空间索引在第一次用到时才构建，长期运行的进程可调用 build() 预先全部构建。
+    """
+
+    def __init__(self, rows: list[tuple]):
+        self.rows = rows
+        self.by_triple: dict[tuple[str, str, str], int] = {}
+        per_field: list[dict[str, list[int]]] = [defaultdict(list) for _ in FIELDS]
+        for row_id, row in enumerate(rows):
+            self.by_triple.setdefault(row[:3], row_id)
+            for field_no in range(len(FIELDS)):
+                per_field[field_no][row[field_no]].append(row_id)
+        self.fields = [_FieldIndex(dict(values)) for values in per_field]
+
+    @cached_property
+    def grid(self) -> GridBucketIndex:
+        return GridBucketIndex(self.rows)
+
+    def build(self) -> "LocationIndex":
+        """立即构建全部查找结构（如在 fork 工作进程之前，使其以写时复制方式共享）"""
+        for field in self.fields:
+            field.sorted_values
+        self.grid
+        return self
+
+    @classmethod
+    def from_snapshot(cls, path: Path) -> "LocationIndex":
+        """从 migrate.py 导出的二进制快照加载（内存映射读取，无需逐行查询 SQLite）"""
+        return cls(read_snapshot(path))
+
+    @classmethod
+    def from_sqlite(cls, db_path: Path) -> "LocationIndex":
+        """从 SQLite 数据库一次性加载整张 weather_grid 表"""
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(
+                "SELECT province, city, district, grid_x, grid_y FROM weather_grid ORDER BY id"
+            ).fetchall()
+        finally:
+            conn.close()
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def find(self, province: str, city: str, district: str, mode: str = "substring", limit: int | None = None) -> list[tuple]:
+        """返回三个字段均匹配的行（按原表顺序）
+
+        Args:
+            province: 省名检索词
+            city: 市名检索词
+            district: 区县名检索词
+            mode: 匹配方式，exact / prefix / substring
+            limit: 最多返回的行数，None 表示不限
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"不支持的匹配方式: {mode}")
+
+        terms = (province, city, district)
+        if mode == "exact":
+            row_id = self.by_triple.get(terms)
+            return [] if row_id is None else [self.rows[row_id]]
+
+        matched = [self.fields[i].match_values(term, mode) for i, term in enumerate(terms)]
+        if not all(matched):
+            return []
+
+        # 从候选行最少的字段展开，其余两个字段直接在行上校验
+        pivot = min(range(len(FIELDS)), key=lambda i: self.fields[i].count_rows(matched[i]))
+        (i, first), (j, second) = [(i, set(matched[i])) for i in range(len(FIELDS)) if i != pivot]
+        rows = self.rows
+        rows_by_value = self.fields[pivot].rows_by_value
+        row_ids = [
+            row_id
+            for value in matched[pivot]
+            for row_id in rows_by_value[value]
+            if rows[row_id][i] in first and rows[row_id][j] in second
+        ]
+        if limit == 1 and row_ids:
+            return [rows[min(row_ids)]]
+        row_ids.sort()
+        return [rows[row_id] for row_id in row_ids[:limit]]
+
+    def nearest(self, x: float, y: float) -> tuple[tuple, float] | None:
+        """返回网格坐标最接近 (x, y) 的行及其距离（网格单位）"""
+        return self.grid.nearest(x, y)
+
+    def lookup(self, province: str, city: str, district: str) -> tuple | None:
+        """精确匹配优先；否则与原 LIKE '%x%' 查询语义一致，返回首个匹配行或 None"""
+        row_id = self.by_triple.get((province, city, district))
+        if row_id is not None:
+            return self.rows[row_id]
+        rows = self.find(province, city, district, limit=1)
+        return rows[0] if rows else None
@@ -0,0 +1,133 @@
+import re
+import sqlite3
+
+FTS_TABLE = "weather_grid_fts"
+
+# 归一化时去除的行政区划后缀（长后缀优先）
+NAME_SUFFIXES = ("特别行政区", "自治区", "自治州", "自治县", "街道", "省", "市", "区", "县")
+
+# trigram 分词器只能对不少于 3 个字符的片段使用 MATCH
+TRIGRAM_MIN_LENGTH = 3
+
+# 每个别名前加上词首标记，使 2 字地名（如“朝阳”）也能以“^朝阳”的形式走 trigram 索引做前缀匹配
+ALIAS_MARK = "^"
+
+_TOKEN_SPLIT = re.compile(r"[\s,，、/]+")
+
+
+def normalize_name(name: str) -> str:
+    """去除省/市/区/县/街道等后缀，得到用于匹配的别名（结果少于 2 个字时保留原名）"""
+    name = (name or "").strip()
+    for suffix in NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            return name[:-len(suffix)]
+    return name
+
+
+def build_aliases(province: str, city: str, district: str) -> str:
+    """拼接全称与归一化别名（带词首标记），作为全文索引的检索列"""
+    names = []
+    for name in (province, city, district):
+        for alias in (name, normalize_name(name)):
+            if alias and alias not in names:
+                names.append(alias)
+    return " ".join(ALIAS_MARK + name for name in names)
+
+
+def build_fts_index(conn: sqlite3.Connection) -> int:
+    """基于 weather_grid 重建 FTS5 trigram 检索表，返回写入的行数"""
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.execute(f'''
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        province UNINDEXED,
+        city UNINDEXED,
+        district UNINDEXED,
+        province_norm UNINDEXED,
+        city_norm UNINDEXED,
+        district_norm UNINDEXED,
+        aliases,
+        tokenize = 'trigram'
+    )
+    ''')
+    rows = conn.execute("SELECT id, province, city, district FROM weather_grid").fetchall()
+    conn.executemany(
+        f'''
+        INSERT INTO {FTS_TABLE}
+        (rowid, province, city, district, province_norm, city_norm, district_norm, aliases)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''',
+        (
+            (row_id, province, city, district,
+             normalize_name(province), normalize_name(city), normalize_name(district),
+             build_aliases(province, city, district))
+            for row_id, province, city, district in rows
+        )
+    )
+    return len(rows)
+
+
+def split_query(query: str) -> list[str]:
+    """将检索词按空白及常见分隔符切分并归一化"""
+    tokens = []
+    for token in _TOKEN_SPLIT.split(query or ""):
+        token = normalize_name(token)
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def search_locations(conn: sqlite3.Connection, query: str, limit: int = 5) -> list[tuple]:
+    """在 FTS5 索引中检索地区，按相关度返回前 limit 个候选
+
+    排序依据：各检索词与归一化后的区县/城市/省份名完全相同的程度，其次为 bm25 得分，
+    再次为地名总长度（越短越精确）。
+
+    Returns:
+        list: [(province, city, district, grid_x, grid_y), ...]
+    """
+    tokens = split_query(query)
+    if not tokens:
+        return []
+
+    # 不少于 3 字的词做子串匹配，2 字的词做地名前缀匹配，单字只能扫描过滤
+    phrases = []
+    short_tokens = []
+    for token in tokens:
+        if len(token) >= TRIGRAM_MIN_LENGTH:
+            phrases.append(token)
+        elif len(token) + len(ALIAS_MARK) >= TRIGRAM_MIN_LENGTH:
+            phrases.append(ALIAS_MARK + token)
+        else:
+            short_tokens.append(token)
+
+    conditions = []
+    params: list = []
+    score_terms = []
+    score_params: list = []
+    for token in tokens:
+        score_terms.append(
+            f"({FTS_TABLE}.district_norm = ?) * 4 + ({FTS_TABLE}.city_norm = ?) * 2 + ({FTS_TABLE}.province_norm = ?)"
+        )
+        score_params.extend([token, token, token])
+
+    if phrases:
+        conditions.append(f"{FTS_TABLE} MATCH ?")
+        params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in phrases))
+    for token in short_tokens:
+        # trigram 对单字无效（LIKE 也会被 trigram 索引接管而匹配不到），改用 instr 过滤
+        conditions.append(f"instr({FTS_TABLE}.aliases, ?) > 0")
+        params.append(token)
+
+    order_by = [f"({' + '.join(score_terms)}) DESC"]
+    if phrases:
+        order_by.append(f"{FTS_TABLE}.rank")
+    order_by.extend(["length(g.province) + length(g.city) + length(g.district)", "g.id"])
+    sql = f'''
+    SELECT g.province, g.city, g.district, g.grid_x, g.grid_y
+    FROM {FTS_TABLE}
+    JOIN weather_grid AS g ON g.id = {FTS_TABLE}.rowid
+    WHERE {" AND ".join(conditions)}
+    ORDER BY {", ".join(order_by)}
+    LIMIT ?
+    '''
+    return conn.execute(sql, params + score_params + [limit]).fetchall()
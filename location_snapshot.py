@@ -0,0 +1,154 @@
+import argparse
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Sequence
+
+# weather_grid 的二进制快照：服务器启动时内存映射读取，代替逐行查询 SQLite
+#
+# 布局（小端序）:
+#   头部      magic(8) | 版本 u32 | 行数 u32 | 字符串数 u32 | 字符串区字节数 u32
+#   偏移表    u32 × (字符串数 + 1)，第 i 个字符串为 blob[offsets[i]:offsets[i + 1]]
+#   字符串区  去重后的省/市/区县名（UTF-8），末尾补齐到 4 字节
+#   列数据    province / city / district 的字符串编号 u32 × 行数，grid_x / grid_y 为 i32 × 行数
+MAGIC = b"CNWGRID\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII")
+
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def snapshot_path(db_path: Path) -> Path:
+    """数据库对应的快照路径（data/weather_grid.db -> data/weather_grid.snapshot）"""
+    return Path(db_path).with_suffix(SNAPSHOT_SUFFIX)
+
+
+def is_fresh(path: Path, db_path: Path) -> bool:
+    """快照存在且不早于数据库文件（数据库或其 WAL 在导出快照后被修改则视为过期）"""
+    try:
+        snapshot_mtime = os.stat(path).st_mtime_ns
+        if snapshot_mtime < os.stat(db_path).st_mtime_ns:
+            return False
+    except OSError:
+        return False
+    try:
+        wal = os.stat(f"{db_path}-wal")
+    except OSError:
+        return True
+    return wal.st_size == 0 or snapshot_mtime >= wal.st_mtime_ns
+
+
+def _column(values: Sequence[int], typecode: str) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(mm: mmap.mmap, offset: int, count: int, typecode: str) -> array:
+    column = array(typecode)
+    column.frombytes(mm[offset:offset + 4 * count])
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def write_snapshot(rows: Sequence[tuple], path: Path) -> int:
+    """把 (province, city, district, grid_x, grid_y) 行写入快照，返回写入的字节数
+
+    先写临时文件再原子替换，读取方不会看到写了一半的快照。
+    """
+    ids: dict[str, int] = {}
+    columns: list[list[int]] = [[], [], [], [], []]
+    for row in rows:
+        for field_no in range(3):
+            columns[field_no].append(ids.setdefault(row[field_no], len(ids)))
+        columns[3].append(row[3])
+        columns[4].append(row[4])
+
+    encoded = [name.encode("utf-8") for name in ids]
+    offsets = [0]
+    for name in encoded:
+        offsets.append(offsets[-1] + len(name))
+    blob = b"".join(encoded)
+    blob += b"\x00" * (-len(blob) % 4)
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, len(rows), len(encoded), len(blob)),
+        _column(offsets, "I"),
+        blob,
+        *(_column(column, "I") for column in columns[:3]),
+        *(_column(column, "i") for column in columns[3:]),
+    ]
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            for part in parts:
+                f.write(part)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return sum(len(part) for part in parts)
+
+
+def read_snapshot(path: Path) -> list[tuple]:
+    """内存映射读取快照，返回与 SQLite 查询相同格式的行；格式不符时抛出 ValueError"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < HEADER.size:
+            raise ValueError(f"快照文件不完整: {path}")
+        magic, version, row_count, string_count, blob_size = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"不支持的快照格式: {path}")
+        offsets_at = HEADER.size
+        blob_at = offsets_at + 4 * (string_count + 1)
+        columns_at = blob_at + blob_size
+        if len(mm) != columns_at + 4 * 5 * row_count:
+            raise ValueError(f"快照文件大小与头部不符: {path}")
+
+        offsets = _read_column(mm, offsets_at, string_count + 1, "I")
+        blob = mm[blob_at:columns_at]
+        columns = [
+            _read_column(mm, columns_at + 4 * row_count * i, row_count, "I" if i < 3 else "i")
+            for i in range(5)
+        ]
+
+    names = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(string_count)]
+    try:
+        return list(zip(*(map(names.__getitem__, column) for column in columns[:3]), *columns[3:]))
+    except IndexError:
+        raise ValueError(f"快照中的字符串编号越界: {path}") from None
+
+
+def export_snapshot(db_path: Path, path: Path | None = None) -> tuple[Path, int]:
+    """从 SQLite 数据库导出快照，返回 (快照路径, 行数)"""
+    path = Path(path) if path else snapshot_path(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT province, city, district, grid_x, grid_y FROM weather_grid ORDER BY id"
+        ).fetchall()
+    finally:
+        conn.close()
+    write_snapshot(rows, path)
+    return path, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 SQLite 数据库导出 weather_grid 二进制快照")
+    parser.add_argument("--db", type=Path, default=Path(__file__).parent.parent / "data" / "weather_grid.db",
+                        help="SQLite 数据库路径，默认 data/weather_grid.db")
+    parser.add_argument("--output", type=Path, help="快照路径，默认与数据库同目录的 weather_grid.snapshot")
+    args = parser.parse_args()
+
+    path, count = export_snapshot(args.db, args.output)
+    print(f"已导出 {count} 条记录到 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import config
+
+DEFAULT_LOG_FILE = Path(__file__).parent / "app.log"
+
+# 项目各模块的日志都挂在该名称下（get_logger("api") -> cn_weather.api），第三方库的日志不受影响
+ROOT_LOGGER = "cn_weather"
+
+# 当前请求（一次工具调用）的关联 ID，经 contextvars 传递到其中创建的任务
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+
+# LogRecord 自带的属性，其余属性（extra 传入的字段）作为结构化字段输出
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_exception_formatter = logging.Formatter()
+# 复用同一个编码器：json.dumps 带参数调用时每次都会新建 JSONEncoder
+_json_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: "NonBlockingQueueHandler | None" = None
+_sampling_filter: "SamplingFilter | None" = None
+_configured_pid: int | None = None
+_configure_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """项目模块使用的日志记录器"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def current_request_id() -> str | None:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: str | None = None):
+    """在代码块内为日志设置请求关联 ID（默认生成新的 ID）"""
+    token = _request_id.set(request_id or uuid.uuid4().hex[:12])
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """在调用方的上下文中为日志记录附加请求关联 ID（写出在后台线程，那里取不到 contextvars）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """对带 sample_key 的重复日志（如逐条的解码错误）采样：每个时间窗口内同一 key 只记录前 burst 条，
+    其余丢弃并计数，下一个窗口的首条记录以 suppressed 字段注明上一窗口丢弃的条数"""
+
+    def __init__(self, burst: int = config.LOG_SAMPLE_BURST, window: float = config.LOG_SAMPLE_WINDOW_SECONDS):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.suppressed_total = 0
+        self._windows: dict[str, list] = {}   # key -> [窗口开始时间, 本窗口条数, 本窗口丢弃条数]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                self._windows[key] = [now, 1, 0]
+                return True
+            state[1] += 1
+            if state[1] <= self.burst:
+                return True
+            state[2] += 1
+            self.suppressed_total += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """把日志记录放入队列后立即返回，格式化与写文件在后台线程完成；积压超过 max_size 条时丢弃并计数
+
+    SimpleQueue 的 put 不加锁、不唤醒条件变量，比有界的 queue.Queue 便宜得多，上限改由 qsize 判断。
+    """
+
+    def __init__(self, max_size: int = config.LOG_QUEUE_SIZE):
+        super().__init__(queue.SimpleQueue())
+        self.max_size = max_size
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 记录只交给本处理器（不向上传播），直接在原对象上合并消息参数，不复制；
+        # 保留 extra 字段供结构化输出，异常转为文本（traceback 对象不宜跨线程持有）
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SizeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按文件大小轮转的日志文件
+
+    RotatingFileHandler 在每条记录写入前都要为判断轮转再格式化一次记录并 seek/tell 文件；
+    这里每条只格式化一次，并自行累计已写入的字节数。
+    """
+
+    def __init__(self, filename, maxBytes: int, backupCount: int):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding="utf-8", delay=True)
+        self.size = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record) + self.terminator
+            length = len(line.encode("utf-8"))
+            if self.stream is None:
+                self.stream = self._open()
+                self.size = self.stream.tell()
+            if self.maxBytes and self.size and self.size + length > self.maxBytes:
+                self.doRollover()
+                self.stream = self._open()
+                self.size = 0
+            self.stream.write(line)
+            self.stream.flush()
+            self.size += length
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON：时间、级别、模块、消息、请求关联 ID 及 extra 传入的字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return _json_encoder.encode(entry)
+
+
+def log_file_path(worker: int | None = None) -> Path | None:
+    """日志文件路径；多工作进程时每个进程写各自的文件，避免多个进程同时轮转同一文件"""
+    if config.LOG_FILE == "":
+        return None
+    path = Path(config.LOG_FILE) if config.LOG_FILE else DEFAULT_LOG_FILE
+    return path if worker is None else path.with_name(f"{path.stem}-worker{worker}{path.suffix}")
+
+
+def configure_logging(worker: int | None = None) -> None:
+    """为当前进程配置日志：记录经队列交给后台线程写入可轮转的日志文件与 stderr（不写 stdout，
+    stdio 传输下 stdout 是 MCP 协议通道）。同一进程内重复调用无效；fork 出的工作进程需再次调用。
+
+    Args:
+        worker: HTTP 工作进程编号，日志写入各自的文件
+    """
+    global _listener, _queue_handler, _sampling_filter, _configured_pid
+    with _configure_lock:
+        if _configured_pid == os.getpid():
+            return
+        logger = logging.getLogger(ROOT_LOGGER)
+        if _queue_handler is not None:
+            # fork 继承的配置：后台线程没有跟随进入子进程，换成新的队列与线程
+            logger.removeHandler(_queue_handler)
+
+        formatter = JsonFormatter() if config.LOG_JSON else logging.Formatter(config.LOG_FORMAT)
+        handlers: list[logging.Handler] = []
+        path = log_file_path(worker)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            handlers.append(SizeRotatingFileHandler(path, config.LOG_MAX_BYTES, config.LOG_BACKUP_COUNT))
+        if config.LOG_STDERR:
+            handlers.append(logging.StreamHandler(sys.stderr))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _sampling_filter = SamplingFilter()
+        _queue_handler = NonBlockingQueueHandler()
+        _queue_handler.addFilter(_sampling_filter)
+        _queue_handler.addFilter(RequestIdFilter())
+        logger.addHandler(_queue_handler)
+        logger.setLevel(config.LOG_LEVEL)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        _configured_pid = os.getpid()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """写完队列中剩余的日志并停止后台线程（os._exit 退出的工作进程需显式调用）"""
+    global _listener, _configured_pid
+    with _configure_lock:
+        if _listener is None or _configured_pid != os.getpid():
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _configured_pid = None
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+
+
+def stats() -> dict[str, float]:
+    """因队列已满丢弃与被采样省略的日志条数"""
+    return {
+        "records_dropped": _queue_handler.dropped if _queue_handler is not None else 0,
+        "records_sampled_out": _sampling_filter.suppressed_total if _sampling_filter is not None else 0,
+    }
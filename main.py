@@ -1,6 +1,20 @@
 import argparse
+import csv
+import sys
+import time
+from itertools import islice
 from pathlib import Path
 import sqlite3
+from typing import Iterable, Iterator
+
+DB_PATH = Path(__file__).parent / "data" / "weather_grid.db"
+
+# 批量解析时每批写入临时表并联表查询的行数
+DEFAULT_BATCH_SIZE = 10000
+
+# 批量解析 CSV 时识别的地区列（中文表头与 migrate.py 的源文件一致，也接受英文表头）
+LOCATION_COLUMNS = (("省份", "province"), ("城市", "city"), ("区县", "district"))
+GRID_COLUMNS = ("网格X", "网格Y")
 
 
 def get_grid_location(province, city, district):
@@ -15,7 +29,7 @@ def get_grid_location(province, city, district):
     Returns:
         tuple: (grid_x, grid_y) 网格坐标，如果未找到则返回 None
     """
-    db_path = Path(__file__).parent / "data" / "weather_grid.db"
+    db_path = DB_PATH
 
     if not db_path.exists():
         raise FileNotFoundError(f"数据库文件未找到: {db_path}")
@@ -42,14 +56,134 @@ def get_grid_location(province, city, district):
         conn.close()
 
 
+def resolve_batch(conn: sqlite3.Connection, rows: list[tuple]) -> list[tuple | None]:
+    """
+    通过一次临时表联表查询解析一批 (province, city, district)，结果与输入一一对应
+
+    Returns:
+        list: 每行的 (grid_x, grid_y)，未找到为 None
+    """
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS lookup "
+        "(seq INTEGER PRIMARY KEY, province TEXT, city TEXT, district TEXT)"
+    )
+    conn.execute("DELETE FROM temp.lookup")
+    conn.executemany("INSERT INTO temp.lookup VALUES (?, ?, ?, ?)",
+                     ((seq,) + tuple(row[:3]) for seq, row in enumerate(rows)))
+    results: list[tuple | None] = [None] * len(rows)
+    # weather_grid 上 (province, city, district) 的唯一索引使联表逐行走索引查找
+    for seq, grid_x, grid_y in conn.execute(
+        """
+        SELECT l.seq, g.grid_x, g.grid_y
+        FROM temp.lookup AS l
+        JOIN weather_grid AS g
+          ON g.province = l.province AND g.city = l.city AND g.district = l.district
+        """
+    ):
+        results[seq] = (grid_x, grid_y)
+    return results
+
+
+def resolve_locations(rows: Iterable[tuple], db_path: Path | None = None,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple[tuple, tuple | None]]:
+    """
+    批量解析 (province, city, district) 行的网格坐标，全程只使用一个数据库连接
+
+    输入按 batch_size 分批流式读取，每批写入临时表后联表查询一次，不逐行查询。
+
+    Args:
+        rows: (province, city, district) 行，名称前后的空白会被去除
+        db_path: 数据库路径，默认 data/weather_grid.db
+        batch_size: 每批的行数
+
+    Yields:
+        tuple: (输入行, (grid_x, grid_y) 或 None)，顺序与输入一致
+    """
+    db_path = Path(db_path) if db_path else DB_PATH
+    if not db_path.exists():
+        raise FileNotFoundError(f"数据库文件未找到: {db_path}")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            names = [tuple("" if v is None else str(v).strip() for v in row[:3]) for row in batch]
+            yield from zip(batch, resolve_batch(conn, names))
+    finally:
+        conn.close()
+
+
+def _location_indexes(header: list[str], source: Path) -> list[int]:
+    """返回 CSV 表头中省、市、区县列的列号"""
+    header = [h.strip().lower() for h in header]
+    indexes = []
+    for names in LOCATION_COLUMNS:
+        index = next((header.index(name) for name in names if name in header), None)
+        if index is None:
+            raise ValueError(f"源文件中缺少必要字段: '{names[0]}' 或 '{names[1]}' ({source})")
+        indexes.append(index)
+    return indexes
+
+
+def resolve_csv(source: Path, output: Path, db_path: Path | None = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> tuple[int, int, float]:
+    """
+    流式读取含省、市、区县列的 CSV，在原有各列之后追加网格坐标写出（未找到的行留空）
+
+    Returns:
+        tuple: (总行数, 解析成功的行数, 耗时秒数)
+    """
+    start = time.perf_counter()
+    total = resolved = 0
+    with open(source, newline="", encoding="utf-8-sig") as src, \
+            open(output, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"源文件为空: {source}")
+        indexes = _location_indexes(header, source)
+        writer.writerow(header + list(GRID_COLUMNS))
+
+        # 前三项为待解析的省、市、区县，末项为原始行（写出时原样保留）
+        rows = ([row[i] if i < len(row) else "" for i in indexes] + [row] for row in reader)
+        for row, grid in resolve_locations(rows, db_path, batch_size):
+            total += 1
+            if grid is None:
+                writer.writerow(row[3] + ["", ""])
+            else:
+                resolved += 1
+                writer.writerow(row[3] + list(grid))
+    return total, resolved, time.perf_counter() - start
+
+
 def main():
     parser = argparse.ArgumentParser(description="查询指定地区的气象网格坐标")
     parser.add_argument("--province", type=str, help="省份名称（如：北京市）")
     parser.add_argument("--city", type=str, help="城市名称（如：北京市）")
     parser.add_argument("--district", type=str, help="区县名称（如：朝阳区）")
+    parser.add_argument("--bulk", type=Path, metavar="CSV",
+                        help="批量模式：解析 CSV（含 省份/城市/区县 或 province/city/district 列）中每行的网格坐标")
+    parser.add_argument("--output", type=Path, help="批量模式的输出文件，默认为 <源文件名>_grid.csv")
+    parser.add_argument("--db", type=Path, help="批量模式使用的 SQLite 数据库路径，默认 data/weather_grid.db")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="批量模式每批联表查询的行数")
 
     args = parser.parse_args()
 
+    if args.bulk:
+        output = args.output or args.bulk.with_name(f"{args.bulk.stem}_grid.csv")
+        try:
+            total, resolved, elapsed = resolve_csv(args.bulk, output, args.db, args.batch_size)
+        except Exception as e:
+            print(f"发生错误: {e}")
+            sys.exit(1)
+        print(f"已解析 {resolved}/{total} 行，结果写入 {output}")
+        print(f"耗时 {elapsed:.2f} 秒，{total / elapsed if elapsed else 0:.0f} 行/秒")
+        return
+
     # 如果参数未提供，则使用默认值进行演示
     if not (args.province and args.city and args.district):
         print("未提供完整地区信息，使用示例数据:")
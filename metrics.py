@@ -0,0 +1,381 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+import logs
+
+# 延迟直方图的桶上界（秒），覆盖内存查找（约 0.1ms）到上游重试（数秒）
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 工具返回的文本以这些前缀开头时计为错误 / 未找到（过期数据由 api 经 mark_stale() 直接标记）
+TOOL_ERROR_PREFIXES = ("Error", "获取天气信息时发生错误", "查询历史预报时发生错误")
+TOOL_NOT_FOUND_PREFIXES = ("No location found",)
+
+# 指标说明，用于 Prometheus 文本格式的 HELP 行
+METRIC_HELP = {
+    "tool_duration_seconds": "MCP 工具调用耗时",
+    "tool_calls_total": "MCP 工具调用次数（按结果分类）",
+    "tool_response_bytes_total": "MCP 工具返回的文本字节数",
+    "upstream_request_seconds": "单次上游 HTTP 请求耗时（每次重试单独计）",
+    "upstream_requests_total": "上游 HTTP 请求次数（按结果分类）",
+    "upstream_response_bytes_total": "上游响应体字节数",
+    "upstream_retries_total": "上游临时性错误后的重试次数",
+    "upstream_rejected_total": "被熔断器或速率限制拦下、未发出的上游请求",
+    "location_lookup_seconds": "省/市/区到网格坐标的查找耗时",
+    "forecast_decode_seconds": "预报条目解码为列的耗时",
+    "forecast_render_seconds": "预报渲染为文本的耗时",
+    "stale_forecasts_total": "上游失败时返回的过期预报次数",
+}
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, value: float = 1) -> None:
+        self.value += value
+
+
+class Histogram:
+    """固定桶的累积直方图，observe 只做一次二分查找和两次加法"""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def time(self) -> "_Timer":
+        """with histogram.time(): ... 记录代码块耗时"""
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float | None:
+        """按桶内线性插值估算分位数（与 Prometheus histogram_quantile 相同的方法）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): n for bound, n in zip(self.bounds + (float("inf"),), self.counts) if n},
+        }
+
+
+def _label_key(labels: dict[str, str]) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """进程内的计数器与延迟直方图
+
+    只在事件循环线程中更新，不加锁；指标按 (名称, 标签) 存放在字典中。
+    counter() / histogram() 返回的对象可由调用方保存，热点路径上每次更新只剩一次加法
+    （或一次二分查找），不再查找标签。
+    其他组件自带的统计（如预报缓存的命中数）通过 register_collector 在读取时并入。
+    """
+
+    def __init__(self):
+        self._counters: dict[str, dict[tuple, Counter]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._collectors: list[tuple[str, Callable[[], dict[str, float]]]] = []
+        self.started_at = time.time()
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        counter = series.get(key)
+        if counter is None:
+            counter = series[key] = Counter()
+        return counter
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        series = self._histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        return histogram
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        self.counter(name, **labels).inc(value)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        self.histogram(name, **labels).observe(seconds)
+
+    def timer(self, name: str, **labels: str) -> "_Timer":
+        """with metrics.timer("forecast_decode_seconds"): ... 记录代码块耗时"""
+        return _Timer(self.histogram(name, **labels))
+
+    def register_collector(self, prefix: str, collect: Callable[[], dict[str, float]]) -> None:
+        """读取指标时调用 collect()，其返回的各数值以 "{prefix}_{键}" 为名输出"""
+        self._collectors.append((prefix, collect))
+
+    def reset(self) -> None:
+        """清零所有指标（已保存的 Counter / Histogram 对象仍然有效）"""
+        for series in self._counters.values():
+            for counter in series.values():
+                counter.value = 0
+        for series in self._histograms.values():
+            for histogram in series.values():
+                histogram.counts = [0] * len(histogram.counts)
+                histogram.count = 0
+                histogram.total = 0.0
+        self.started_at = time.time()
+
+    def _collected(self) -> dict[str, float]:
+        values = {}
+        for prefix, collect in self._collectors:
+            for key, value in collect().items():
+                if isinstance(value, (int, float)):
+                    values[f"{prefix}_{key}"] = value
+        return values
+
+    def snapshot(self) -> dict:
+        """全部指标的 JSON 友好表示（省略尚未记录过的序列）"""
+        def labelled(key: tuple) -> str:
+            return ",".join(f"{name}={value}" for name, value in key) or "total"
+
+        counters = {
+            name: {labelled(key): counter.value for key, counter in sorted(series.items()) if counter.value}
+            for name, series in sorted(self._counters.items())
+        }
+        histograms = {
+            name: {labelled(key): histogram.snapshot() for key, histogram in sorted(series.items())
+                   if histogram.count}
+            for name, series in sorted(self._histograms.items())
+        }
+        return {
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "counters": {name: series for name, series in counters.items() if series},
+            "histograms": {name: series for name, series in histograms.items() if series},
+            "gauges": self._collected(),
+        }
+
+    def render_prometheus(self, namespace: str = "cn_weather") -> str:
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        lines = []
+        for name, series in sorted(self._counters.items()):
+            metric = f"{namespace}_{name}"
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {metric} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {metric} counter")
+            for key, counter in sorted(series.items()):
+                lines.append(f"{metric}{_format_labels(key)} {counter.value:g}")
+        for name, series in sorted(self._histograms.items()):
+            metric = f"{namespace}_{name}"
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {metric} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, n in zip(histogram.bounds, histogram.counts):
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(key, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(key)} {histogram.total:.6f}")
+                lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        for name, value in sorted(self._collected().items()):
+            lines.append(f"# TYPE {namespace}_{name} gauge")
+            lines.append(f"{namespace}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+# 进程内唯一的指标注册表
+metrics = MetricsRegistry()
+metrics.register_collector("log", logs.stats)
+
+logger = logs.get_logger("metrics")
+
+
+# 当前工具调用是否用到了过期数据：instrument_tool 为每次调用放入一个新的可变标记，
+# 调用中创建的任务复制的是同一个标记对象，在任务里置位对外层调用同样可见
+_stale_flag: contextvars.ContextVar[list[bool] | None] = contextvars.ContextVar("stale_flag", default=None)
+
+
+def mark_stale() -> None:
+    """标记当前工具调用返回了上游不可用时的过期数据（不在工具调用中时无效）"""
+    flag = _stale_flag.get()
+    if flag is not None:
+        flag[0] = True
+
+
+@contextmanager
+def _track_stale():
+    flag = [False]
+    token = _stale_flag.set(flag)
+    try:
+        yield flag
+    finally:
+        _stale_flag.reset(token)
+
+
+def _tool_outcome(result, stale: bool) -> str:
+    if isinstance(result, str):
+        if result.startswith(TOOL_ERROR_PREFIXES):
+            return "error"
+        if result.startswith(TOOL_NOT_FOUND_PREFIXES):
+            return "not_found"
+    return "stale" if stale else "ok"
+
+
+class _ToolMetrics:
+    """单个工具的指标对象，在装饰时创建，调用时直接更新"""
+
+    __slots__ = ("tool", "duration", "calls", "response_bytes")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.duration = metrics.histogram("tool_duration_seconds", tool=tool)
+        self.calls = {outcome: metrics.counter("tool_calls_total", tool=tool, outcome=outcome)
+                      for outcome in ("ok", "stale", "not_found", "error", "exception")}
+        self.response_bytes = metrics.counter("tool_response_bytes_total", tool=tool)
+
+    def record(self, start: float, result, stale: bool = False) -> None:
+        elapsed = time.perf_counter() - start
+        outcome = _tool_outcome(result, stale)
+        self.duration.observe(elapsed)
+        self.calls[outcome].inc()
+        if isinstance(result, str):
+            self.response_bytes.inc(len(result.encode("utf-8")))
+        if outcome != "ok" or logger.isEnabledFor(logging.DEBUG):
+            logger.log(logging.INFO if outcome != "ok" else logging.DEBUG, "工具调用完成",
+                       extra={"tool": self.tool, "outcome": outcome, "duration_ms": round(elapsed * 1000, 3)})
+
+    def record_exception(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        self.duration.observe(elapsed)
+        self.calls["exception"].inc()
+        logger.exception("工具调用异常", extra={"tool": self.tool, "duration_ms": round(elapsed * 1000, 3)})
+
+
+def instrument_tool(func: Callable) -> Callable:
+    """记录工具的耗时、调用结果与返回字节数；保留原函数签名供 FastMCP 生成参数模式
+
+    每次调用在新的请求关联 ID 下执行，调用期间（含其创建的任务）记录的日志都带有该 ID。
+    """
+    tool_metrics = _ToolMetrics(func.__name__)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with logs.request_context(), _track_stale() as stale:
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except (Exception, asyncio.CancelledError):
+                    tool_metrics.record_exception(start)
+                    raise
+                tool_metrics.record(start, result, stale[0])
+                return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with logs.request_context(), _track_stale() as stale:
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                tool_metrics.record_exception(start)
+                raise
+            tool_metrics.record(start, result, stale[0])
+            return result
+    return wrapper
+
+
+class MetricsHTTPServer:
+    """在本地端口上以 Prometheus 文本格式提供 /metrics（仅依赖 asyncio）"""
+
+    def __init__(self, host: str, port: int, registry: MetricsRegistry = metrics):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server: asyncio.AbstractServer | None = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5.0)
+            while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+                status, body = "200 OK", self.registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    @property
+    def bound_port(self) -> int | None:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -1,43 +1,103 @@
 #!/usr/bin/env python3
+import argparse
+import csv
+import hashlib
 import os
-import pandas as pd
 import sqlite3
+import time
+from itertools import islice
 from pathlib import Path
+from typing import Iterator
+import logs
+from location_search import FTS_TABLE, build_fts_index
+from location_snapshot import export_snapshot
 
-def migrate_excel_to_sqlite():
-    """
-    将 nxy.xlsx 中的行政区划与网格坐标数据迁移至 SQLite 数据库。
-    所需字段：省份, 城市, 区县, 网格X, 网格Y
-    """
+logger = logs.get_logger("migrate")
 
-    # 定义路径
-    base_dir = Path(__file__).parent.parent  # 项目根目录
-    data_dir = base_dir / "data"             # 数据目录
-    excel_file = data_dir / "nxy.xlsx"        # Excel 文件路径
-    db_file = data_dir / "weather_grid.db"    # SQLite 数据库文件路径
+# 源文件所需字段：省份, 城市, 区县, 网格X, 网格Y
+REQUIRED_COLUMNS = ["省份", "城市", "区县", "网格X", "网格Y"]
 
-    # 创建数据目录（如果不存在）
-    os.makedirs(data_dir, exist_ok=True)
+# 每批写入的行数
+DEFAULT_CHUNK_SIZE = 5000
 
-    # 检查 Excel 文件是否存在
-    if not excel_file.exists():
-        raise FileNotFoundError(f"未找到 Excel 文件: {excel_file}")
+# 导入完成后再创建的二级索引（批量写入期间不维护，避免逐行更新索引）
+SECONDARY_INDEXES = {
+    "idx_weather_grid_city": "CREATE INDEX IF NOT EXISTS idx_weather_grid_city ON weather_grid (city)",
+    "idx_weather_grid_district": "CREATE INDEX IF NOT EXISTS idx_weather_grid_district ON weather_grid (district)",
+    "idx_weather_grid_cell": "CREATE INDEX IF NOT EXISTS idx_weather_grid_cell ON weather_grid (grid_x, grid_y)",
+}
 
-    # 读取 Excel 文件
-    print(f"正在读取 Excel 文件: {excel_file}")
-    df = pd.read_excel(excel_file)
 
-    # 检查必需字段是否齐全
-    required_columns = ["省份", "城市", "区县", "网格X", "网格Y"]
-    for column in required_columns:
-        if column not in df.columns:
-            raise ValueError(f"Excel 文件中缺少必要字段: '{column}'")
+def _select_columns(header: list, source: Path) -> list[int]:
+    """检查表头并返回必需字段所在的列号"""
+    header = [str(h).strip() if h is not None else "" for h in header]
+    for column in REQUIRED_COLUMNS:
+        if column not in header:
+            raise ValueError(f"源文件中缺少必要字段: '{column}' ({source})")
+    return [header.index(column) for column in REQUIRED_COLUMNS]
 
-    # 连接 SQLite 数据库（如果不存在则自动创建）
-    print(f"正在创建或连接数据库: {db_file}")
-    conn = sqlite3.connect(db_file)
 
-    # 创建表结构
+def iter_xlsx_rows(source: Path) -> Iterator[tuple]:
+    """以只读模式逐行读取 Excel 文件"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        indexes = _select_columns(list(next(rows, [])), source)
+        for row in rows:
+            yield tuple(row[i] if i < len(row) else None for i in indexes)
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(source: Path) -> Iterator[tuple]:
+    """逐行读取 CSV 文件（兼容带 BOM 的 UTF-8）"""
+    with open(source, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        indexes = _select_columns(next(reader, []), source)
+        for row in reader:
+            yield tuple(row[i] if i < len(row) else None for i in indexes)
+
+
+def iter_parquet_rows(source: Path) -> Iterator[tuple]:
+    """按 record batch 流式读取 Parquet 文件"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source)
+    _select_columns(parquet_file.schema_arrow.names, source)
+    for batch in parquet_file.iter_batches(columns=REQUIRED_COLUMNS, batch_size=DEFAULT_CHUNK_SIZE):
+        yield from zip(*(batch.column(column).to_pylist() for column in REQUIRED_COLUMNS))
+
+
+SOURCE_READERS = {
+    ".xlsx": iter_xlsx_rows,
+    ".csv": iter_csv_rows,
+    ".parquet": iter_parquet_rows,
+}
+
+
+def row_hash(record: tuple) -> str:
+    """计算一行数据的内容哈希，用于增量导入时判断是否变化"""
+    return hashlib.blake2b("\x1f".join(map(str, record)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def iter_records(rows: Iterator[tuple]) -> Iterator[tuple]:
+    """清洗原始行并附加内容哈希，无效行打印后跳过"""
+    for row in rows:
+        try:
+            province, city, district = ("" if v is None else str(v).strip() for v in row[:3])
+            if not (province and city and district):
+                raise ValueError("省/市/区县不能为空")
+            record = (province, city, district, int(float(row[3])), int(float(row[4])))
+        except (TypeError, ValueError) as e:
+            logger.warning("跳过无效记录", extra={"row": repr(row), "error": str(e), "sample_key": "migrate:invalid_record"})
+            continue
+        yield record + (row_hash(record),)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """创建表结构，并为旧版数据库补充 row_hash 列"""
     conn.execute('''
     CREATE TABLE IF NOT EXISTS weather_grid (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,45 +106,144 @@ def migrate_excel_to_sqlite():
         district TEXT NOT NULL,
         grid_x INTEGER NOT NULL,
         grid_y INTEGER NOT NULL,
+        row_hash TEXT,
         UNIQUE(province, city, district)
     )
     ''')
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(weather_grid)")}
+    if "row_hash" not in columns:
+        conn.execute("ALTER TABLE weather_grid ADD COLUMN row_hash TEXT")
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    """数据库中是否已有名为 name 的表（含虚拟表）"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
 
-    # 插入数据
-    print("正在插入数据到数据库...")
-    for _, row in df.iterrows():
-        try:
-            conn.execute(
-                '''
-                INSERT OR REPLACE INTO weather_grid 
-                (province, city, district, grid_x, grid_y) 
-                VALUES (?, ?, ?, ?, ?)
-                ''',
-                (
-                    row["省份"],
-                    row["城市"],
-                    row["区县"],
-                    int(row["网格X"]),
-                    int(row["网格Y"])
-                )
-            )
-        except Exception as e:
-            print(f"插入记录时发生错误: {row.to_dict()}，错误信息: {e}")
-
-    # 提交更改并关闭连接
-    conn.commit()
-    conn.close()
 
-    print("数据迁移完成！")
+def migrate_to_sqlite(source: Path | None = None, db_file: Path | None = None,
+                      incremental: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    将行政区划与网格坐标数据（xlsx / csv / parquet）流式导入 SQLite 数据库。
+
+    Args:
+        source: 源文件路径，默认为 data/nxy.xlsx
+        db_file: SQLite 数据库文件路径，默认为 data/weather_grid.db
+        incremental: 增量模式，仅写入内容哈希发生变化的行
+        chunk_size: 每批 executemany 写入的行数
+
+    Returns:
+        int: 新增或更新的行数
+    """
+
+    # 定义路径
+    base_dir = Path(__file__).parent.parent  # 项目根目录
+    data_dir = base_dir / "data"             # 数据目录
+    source = Path(source) if source else data_dir / "nxy.xlsx"
+    db_file = Path(db_file) if db_file else data_dir / "weather_grid.db"
+
+    # 创建数据目录（如果不存在）
+    os.makedirs(db_file.parent, exist_ok=True)
+
+    # 检查源文件是否存在
+    if not source.exists():
+        raise FileNotFoundError(f"未找到源文件: {source}")
+
+    reader = SOURCE_READERS.get(source.suffix.lower())
+    if reader is None:
+        raise ValueError(f"不支持的源文件格式: {source.suffix}（支持 {', '.join(SOURCE_READERS)}）")
+
+    # 连接 SQLite 数据库（如果不存在则自动创建）
+    logger.info("正在创建或连接数据库", extra={"db": str(db_file)})
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+    upsert = '''
+    INSERT INTO weather_grid (province, city, district, grid_x, grid_y, row_hash)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(province, city, district) DO UPDATE SET
+        grid_x = excluded.grid_x,
+        grid_y = excluded.grid_y,
+        row_hash = excluded.row_hash
+    '''
+    if incremental:
+        upsert += " WHERE weather_grid.row_hash IS NOT excluded.row_hash"
+
+    start = time.perf_counter()
+    total_rows = 0
+    try:
+        # 整个导入在单个事务中完成
+        conn.execute("BEGIN")
+        ensure_schema(conn)
+        if not incremental:
+            for name in SECONDARY_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+        logger.info("正在流式读取源文件", extra={"source": str(source)})
+        changes_before = conn.total_changes
+        records = iter_records(reader(source))
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            conn.executemany(upsert, chunk)
+            total_rows += len(chunk)
+            logger.info("已处理", extra={"rows": total_rows})
+        changed_rows = conn.total_changes - changes_before
+
+        # 数据写入完成后再建立二级索引
+        for statement in SECONDARY_INDEXES.values():
+            conn.execute(statement)
+
+        # 构建 FTS5 trigram 全文检索表（含去除省/市/区/县/街道后缀的别名）；
+        # 增量导入没有变化的行时，检索表缺失（如旧版数据库或上次构建失败）也要构建
+        if changed_rows or not incremental or not table_exists(conn, FTS_TABLE):
+            logger.info("正在构建地区全文检索索引")
+            try:
+                fts_count = build_fts_index(conn)
+                logger.info("全文检索索引构建完成", extra={"rows": fts_count})
+            except sqlite3.OperationalError as e:
+                logger.error("构建全文检索索引失败（需要支持 FTS5 trigram 的 SQLite 3.34+）", extra={"error": str(e)})
+
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
 
     # 输出统计信息
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM weather_grid")
-    count = cursor.fetchone()[0]
-    print(f"数据库中共有 {count} 条记录")
+    count = conn.execute("SELECT COUNT(*) FROM weather_grid").fetchone()[0]
     conn.close()
+    logger.info("数据迁移完成", extra={
+        "rows_read": total_rows,
+        "rows_changed": changed_rows,
+        "rows_total": count,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(total_rows / elapsed) if elapsed else 0,
+    })
+
+    # 导出供服务器启动时内存映射读取的二进制快照（在关闭连接、WAL 合并回数据库之后写入，确保快照不早于数据库）
+    snapshot, snapshot_rows = export_snapshot(db_file)
+    logger.info("已导出位置快照", extra={"snapshot": str(snapshot), "rows": snapshot_rows})
+    return changed_rows
+
+
+# 旧名称：原先只支持从 Excel 导入，保留供既有调用方使用
+migrate_excel_to_sqlite = migrate_to_sqlite
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将行政区划与网格坐标数据导入 SQLite 数据库")
+    parser.add_argument("--source", type=Path, help="源文件路径（.xlsx / .csv / .parquet），默认 data/nxy.xlsx")
+    parser.add_argument("--db", type=Path, help="SQLite 数据库路径，默认 data/weather_grid.db")
+    parser.add_argument("--incremental", action="store_true", help="仅写入内容发生变化的行")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每批写入的行数")
+    args = parser.parse_args()
+
+    logs.configure_logging()
+    migrate_to_sqlite(args.source, args.db, args.incremental, args.chunk_size)
 
 
 if __name__ == "__main__":
-    migrate_excel_to_sqlite()
\ No newline at end of file
+    main()
@@ -0,0 +1,53 @@
+import os
+
+import config
+import logs
+from api import fetch_ultra_srt_forecast, hot_cells
+from scheduler import IssuanceScheduler
+from utils import gather_limited
+
+logger = logs.get_logger("prewarm")
+
+
+def select_cells(top_n: int, budget: int) -> list[tuple[int, int]]:
+    """挑选需要预热的网格：先取 SUPPORTED_LOCATIONS，再按请求频次补足，总数不超过预算"""
+    cells = [(int(loc["nx"]), int(loc["ny"])) for loc in config.SUPPORTED_LOCATIONS.values()]
+    cells.extend(hot_cells.top(top_n))
+    return list(dict.fromkeys(cells))[:budget]
+
+
+async def warm_cells(cells: list[tuple[int, int]], concurrency: int) -> tuple[int, int]:
+    """以有限并发把各网格当前发布时次的预报写入缓存，返回 (成功数, 失败数)"""
+    results = await gather_limited(lambda cell: fetch_ultra_srt_forecast(*cell, track=False, allow_stale=False),
+                                   cells, concurrency)
+    failed = 0
+    for cell, result in zip(cells, results):
+        if isinstance(result, BaseException):
+            failed += 1
+            logger.warning("预热网格失败", extra={"grid": cell, "error": str(result), "sample_key": "prewarm"})
+    return len(cells) - failed, failed
+
+
+class PrewarmScheduler(IssuanceScheduler):
+    """后台预热调度器：启动后稍等片刻先预热一次，随后在每个超短期预报时次发布后刷新热点网格"""
+
+    def __init__(self, top_n: int = config.PREWARM_TOP_N, budget: int = config.PREWARM_BUDGET,
+                 concurrency: int = config.PREWARM_CONCURRENCY, jitter: float = config.PREWARM_JITTER_SECONDS,
+                 start_delay: float = config.PREWARM_START_DELAY_SECONDS):
+        super().__init__(jitter, start_delay)
+        self.top_n = top_n
+        self.budget = budget
+        self.concurrency = concurrency
+        self.cycles = 0
+
+    async def run_cycle(self) -> tuple[int, int]:
+        if not os.environ.get("CN_WEATHER_API_KEY"):
+            # 未配置 API 密钥时每个网格都会失败，直接跳过本轮
+            return 0, 0
+        cells = select_cells(self.top_n, self.budget)
+        warmed, failed = await warm_cells(cells, self.concurrency)
+        self.cycles += 1
+        logger.info("预热周期完成", extra={"cycle": self.cycles, "warmed": warmed, "failed": failed})
+        # 衰减历史计数，使下一轮的热点排名偏向近期请求
+        hot_cells.decay()
+        return warmed, failed
@@ -0,0 +1,104 @@
+import math
+
+from decoder import MISSING_CODE, NAN, rain_amount
+
+# 降水类型代码中表示“无降水”的取值
+NO_RAIN_CODE = 0
+
+
+def time_axis(columns_list: list[dict[str, list]]) -> list[tuple[str, str]]:
+    """各网格预报时刻的并集，按时间排序"""
+    return sorted({key for columns in columns_list for key in zip(columns['fcst_date'], columns['fcst_time'])})
+
+
+def _matrices(columns_list: list[dict[str, list]], times: list[tuple[str, str]]) -> tuple[list, list, list]:
+    """网格 × 预报时刻的气温、降水量（缺失为 NaN）与降水类型（缺失为 -1）矩阵"""
+    position = {key: i for i, key in enumerate(times)}
+    temp, rain, pty = [], [], []
+    for columns in columns_list:
+        temp_row, rain_row, pty_row = [NAN] * len(times), [NAN] * len(times), [MISSING_CODE] * len(times)
+        for date, time, t, r, p in zip(columns['fcst_date'], columns['fcst_time'],
+                                       columns['temp'], columns['rn1'], columns['pty']):
+            i = position[(date, time)]
+            temp_row[i] = NAN if t is None else t
+            rain_row[i] = rain_amount(r)
+            pty_row[i] = MISSING_CODE if p is None else p
+        temp.append(temp_row)
+        rain.append(rain_row)
+        pty.append(pty_row)
+    return temp, rain, pty
+
+
+def _summarize_numpy(np, temp: list, rain: list, pty: list) -> dict:
+    temp = np.array(temp, dtype=np.float64)
+    rain = np.array(rain, dtype=np.float64)
+    pty = np.array(pty, dtype=np.int8)
+    summary = {}
+
+    has_temp = ~np.isnan(temp)
+    if has_temp.any():
+        low = np.where(has_temp, temp, np.inf)
+        high = np.where(has_temp, temp, -np.inf)
+        summary['temp_min'] = (float(low.min()), int(np.unravel_index(low.argmin(), low.shape)[0]))
+        summary['temp_max'] = (float(high.max()), int(np.unravel_index(high.argmax(), high.shape)[0]))
+        summary['temp_mean'] = float(temp[has_temp].mean())
+
+    rain_filled = np.nan_to_num(rain, nan=0.0)
+    cell_rain = rain_filled.max(axis=1)
+    summary['rain_max'] = (float(cell_rain.max()), int(cell_rain.argmax()))
+
+    # 降水类型非“无降水”或降水量大于 0 的时刻视为有降水
+    wet = ((pty != NO_RAIN_CODE) & (pty != MISSING_CODE)) | (rain_filled > 0)
+    wet_cells = np.flatnonzero(wet.any(axis=1))
+    first_wet = wet.argmax(axis=1)
+    summary['wet_cells'] = [(int(cell), int(first_wet[cell]), float(cell_rain[cell])) for cell in wet_cells]
+    summary['wet_per_hour'] = wet.sum(axis=0).tolist()
+    return summary
+
+
+def _summarize_python(temp: list, rain: list, pty: list) -> dict:
+    summary = {}
+
+    readings = [(t, cell) for cell, row in enumerate(temp) for t in row if not math.isnan(t)]
+    if readings:
+        summary['temp_min'] = min(readings, key=lambda reading: reading[0])
+        summary['temp_max'] = max(readings, key=lambda reading: reading[0])
+        summary['temp_mean'] = sum(t for t, _ in readings) / len(readings)
+
+    cell_rain = [max((0.0 if math.isnan(r) else r for r in row), default=0.0) for row in rain]
+    summary['rain_max'] = max(((r, cell) for cell, r in enumerate(cell_rain)), key=lambda item: item[0])
+
+    wet = [[(p not in (NO_RAIN_CODE, MISSING_CODE)) or r > 0 for p, r in zip(pty_row, rain_row)]
+           for pty_row, rain_row in zip(pty, rain)]
+    summary['wet_cells'] = [(cell, row.index(True), cell_rain[cell]) for cell, row in enumerate(wet) if any(row)]
+    summary['wet_per_hour'] = [sum(column) for column in zip(*wet)]
+    return summary
+
+
+def summarize(columns_list: list[dict[str, list]]) -> dict:
+    """汇总多个网格的预报：气温最低/最高/平均、最大小时降水量与有降水的网格
+
+    已安装 NumPy 时在网格 × 预报时刻矩阵上向量化计算，否则逐个计算。
+
+    Args:
+        columns_list: 各网格按列存放的预报数据（至少一个网格且均有预报时刻），需含 temp、rn1、pty 列
+
+    Returns:
+        dict:
+            times: 预报时刻 (fcst_date, fcst_time) 列表
+            temp_min / temp_max: (气温, 网格下标)，无气温数据时不含
+            temp_mean: 全部网格与时刻的平均气温，无气温数据时不含
+            rain_max: (最大小时降水量 mm, 网格下标)
+            wet_cells: 有降水的网格 [(网格下标, 首个有降水的时刻下标, 最大小时降水量 mm)]
+            wet_per_hour: 每个预报时刻有降水的网格数
+    """
+    times = time_axis(columns_list)
+    matrices = _matrices(columns_list, times)
+    try:
+        import numpy as np
+    except ImportError:
+        summary = _summarize_python(*matrices)
+    else:
+        summary = _summarize_numpy(np, *matrices)
+    summary['times'] = times
+    return summary
@@ -0,0 +1,114 @@
+import asyncio
+import random
+import time
+
+
+class UpstreamError(Exception):
+    """上游接口请求失败"""
+
+
+class RateLimitedError(UpstreamError):
+    """本地令牌桶在允许的等待时间内没有可用令牌"""
+
+
+class CircuitOpenError(UpstreamError):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class TransientUpstreamError(UpstreamError):
+    """可重试的上游错误（超时、连接失败、429、5xx）"""
+
+
+class TokenBucket:
+    """异步令牌桶：按 rate 个/秒补充令牌，最多积累 capacity 个，用于将上游调用控制在 API 密钥配额内"""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    async def acquire(self, max_wait: float | None = None) -> None:
+        """取得一个令牌；需要等待的时间超过 max_wait 时抛出 RateLimitedError"""
+        # 加锁保证等待者按先来后到取得令牌
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                if max_wait is not None and wait > max_wait:
+                    raise RateLimitedError(f"超出上游请求速率限制（需等待 {wait:.1f} 秒）")
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开熔断器并快速失败；冷却期过后放行一个探测请求（半开），成功则恢复"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """判断是否放行本次请求（半开状态下同一时间只放行一个探测请求）"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """探测请求没有发出或没有结果（被限速、被取消）时交还探测名额，下一个请求可以再次探测"""
+        if self._state == self.HALF_OPEN:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._probing = False
+
+    def retry_after(self) -> float:
+        """熔断器打开时距离下一次探测的秒数"""
+        if self._state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """第 attempt 次重试前的等待时间（带 full jitter 的指数退避）"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,55 @@
+import asyncio
+import random
+from datetime import datetime
+
+import logs
+from cache import ultra_srt_issuance
+
+logger = logs.get_logger("scheduler")
+
+
+class IssuanceScheduler:
+    """后台周期任务：每个超短期预报时次发布后（加随机延迟，避免多个进程同时请求上游）执行一次 run_cycle
+
+    子类实现 run_cycle；start_delay 不为 None 时，启动后等待该秒数先执行一轮，再对齐到发布时次。
+    """
+
+    def __init__(self, jitter: float, start_delay: float | None = None):
+        self.jitter = jitter
+        self.start_delay = start_delay
+        self._task: asyncio.Task | None = None
+
+    def seconds_until_next_cycle(self, now: datetime | None = None) -> float:
+        now = now or datetime.now()
+        _, next_publish = ultra_srt_issuance(now)
+        return max(0.0, (next_publish - now).total_seconds()) + random.uniform(0, self.jitter)
+
+    async def run_cycle(self) -> object:
+        raise NotImplementedError
+
+    async def _run_cycle_logged(self) -> None:
+        try:
+            await self.run_cycle()
+        except Exception:
+            logger.exception("周期任务执行失败", extra={"task": type(self).__name__})
+
+    async def run(self) -> None:
+        if self.start_delay is not None:
+            await asyncio.sleep(self.start_delay)
+            await self._run_cycle_logged()
+        while True:
+            await asyncio.sleep(self.seconds_until_next_cycle())
+            await self._run_cycle_logged()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
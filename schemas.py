@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+
+
+class ForecastData(BaseModel):
+    """按列存放的预报数据：每个预报时刻占一个下标，各数组等长，缺失值为 null"""
+
+    province: str
+    city: str
+    district: str
+    nx: int
+    ny: int
+    base_date: str = Field(description="发布日期 YYYYMMDD")
+    base_time: str = Field(description="发布时次 HHMM")
+    stale: bool = Field(default=False, description="上游不可用时返回的过期预报（发布时次早于当前时次）")
+    fcst_date: list[str] = Field(description="预报日期 YYYYMMDD")
+    fcst_time: list[str] = Field(description="预报时刻 HHMM")
+    temp: list[float | None] = Field(description="气温 T1H (℃)")
+    humidity: list[float | None] = Field(description="相对湿度 REH (%)")
+    sky: list[int | None] = Field(description="天空状况代码 SKY: 1 晴, 3 多云, 4 阴")
+    pty: list[int | None] = Field(description="降水类型代码 PTY: 0 无, 1 雨, 2 雨夹雪, 3 雪, 5 毛毛雨, 6 冻雨, 7 阵雪")
+    rn1: list[str | None] = Field(description="1 小时降水量 RN1（上游原始文本）")
+    wind_vec: list[float | None] = Field(description="风向 VEC (度)")
+    wind_speed: list[float | None] = Field(description="风速 WSD (m/s)")
+    text: str | None = Field(default=None, description="可选的文本渲染结果")
@@ -1,15 +1,226 @@
+import asyncio
+import csv
+import io
+import json
 import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 from mcp.server.fastmcp import FastMCP
-from api import get_forecast_api
+import config
+import logs
+from grid_projection import GRID_SPACING_KM, in_grid, project, to_cell
+from location_index import LocationIndex
+from location_search import search_locations as search_location_index
+from location_snapshot import is_fresh, snapshot_path, write_snapshot
+from metrics import MetricsHTTPServer, instrument_tool, metrics
+from schemas import ForecastData
+from utils import create_http_client, gather_limited, get_shared_client, set_shared_client, set_shared_client_factory
+
+# The forecast layer (api, and prewarm which builds on it) is imported inside the functions that
+# use it: stdio clients spawn a fresh process per session, and a session that only resolves
+# locations never needs it.
+
+
+DB_PATH = Path(__file__).parent.parent / "data" / "weather_grid.db"
+
+logger = logs.get_logger("server")
+
+# In-memory index over weather_grid, loaded on first lookup (None -> SQLite fallback)
+location_index: LocationIndex | None = None
+_location_index_attempted = False
+_location_index_lock = threading.Lock()
+
+# Lookup latency by source, resolved once so the hot path only records the sample
+_lookup_seconds_index = metrics.histogram("location_lookup_seconds", source="index")
+_lookup_seconds_sqlite = metrics.histogram("location_lookup_seconds", source="sqlite")
+
+
+def load_location_index() -> LocationIndex | None:
+    """Load weather_grid into memory on first call; keep the SQLite fallback if that fails.
+
+    Prefers the binary snapshot migrate.py writes next to the database (memory-mapped, no
+    per-row SQLite work) when it is at least as new as the database. Otherwise the table is
+    read from SQLite and the snapshot is (re)written so the next process starts fast.
+    """
+    global location_index, _location_index_attempted
+    if _location_index_attempted:
+        return location_index
+    with _location_index_lock:
+        if _location_index_attempted or not DB_PATH.exists():
+            return location_index
+        snapshot = snapshot_path(DB_PATH)
+        if is_fresh(snapshot, DB_PATH):
+            try:
+                location_index = LocationIndex.from_snapshot(snapshot)
+            except (OSError, ValueError) as e:
+                logger.warning("Failed to read location snapshot, loading from SQLite",
+                               extra={"path": str(snapshot), "error": str(e)})
+        if location_index is None:
+            try:
+                location_index = LocationIndex.from_sqlite(DB_PATH)
+            except sqlite3.Error as e:
+                logger.warning("Failed to load location index, falling back to SQLite", extra={"error": str(e)})
+            else:
+                try:
+                    write_snapshot(location_index.rows, snapshot)
+                except OSError as e:
+                    logger.warning("Failed to write location snapshot", extra={"path": str(snapshot), "error": str(e)})
+        _location_index_attempted = True
+    return location_index
+
+
+def preload_location_index() -> None:
+    """Load the index and build all of its lookup tables up front (long-running HTTP servers)."""
+    index = load_location_index()
+    if index is not None:
+        index.build()
+
+
+# Process-wide resources shared by every MCP session in this process. Under stdio there
+# is one session per process; the HTTP transports run one session per client (or per
+# request when stateless), so the first user starts them and the last one stops them.
+_resources: dict | None = None
+_resource_users = 0
+_resource_lock = asyncio.Lock()
+
+
+async def _start_resources() -> dict:
+    # Logging goes through a background thread (never stdout, which carries stdio frames)
+    logs.configure_logging()
+    # The location index and the pooled upstream client are created on first use
+    set_shared_client_factory(create_http_client)
+    archive = None
+    if config.ARCHIVE_ENABLED:
+        from api import forecast_archive as archive
+        archive.start()
+    prewarmer = None
+    if config.PREWARM_ENABLED:
+        from prewarm import PrewarmScheduler
+        prewarmer = PrewarmScheduler()
+        prewarmer.start()
+    metrics_server = None
+    if config.METRICS_PORT is not None:
+        metrics_server = MetricsHTTPServer(config.METRICS_HOST, config.METRICS_PORT)
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.error("Failed to start metrics endpoint",
+                         extra={"host": config.METRICS_HOST, "port": config.METRICS_PORT, "error": str(e)})
+            metrics_server = None
+    # Forecast subscriptions start with the first resources/subscribe request
+    return {"archive": archive, "prewarmer": prewarmer, "metrics_server": metrics_server, "subscriptions": None}
+
+
+async def _stop_resources(resources: dict) -> None:
+    if resources["metrics_server"] is not None:
+        await resources["metrics_server"].stop()
+    if resources["prewarmer"] is not None:
+        await resources["prewarmer"].stop()
+    if resources["subscriptions"] is not None:
+        await resources["subscriptions"].stop()
+    if resources["archive"] is not None:
+        await resources["archive"].stop()
+    set_shared_client_factory(None)
+    client = get_shared_client()
+    set_shared_client(None)
+    if client is not None:
+        await client.aclose()
+
+
+@asynccontextmanager
+async def server_resources() -> AsyncIterator[dict]:
+    """Hold the process-wide resources for the duration of the block, starting them on first use."""
+    global _resources, _resource_users
+    _resource_users += 1
+    try:
+        async with _resource_lock:
+            if _resources is None:
+                _resources = await _start_resources()
+        yield _resources
+    finally:
+        _resource_users -= 1
+        if _resource_users == 0 and _resources is not None:
+            resources, _resources = _resources, None
+            await _stop_resources(resources)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    """Own the pooled upstream HTTP client, location index, cache pre-warmer, archive writer and metrics endpoint for the lifetime of the server."""
+    async with server_resources() as resources:
+        yield resources
+
+
+def lookup_grid(province: str, city: str, district: str) -> tuple | None:
+    """Return (province, city, district, nx, ny) for the first matching row, or None."""
+    index = load_location_index()
+    if index is not None:
+        with _lookup_seconds_index.time():
+            return index.lookup(province, city, district)
+
+    with _lookup_seconds_sqlite.time():
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            cursor = conn.cursor()
+
+            # Same order as LocationIndex.lookup: an exact match first, else the first LIKE match by id
+            query = """
+            SELECT province, city, district, grid_x, grid_y 
+            FROM weather_grid 
+            WHERE province LIKE ? AND city LIKE ? AND district LIKE ?
+            ORDER BY (province = ? AND city = ? AND district = ?) DESC, id
+            LIMIT 1
+            """
+            cursor.execute(query, (f"%{province}%", f"%{city}%", f"%{district}%", province, city, district))
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+
+def region_rows(province: str, city: str | None = None) -> list[tuple]:
+    """Return every (province, city, district, nx, ny) row under a province, optionally narrowed to a city.
+
+    Names match the way lookup_grid does (substring, like SQL LIKE '%x%').
+    """
+    index = load_location_index()
+    if index is not None:
+        with _lookup_seconds_index.time():
+            return index.find(province, city or "", "")
+
+    with _lookup_seconds_sqlite.time():
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            return conn.execute(
+                """
+                SELECT province, city, district, grid_x, grid_y
+                FROM weather_grid
+                WHERE province LIKE ? AND city LIKE ?
+                ORDER BY id
+                """,
+                (f"%{province}%", f"%{city or ''}%"),
+            ).fetchall()
+        finally:
+            conn.close()
+
 
 # Create an MCP server
-mcp = FastMCP("China Weather")
+mcp = FastMCP("China Weather", lifespan=server_lifespan)
+
+# Output options (compact, fields, hours, max_chars) shared by the tools that render a forecast
+FORECAST_OPTIONS_DESCRIPTION = (
+    "compact 为 true 时输出紧凑表格（一行表头，每小时一行，篇幅约为完整文本的一半以下），"
+    "fields 选择表格列（source、sky、pty、rn1、pop、temp、tmn、tmx、humidity、wind、sno），"
+    "hours 限定预报时长（距首个预报时刻的小时数），max_chars 限定表格最大字符数（超出的时刻截去并注明）。"
+)
 
 @mcp.tool(
     name="get_grid_location",
     description="获取中国气象局API所需的网格坐标(nx, ny)。根据用户输入的省/市/区信息，在数据库中查找并返回相应的气象网格坐标。这是调用气象局API以获取准确坐标值所必需的工具。"
 )
+@instrument_tool
 def get_grid_location(province: str, city: str, district: str) -> str:
     """Get grid location(nx, ny) for China Weather
     
@@ -19,32 +230,15 @@ def get_grid_location(province: str, city: str, district: str) -> str:
         district: District Name (e.g. 三里屯街道)
     """
     try:
-        # Connect to SQLite database
-        db_path = Path(__file__).parent.parent / "data" / "weather_grid.db"
-        
-        if not db_path.exists():
-            return f"Error: Database not found at {db_path}"
-        
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # Query the database for the grid coordinates
-        query = """
-        SELECT province, city, district, grid_x, grid_y 
-        FROM weather_grid 
-        WHERE province LIKE ? AND city LIKE ? AND district LIKE ?
-        """
-        cursor.execute(query, (f"%{province}%", f"%{city}%", f"%{district}%"))
-        result = cursor.fetchone()
-        
+        if not DB_PATH.exists():
+            return f"Error: Database not found at {DB_PATH}"
+
+        result = lookup_grid(province, city, district)
         if not result:
             return f"No location found for Province: {province}, City: {city}, District: {district}"
         
         province, city, district, nx, ny = result
         
-        # Close the connection
-        conn.close()
-        
         # Return formatted string
         return f"Province(省): {province}, City(市): {city}, District(区): {district}, Nx: {nx}, Ny: {ny}"
     
@@ -52,11 +246,143 @@ def get_grid_location(province: str, city: str, district: str) -> str:
         return f"Error retrieving grid location: {str(e)}"
 
 
+@mcp.tool(
+    name="resolve_locations",
+    description="批量解析大量地区（省/市/区县）的网格坐标(nx, ny)，适合处理地址表格。locations 为地区列表，每项包含 province、city、district，名称需与数据库完全一致；整批通过一次数据库连接分批联表查询。结果为 CSV（province,city,district,nx,ny，未找到的地区坐标留空），按输入顺序排列，首行注明解析数量与速度（行/秒）。"
+)
+@instrument_tool
+async def resolve_locations(locations: list[dict]) -> str:
+    """Resolve grid coordinates for many locations in one call.
+    
+    Args:
+        locations: List of {"province", "city", "district"} with exact names
+    """
+    if len(locations) > config.RESOLVE_MAX_LOCATIONS:
+        return f"Error: at most {config.RESOLVE_MAX_LOCATIONS} locations per call, got {len(locations)}"
+    if not DB_PATH.exists():
+        return f"Error: Database not found at {DB_PATH}"
+
+    from main import resolve_locations as resolve_rows
+
+    start = time.perf_counter()
+    try:
+        rows = [tuple(str(item.get(name) or "") for name in ("province", "city", "district")) for item in locations]
+
+        def resolve() -> list:
+            with _lookup_seconds_sqlite.time():
+                return list(resolve_rows(rows, DB_PATH))
+
+        # 整批解析在工作线程中进行，不阻塞事件循环
+        resolved = await asyncio.to_thread(resolve)
+    except Exception as e:
+        return f"Error resolving locations: {str(e)}"
+    elapsed = time.perf_counter() - start
+
+    found = sum(1 for _, grid in resolved if grid is not None)
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(("province", "city", "district", "nx", "ny"))
+    for row, grid in resolved:
+        writer.writerow(row + (grid or ("", "")))
+    rate = len(rows) / elapsed if elapsed else 0
+    return (f"Resolved {found}/{len(rows)} locations in {elapsed * 1000:.1f} ms ({rate:.0f} rows/s)\n"
+            f"{output.getvalue().rstrip()}")
+
+
+@mcp.tool(
+    name="get_grid_by_coordinates",
+    description="将经纬度转换为气象局API所需的网格坐标(nx, ny)（兰伯特等角圆锥投影，5km 网格），并返回网格坐标最接近的已知地区（省/市/区）及其距离。points 为坐标列表，每项包含 lat、lon（十进制度），一次可转换数千个坐标。"
+)
+@instrument_tool
+def get_grid_by_coordinates(points: list[dict]) -> str:
+    """Convert latitude/longitude points to grid coordinates and the nearest known district.
+    
+    Args:
+        points: List of {"lat": latitude, "lon": longitude} in decimal degrees
+    """
+    if len(points) > config.GRID_COORDINATES_MAX_POINTS:
+        return f"Error: at most {config.GRID_COORDINATES_MAX_POINTS} points per call, got {len(points)}"
+
+    # 先校验全部坐标，再整批投影
+    lats, lons, errors = [], [], {}
+    for index, point in enumerate(points):
+        try:
+            lat = float(point.get("lat", point.get("latitude")))
+            lon = float(point.get("lon", point.get("longitude")))
+            if not (-90 < lat < 90 and -180 <= lon <= 360):
+                raise ValueError("out of range")
+        except (TypeError, ValueError, AttributeError):
+            errors[index] = f"Error: invalid coordinates {point}"
+            lat = lon = 0.0
+        lats.append(lat)
+        lons.append(lon)
+    xs, ys = project(lats, lons)
+
+    locations = load_location_index()
+    lines = []
+    for index, (lat, lon, x, y) in enumerate(zip(lats, lons, xs, ys)):
+        if index in errors:
+            lines.append(f"[{index + 1}] {errors[index]}")
+            continue
+        nx, ny = to_cell(x, y)
+        line = f"[{index + 1}] Lat: {lat}, Lon: {lon}, Nx: {nx}, Ny: {ny}"
+        if not in_grid(nx, ny):
+            lines.append(f"{line} (outside the forecast grid)")
+            continue
+        nearest = locations.nearest(x, y) if locations is not None else None
+        if nearest is not None:
+            (province, city, district, grid_x, grid_y), distance = nearest
+            line += (f", Nearest(最近地区): {province} {city} {district} "
+                     f"(Nx: {grid_x}, Ny: {grid_y}, ~{distance * GRID_SPACING_KM:.1f} km)")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@mcp.tool(
+    name="search_locations",
+    description="模糊检索地区并按相关度返回前 k 个候选及其网格坐标(nx, ny)。检索词可包含省/市/区县名，用空格分隔（如 \"北京 朝阳区\"），自动忽略省/市/区/县/街道等后缀。适用于地名有歧义（如多个城市都有朝阳区）或不完整的情况。"
+)
+@instrument_tool
+def search_locations(query: str, limit: int = 5) -> str:
+    """Search locations and return ranked candidates with grid coordinates.
+    
+    Args:
+        query: Space separated place names (e.g. 北京 朝阳区)
+        limit: Maximum number of candidates to return
+    """
+    try:
+        if not DB_PATH.exists():
+            return f"Error: Database not found at {DB_PATH}"
+
+        with _lookup_seconds_sqlite.time():
+            conn = sqlite3.connect(DB_PATH)
+            try:
+                results = search_location_index(conn, query, max(1, min(limit, 50)))
+            finally:
+                conn.close()
+
+        if not results:
+            return f"No location found for query: {query}"
+
+        return "\n".join(
+            f"{rank}. Province(省): {province}, City(市): {city}, District(区): {district}, Nx: {nx}, Ny: {ny}"
+            for rank, (province, city, district, nx, ny) in enumerate(results, start=1)
+        )
+
+    except sqlite3.OperationalError as e:
+        return f"Error searching locations (run migrate.py to build the search index): {str(e)}"
+    except Exception as e:
+        return f"Error searching locations: {str(e)}"
+
+
 @mcp.tool(
     name="get_forecast",
-    description="调用中国气象局的短期预报API，提供特定地区的天气预报信息。根据用户输入的地区信息和网格坐标，查询当前时间点的气象信息。该工具包含温度、降水量、天空状况、湿度、风向、风速等详细气象信息，并提供6小时内的短期预报。"
+    description="调用中国气象局的短期预报API，提供特定地区的天气预报信息。根据用户输入的地区信息和网格坐标，查询当前时间点的气象信息。该工具包含温度、降水量、天空状况、湿度、风向、风速等详细气象信息，并提供6小时内的短期预报。" + FORECAST_OPTIONS_DESCRIPTION
 )
-async def get_forecast(province: str, city: str, district: str, nx: int, ny: int) -> str:
+@instrument_tool
+async def get_forecast(province: str, city: str, district: str, nx: int, ny: int, compact: bool = False,
+                       fields: list[str] | None = None, hours: int | None = None,
+                       max_chars: int | None = None) -> str:
     """Get weather forecast for a location.
     
     Args:
@@ -66,7 +392,261 @@ async def get_forecast(province: str, city: str, district: str, nx: int, ny: int
         nx: Grid X coordinate
         ny: Grid Y coordinate
     """
-    return await get_forecast_api(province, city, district, nx, ny)
+    from api import get_forecast_api
+
+    return await get_forecast_api(province, city, district, nx, ny, compact, fields, hours, max_chars)
+
+
+@mcp.tool(
+    name="get_short_term_forecast",
+    description="调用中国气象局的短期预报API（getVilageFcst），提供特定地区未来约 3 天的逐小时天气预报，包括气温、降水概率、降水量、积雪、天空状况、湿度、风向、风速以及每日最低/最高气温。需要网格坐标(nx, ny)。" + FORECAST_OPTIONS_DESCRIPTION
+)
+@instrument_tool
+async def get_short_term_forecast(province: str, city: str, district: str, nx: int, ny: int, compact: bool = False,
+                                  fields: list[str] | None = None, hours: int | None = None,
+                                  max_chars: int | None = None) -> str:
+    """Get the 3-day short-term (village) forecast for a location.
+    
+    Args:
+        province: Province Name (e.g. 北京市)
+        city: City Name (e.g. 朝阳区)
+        district: District Name (e.g. 三里屯街道)
+        nx: Grid X coordinate
+        ny: Grid Y coordinate
+    """
+    from api import get_vilage_forecast_api
+
+    return await get_vilage_forecast_api(province, city, district, nx, ny, compact, fields, hours, max_chars)
+
+
+@mcp.tool(
+    name="get_combined_forecast",
+    description="同时调用超短期实况（getUltraSrtNcst）、超短期预报（getUltraSrtFcst）与短期预报（getVilageFcst）三个接口，把当前观测、6 小时内的逐小时预报与约 3 天的逐小时预报合并为一条按时间排序、不重复的时间线，每行标注数据来源。同一时刻以时间粒度更细的产品为准（实况 > 超短期预报 > 短期预报），缺少的字段（如降水概率）由其他产品补齐。需要网格坐标(nx, ny)。" + FORECAST_OPTIONS_DESCRIPTION
+)
+@instrument_tool
+async def get_combined_forecast(province: str, city: str, district: str, nx: int, ny: int, compact: bool = False,
+                                fields: list[str] | None = None, hours: int | None = None,
+                                max_chars: int | None = None) -> str:
+    """Get current observations, the 6-hour nowcast and the 3-day forecast merged into one timeline.
+    
+    Args:
+        province: Province Name (e.g. 北京市)
+        city: City Name (e.g. 朝阳区)
+        district: District Name (e.g. 三里屯街道)
+        nx: Grid X coordinate
+        ny: Grid Y coordinate
+    """
+    from api import get_combined_forecast_api
+
+    return await get_combined_forecast_api(province, city, district, nx, ny, compact, fields, hours, max_chars)
+
+
+@mcp.tool(
+    name="get_forecast_history",
+    description="从本地预报归档中查询某网格最近若干天的预报序列及最低/最高/平均值（如“最近 7 天的气温趋势”），不请求上游接口。结果也包含最近发布时次中尚未到来的预报时刻；同一预报时刻有多个发布时次时取最新的值。field 可选 temp、humidity、wind_speed、wind_vec、pop、tmn、tmx、sky、pty、rn1、sno；product 为 ultra（超短期预报）或 vilage（短期预报）。"
+)
+@instrument_tool
+async def get_forecast_history(province: str, city: str, district: str, nx: int, ny: int,
+                               days: int = 7, field: str = "temp", product: str = "ultra") -> str:
+    """Query archived forecasts for a grid cell over the last few days.
+    
+    Args:
+        province: Province Name (e.g. 北京市)
+        city: City Name (e.g. 朝阳区)
+        district: District Name (e.g. 三里屯街道)
+        nx: Grid X coordinate
+        ny: Grid Y coordinate
+        days: Number of days to look back
+        field: Forecast field (temp, humidity, wind_speed, pop, ...)
+        product: ultra (ultra-short-term) or vilage (short-term)
+    """
+    from api import get_forecast_history_api
+
+    return await get_forecast_history_api(province, city, district, nx, ny, days, field, product)
+
+
+@mcp.tool(
+    name="get_forecast_data",
+    description="以结构化数据（structuredContent）返回特定地区的超短期天气预报：预报时刻数组及与之等长的气温、湿度、天空状况、降水类型、降水量、风向、风速数组。适合需要直接处理数值的场景；include_text 为 true 时附带文本渲染结果。",
+    structured_output=True
+)
+@instrument_tool
+async def get_forecast_data(province: str, city: str, district: str, nx: int, ny: int, include_text: bool = False) -> ForecastData:
+    """Get a column-oriented weather forecast as structured content.
+    
+    Args:
+        province: Province Name (e.g. 北京市)
+        city: City Name (e.g. 朝阳区)
+        district: District Name (e.g. 三里屯街道)
+        nx: Grid X coordinate
+        ny: Grid Y coordinate
+        include_text: Also include the text rendering of the forecast
+    """
+    from api import fetch_ultra_srt_forecast, is_stale, render_forecast_text
+
+    columns, issued_at = await fetch_ultra_srt_forecast(nx, ny)
+    return ForecastData(
+        province=province,
+        city=city,
+        district=district,
+        nx=nx,
+        ny=ny,
+        base_date=issued_at.strftime("%Y%m%d"),
+        base_time=issued_at.strftime("%H%M"),
+        stale=is_stale(issued_at),
+        text=render_forecast_text(province, city, district, columns) if include_text else None,
+        **columns,
+    )
+
+
+@mcp.tool(
+    name="get_forecast_by_name",
+    description="根据省/市/区名称直接获取天气预报。服务器内部完成网格坐标查询和预报获取，返回结果包含解析得到的地区与网格坐标，一次调用即可完成查询。" + FORECAST_OPTIONS_DESCRIPTION
+)
+@instrument_tool
+async def get_forecast_by_name(province: str, city: str, district: str, compact: bool = False,
+                               fields: list[str] | None = None, hours: int | None = None,
+                               max_chars: int | None = None) -> str:
+    """Resolve the grid cell for a location and return its forecast in one call.
+    
+    Args:
+        province: Province Name (e.g. 北京市)
+        city: City Name (e.g. 北京市)
+        district: District Name (e.g. 朝阳区)
+    """
+    from forecast_table import validate_fields
+
+    error = validate_fields(fields)
+    if error:
+        return f"Error: {error}"
+    try:
+        if not DB_PATH.exists():
+            return f"Error: Database not found at {DB_PATH}"
+
+        result = lookup_grid(province, city, district)
+    except Exception as e:
+        return f"Error retrieving grid location: {str(e)}"
+
+    if not result:
+        return f"No location found for Province: {province}, City: {city}, District: {district}. Try `search_locations` to list candidates."
+
+    from api import get_forecast_api
+
+    province, city, district, nx, ny = result
+    forecast = await get_forecast_api(province, city, district, nx, ny, compact, fields, hours, max_chars)
+    return f"Province(省): {province}, City(市): {city}, District(区): {district}, Nx: {nx}, Ny: {ny}\n{forecast}"
+
+
+@mcp.tool(
+    name="get_forecast_batch",
+    description="批量获取多个地区的天气预报。每个地区包含 province、city、district，可选 nx、ny（缺省时自动查询网格坐标）。落在同一网格的地区只请求一次上游接口，结果按输入顺序返回，单个地区出错不影响其他地区。compact、fields、hours 与 get_forecast 相同，作用于每个地区。"
+)
+@instrument_tool
+async def get_forecast_batch(locations: list[dict], compact: bool = False, fields: list[str] | None = None,
+                             hours: int | None = None) -> str:
+    """Get weather forecasts for many locations in one call.
+    
+    Args:
+        locations: List of {"province", "city", "district", optional "nx", "ny"}
+        compact: Render each forecast as a compact table (one header, one row per hour)
+        fields: Columns of the compact tables (see get_forecast)
+        hours: Only include forecast times within this many hours of the first one
+    """
+    if len(locations) > config.BATCH_MAX_LOCATIONS:
+        return f"Error: at most {config.BATCH_MAX_LOCATIONS} locations per batch, got {len(locations)}"
+    from forecast_table import validate_fields
+
+    error = validate_fields(fields)
+    if error:
+        return f"Error: {error}"
+
+    # 解析每个地区的网格坐标，错误按条目记录
+    resolved: list[tuple | str] = []
+    for item in locations:
+        try:
+            province = item.get("province", "")
+            city = item.get("city", "")
+            district = item.get("district", "")
+            if item.get("nx") is not None and item.get("ny") is not None:
+                resolved.append((province, city, district, int(item["nx"]), int(item["ny"])))
+                continue
+            if not DB_PATH.exists():
+                resolved.append(f"Error: Database not found at {DB_PATH}")
+                continue
+            result = lookup_grid(province, city, district)
+            if not result:
+                resolved.append(f"No location found for Province: {province}, City: {city}, District: {district}")
+            else:
+                resolved.append((province, city, district, result[3], result[4]))
+        except Exception as e:
+            resolved.append(f"Error retrieving grid location: {str(e)}")
+
+    from api import fetch_ultra_srt_forecast, is_stale, render_forecast, stale_notice
+
+    # 同一网格只请求一次，并发数受 BATCH_MAX_CONCURRENCY 限制
+    cells = list(dict.fromkeys((entry[3], entry[4]) for entry in resolved if isinstance(entry, tuple)))
+    fetched = await gather_limited(lambda cell: fetch_ultra_srt_forecast(*cell), cells, config.BATCH_MAX_CONCURRENCY)
+    cell_results = dict(zip(cells, fetched))
+
+    sections = []
+    for index, entry in enumerate(resolved, start=1):
+        if isinstance(entry, str):
+            sections.append(f"[{index}] {entry}")
+            continue
+        province, city, district, nx, ny = entry
+        header = f"[{index}] {province} {city} {district} (Nx: {nx}, Ny: {ny})"
+        result = cell_results[(nx, ny)]
+        if isinstance(result, Exception):
+            body = f"获取天气信息时发生错误: {str(result)}"
+        elif not result[0]['fcst_time']:
+            body = f"{province} {city} {district} 地区的 weather information could not be found."
+        else:
+            columns, issued_at = result
+            notices = [stale_notice(issued_at)] if is_stale(issued_at) else []
+            body = render_forecast(province, city, district, columns, compact, fields, hours, notices=notices)
+        sections.append(f"{header}\n{body}")
+
+    return "\n===\n".join(sections)
+
+
+@mcp.tool(
+    name="get_region_summary",
+    description="汇总整个省（或省内某个市）未来 6 小时的天气，适合回答“广东省未来 6 小时哪里会下雨”这类区域问题。服务器列出该区域的全部区县并合并为不重复的网格，以有限并发获取各网格的超短期预报，一次返回区域内的最低/最高/平均气温、最大小时降水量、有降水的网格（含所在地区与开始时间）以及逐小时有降水的网格数。"
+)
+@instrument_tool
+async def get_region_summary(province: str, city: str | None = None) -> str:
+    """Summarise the next 6 hours across every district of a province or city.
+    
+    Args:
+        province: Province Name (e.g. 广东省)
+        city: Optional City Name within the province (e.g. 广州市)
+    """
+    try:
+        if not DB_PATH.exists():
+            return f"Error: Database not found at {DB_PATH}"
+
+        rows = region_rows(province, city)
+    except Exception as e:
+        return f"Error retrieving region locations: {str(e)}"
+
+    if not rows:
+        return f"No location found for Province: {province}" + (f", City: {city}" if city else "") + \
+            ". Try `search_locations` to list candidates."
+
+    # 同一网格内的区县只请求一次
+    cells: dict[tuple[int, int], list[tuple]] = {}
+    for row in rows:
+        cells.setdefault((row[3], row[4]), []).append(row)
+    if len(cells) > config.REGION_MAX_CELLS:
+        return (f"Error: the region covers {len(cells)} grid cells (at most {config.REGION_MAX_CELLS} per call); "
+                f"narrow it down with `city`")
+
+    from api import get_region_summary_api
+
+    region = " ".join(dict.fromkeys(row[0] for row in rows))
+    if city:
+        region += " " + " ".join(dict.fromkeys(row[1] for row in rows))
+    return await get_region_summary_api(region, cells)
 
 
 @mcp.resource(
@@ -89,10 +669,69 @@ def get_weather_instructions() -> str:
     2. `get_forecast(province, city, district, nx, ny)` - Get weather forecast for a location
       - Example: get_forecast(province="北京市", city="朝阳区", district="三里屯街道", nx=61, ny=125)
     
+    3. `get_forecast_by_name(province, city, district)` - Resolve the grid cell and get the forecast in one call
+      - Example: get_forecast_by_name(province="北京市", city="北京市", district="朝阳区")
+      - The response starts with the resolved location and its grid coordinates
+    
+    4. `get_forecast_data(province, city, district, nx, ny, include_text=False)` - Get the forecast as structured, column-oriented data
+      - Returns fcst_time plus parallel arrays (temp, humidity, sky, pty, rn1, wind_vec, wind_speed) as structured content
+    
+    5. `search_locations(query, limit)` - Fuzzy search ranked candidates with grid coordinates
+      - Example: search_locations(query="长春 朝阳区", limit=5)
+      - Use this when a place name is ambiguous (e.g. 朝阳区 exists in both 北京市 and 长春市)
+    
+    6. `get_forecast_batch(locations)` - Get weather forecasts for many locations at once
+      - Example: get_forecast_batch(locations=[{"province": "北京市", "city": "北京市", "district": "朝阳区"}, {"province": "上海市", "city": "上海市", "district": "浦东新区", "nx": 65, "ny": 129}])
+      - Locations sharing a grid cell are fetched once; results are returned in input order
+    
+    7. `get_short_term_forecast(province, city, district, nx, ny)` - Get the hourly forecast for the next ~3 days
+      - Example: get_short_term_forecast(province="北京市", city="朝阳区", district="三里屯街道", nx=61, ny=125)
+      - Adds precipitation probability and daily minimum / maximum temperature
+    
+    8. `get_forecast_history(province, city, district, nx, ny, days=7, field="temp", product="ultra")` - Query archived forecasts without calling upstream
+      - Example: get_forecast_history(province="北京市", city="朝阳区", district="三里屯街道", nx=61, ny=125, days=7, field="temp")
+      - Every forecast the server fetches is archived locally; returns the series plus min / max / mean
+    
+    9. `get_grid_by_coordinates(points)` - Convert latitude/longitude to grid coordinates and the nearest known district
+      - Example: get_grid_by_coordinates(points=[{"lat": 37.5665, "lon": 126.978}])
+      - Accepts thousands of points per call; points outside the forecast grid are flagged
+    
+    10. `get_combined_forecast(province, city, district, nx, ny)` - Get observations, the 6-hour nowcast and the 3-day forecast as one timeline
+      - Example: get_combined_forecast(province="北京市", city="朝阳区", district="三里屯街道", nx=61, ny=125)
+      - The three products are fetched concurrently; each row is tagged with its source, and where they overlap the finer-grained product wins (observation > nowcast > 3-day forecast)
+    
+    11. `resolve_locations(locations)` - Resolve grid coordinates for many locations (e.g. a spreadsheet of addresses) in one call
+      - Example: resolve_locations(locations=[{"province": "北京市", "city": "北京市", "district": "朝阳区"}, {"province": "上海市", "city": "上海市", "district": "浦东新区"}])
+      - Returns CSV (province,city,district,nx,ny) in input order, with empty coordinates for names not found, after a line with the rows per second
+      - Names must match exactly; use `search_locations` for fuzzy matches
+    
+    12. `get_region_summary(province, city=None)` - Summarise the next 6 hours across a whole province or city
+      - Example: get_region_summary(province="广东省") or get_region_summary(province="广东省", city="广州市")
+      - Every district in the region is collapsed to unique grid cells, fetched with bounded concurrency and aggregated: min / max / mean temperature, maximum hourly rainfall, the cells with precipitation and when it starts
+      - Use this instead of one get_forecast call per district
+    
+    ## Subscriptions
+    
+    Instead of polling `get_forecast`, subscribe to `weather://forecast/{nx}/{ny}` (resources/subscribe).
+      - The server refreshes subscribed cells once per issuance and sends notifications/resources/updated only when PTY, sky or rainfall change, or temperature / humidity / wind speed move beyond a threshold
+      - The notification's `_meta.changes` lists only the changed forecast times and fields (old and new values); reading the resource returns the full forecast plus the same `changes`
+      - Requires a stateful session (stdio, or HTTP with a single worker)
+    
+    ## Compact Output
+    
+    `get_forecast`, `get_short_term_forecast`, `get_combined_forecast`, `get_forecast_by_name` and `get_forecast_batch` accept rendering options:
+      - `compact=True` - one header row, then one `|`-separated row per forecast hour (less than half the size of the full text)
+      - `fields=["temp", "pop", "wind"]` - columns of the table (source, sky, pty, rn1, pop, temp, tmn, tmx, humidity, wind, sno); by default every column with data
+      - `hours=12` - only the first 12 hours of the forecast
+      - `max_chars=2000` - cap the table length; later hours are cut and the number left out is noted
+      - Example: get_short_term_forecast(province="北京市", city="朝阳区", district="三里屯街道", nx=61, ny=125, compact=True, fields=["temp", "pop"], hours=24)
+    
     ## Workflow
     
-    1. First, use `get_grid_location` to obtain the grid coordinates (nx, ny) for your location
-    2. Then, use those coordinates with `get_forecast` to get the weather forecast
+    1. Use `get_forecast_by_name` to get the forecast for a location in a single call
+    2. If the location is ambiguous or not found, use `search_locations` to list candidates, then call `get_forecast_by_name` (or `get_forecast` with the candidate's nx, ny)
+    3. Use `get_grid_location` + `get_forecast` only when you need the grid coordinates separately
+    4. If you only have latitude/longitude, use `get_grid_by_coordinates` to get nx, ny (and the nearest district), then call `get_forecast`
     
     ## Response Format
     
@@ -104,6 +743,94 @@ def get_weather_instructions() -> str:
     - Wind speed and direction
     """
 
+@mcp.resource(
+    uri="weather://cache/stats",
+    name="Forecast Cache Statistics",
+    description="返回预报缓存的命中、未命中及合并（single-flight）请求计数。",
+    mime_type="application/json"
+)
+def get_cache_stats() -> str:
+    """Resource that reports forecast cache hit/miss/coalesced counts."""
+    from api import forecast_cache
+
+    return json.dumps(forecast_cache.stats())
+
+
+@mcp.resource(
+    uri="weather://metrics",
+    name="Server Metrics",
+    description="返回服务器运行指标：各工具、上游 HTTP 请求、位置查找及预报解码/渲染的延迟直方图（含 p50/p95/p99 估计），以及调用结果、缓存命中、错误与返回字节数等计数。",
+    mime_type="application/json"
+)
+def get_metrics() -> str:
+    """Resource that reports latency histograms and counters for the tools, upstream calls, lookups and decode/render steps."""
+    return json.dumps(metrics.snapshot(), ensure_ascii=False)
+
+
+@mcp.resource(
+    uri="weather://forecast/{nx}/{ny}",
+    name="Grid Forecast",
+    description="某网格当前发布时次的超短期预报（JSON，按列存放）。支持订阅（resources/subscribe）：服务器在每个发布时次后刷新已订阅的网格，只在降水类型、天空状况、降水量变化或气温/湿度/风速变化超过阈值时发送 notifications/resources/updated，通知的 _meta.changes 只包含变化的预报时刻与字段；读取本资源时 changes 为最近一次通知的内容。",
+    mime_type="application/json"
+)
+async def get_grid_forecast(nx: int, ny: int) -> str:
+    """Resource with the current ultra-short-term forecast of a grid cell (subscribable)."""
+    subscriptions = _resources["subscriptions"] if _resources is not None else None
+    state = subscriptions.read((nx, ny)) if subscriptions is not None else None
+    if state is None:
+        from api import fetch_ultra_srt_forecast
+
+        columns, issued_at = await fetch_ultra_srt_forecast(nx, ny)
+        state = {"issued_at": issued_at, "columns": columns, "changes": []}
+    return json.dumps({
+        "nx": nx,
+        "ny": ny,
+        "base_date": f"{state['issued_at']:%Y%m%d}",
+        "base_time": f"{state['issued_at']:%H%M}",
+        "changes": state["changes"],
+        **state["columns"],
+    }, ensure_ascii=False)
+
+
+def _forecast_subscriptions():
+    """The process-wide subscription manager, started on the first subscription."""
+    if _resources is None:
+        raise RuntimeError("server resources are not running")
+    if _resources["subscriptions"] is None:
+        from subscriptions import ForecastSubscriptions
+        _resources["subscriptions"] = ForecastSubscriptions()
+        _resources["subscriptions"].start()
+    return _resources["subscriptions"]
+
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_forecast(uri) -> None:
+    from subscriptions import parse_forecast_uri
+
+    await _forecast_subscriptions().subscribe(parse_forecast_uri(uri), mcp.get_context().session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_forecast(uri) -> None:
+    from subscriptions import parse_forecast_uri
+
+    _forecast_subscriptions().unsubscribe(parse_forecast_uri(uri), mcp.get_context().session)
+
+
+# The low-level server always advertises resources.subscribe=False; advertise the handlers above
+_get_capabilities = mcp._mcp_server.get_capabilities
+
+
+def _get_capabilities_with_subscribe(*args, **kwargs):
+    capabilities = _get_capabilities(*args, **kwargs)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+
+mcp._mcp_server.get_capabilities = _get_capabilities_with_subscribe
+
+
 @mcp.prompt(
     name="weather-query",
     description="用于查询中国地区天气信息的交互式提示模板。此提示指导用户与LLM之间的结构化对话，提供适当的工具使用顺序和响应格式。收集用户所需的信息，并清晰地提供天气预报。"
@@ -119,8 +846,8 @@ def weather_query_prompt() -> str:
     ## Instructions
     
     1. Help the user find the weather forecast for their location in China.
-    2. First use the `get_grid_location` tool to find the grid coordinates (nx, ny) for the specified location.
-    3. Then use the `get_forecast` tool with those coordinates to get the detailed weather forecast.
+    2. Use the `get_forecast_by_name` tool with the province, city and district to get the detailed weather forecast in one call.
+    3. If the location cannot be resolved or is ambiguous, use `search_locations` to find candidates and confirm with the user.
     4. Present the weather information in a clear, organized format.
     5. If the user doesn't specify a complete location (province, city, and district), ask for clarification.
     
@@ -133,8 +860,7 @@ def weather_query_prompt() -> str:
     User: 北京市 朝阳区 三里屯街道
     
     Assistant: Let me check the weather for 北京市 朝阳区 三里屯街道.
-    [Uses get_grid_location to get coordinates]
-    [Uses get_forecast with those coordinates]
+    [Uses get_forecast_by_name(province="北京市", city="朝阳区", district="三里屯街道")]
     Here's the current weather and forecast for 北京市 朝阳区 三里屯街道...
     
     ## Response Format
@@ -146,5 +872,25 @@ def weather_query_prompt() -> str:
     """
 
 if __name__ == "__main__":
-    # Run the MCP server
-    mcp.run(transport='stdio')
+    import argparse
+
+    parser = argparse.ArgumentParser(description="China Weather MCP server")
+    parser.add_argument("--transport", choices=("stdio", "streamable-http", "sse"), default="stdio")
+    parser.add_argument("--host", default=config.HTTP_HOST)
+    parser.add_argument("--port", type=int, default=config.HTTP_PORT)
+    parser.add_argument("--workers", type=int, default=config.HTTP_WORKERS,
+                        help="worker processes sharing the port (streamable-http only)")
+    sessions = parser.add_mutually_exclusive_group()
+    sessions.add_argument("--stateless", dest="stateless", action="store_true", default=None,
+                          help="no per-client session state (default with more than one worker)")
+    sessions.add_argument("--stateful", dest="stateless", action="store_false",
+                          help="keep sessions in memory (single worker only)")
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        # Run the MCP server
+        mcp.run(transport='stdio')
+    else:
+        from http_server import serve
+        serve(mcp, server_resources, preload_location_index, args.transport, args.host, args.port,
+              args.workers, args.stateless)
@@ -0,0 +1,94 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+class SharedForecastStore:
+    """同一主机上多个服务器进程共享的预报缓存（WAL 模式的 SQLite 文件）
+
+    除缓存条目外还维护一张租约表：某个进程正在向上游请求某个 key 时，
+    其他进程会等待其写回结果，而不是各自再请求一次。
+    """
+
+    def __init__(self, path: str | Path, busy_timeout_ms: int = 2000):
+        self.path = Path(path)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS forecast_cache (
+            key TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL,
+            value TEXT NOT NULL
+        )
+        ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS fetch_lease (
+            key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        ''')
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程共享，每个线程各自持有一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(key: Any) -> str:
+        return json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+
+    def get(self, key: Any) -> Any | None:
+        """读取未过期的条目，不存在时返回 None"""
+        row = self._connect().execute(
+            "SELECT value FROM forecast_cache WHERE key = ? AND expires_at > ?",
+            (self.make_key(key), time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: Any, value: Any, expires_at: float) -> None:
+        """写入条目并释放本进程持有的租约，同时顺带清理过期数据"""
+        conn = self._connect()
+        skey = self.make_key(key)
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO forecast_cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (skey, expires_at, json.dumps(value, ensure_ascii=False))
+            )
+            conn.execute("DELETE FROM fetch_lease WHERE key = ? AND owner = ?", (skey, self.owner))
+            conn.execute("DELETE FROM forecast_cache WHERE expires_at <= ?", (now,))
+
+    def acquire_lease(self, key: Any, ttl: float) -> bool:
+        """尝试获取某个 key 的上游请求租约，已被其他进程持有且未过期时返回 False"""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            cursor = conn.execute(
+                '''
+                INSERT INTO fetch_lease (key, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE fetch_lease.expires_at <= ? OR fetch_lease.owner = excluded.owner
+                ''',
+                (self.make_key(key), self.owner, now + ttl, now)
+            )
+        return cursor.rowcount > 0
+
+    def release_lease(self, key: Any) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM fetch_lease WHERE key = ? AND owner = ?", (self.make_key(key), self.owner))
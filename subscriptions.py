@@ -0,0 +1,211 @@
+import math
+import weakref
+from datetime import datetime
+
+from mcp import types
+
+import config
+import logs
+from api import fetch_ultra_srt_forecast
+from decoder import rain_amount
+from metrics import metrics
+from scheduler import IssuanceScheduler
+from utils import gather_limited
+
+logger = logs.get_logger("subscriptions")
+
+FORECAST_URI_PREFIX = "weather://forecast/"
+
+# 订阅时比较的字段 -> 视为有意义变化的最小变化量（None 表示取值不同即通知）
+WATCHED_FIELDS = {
+    "pty": None,
+    "sky": None,
+    "rn1": None,
+    "temp": config.SUBSCRIPTION_TEMP_DELTA,
+    "humidity": config.SUBSCRIPTION_HUMIDITY_DELTA,
+    "wind_speed": config.SUBSCRIPTION_WIND_SPEED_DELTA,
+}
+
+_refreshes = {outcome: metrics.counter("subscription_refreshes_total", outcome=outcome)
+              for outcome in ("changed", "unchanged", "failed")}
+_notifications = metrics.counter("subscription_notifications_total")
+
+
+def forecast_uri(nx: int, ny: int) -> str:
+    return f"{FORECAST_URI_PREFIX}{nx}/{ny}"
+
+
+def parse_forecast_uri(uri: str) -> tuple[int, int]:
+    """weather://forecast/{nx}/{ny} -> (nx, ny)，格式不符时抛出 ValueError"""
+    uri = str(uri)
+    if not uri.startswith(FORECAST_URI_PREFIX):
+        raise ValueError(f"不支持订阅的资源: {uri}（仅支持 {FORECAST_URI_PREFIX}{{nx}}/{{ny}}）")
+    try:
+        nx, ny = (int(part) for part in uri[len(FORECAST_URI_PREFIX):].split("/"))
+    except ValueError:
+        raise ValueError(f"无效的网格资源: {uri}") from None
+    return nx, ny
+
+
+def _rows(columns: dict[str, list]) -> dict[tuple[str, str], dict]:
+    """按列存放的预报 -> 预报时刻 -> 被比较字段的取值"""
+    return {
+        key: {field: columns[field][i] for field in WATCHED_FIELDS}
+        for i, key in enumerate(zip(columns['fcst_date'], columns['fcst_time']))
+    }
+
+
+def _changed(field: str, old, new) -> bool:
+    threshold = WATCHED_FIELDS[field]
+    if old is None or new is None:
+        return old is not new
+    if field == "rn1":
+        return rain_amount(old) != rain_amount(new)
+    if threshold is None:
+        return old != new
+    return math.fabs(new - old) >= threshold
+
+
+def diff_forecast(baseline: dict[tuple[str, str], dict], columns: dict[str, list]) -> tuple[list[dict], dict]:
+    """比较新一期预报与基线，返回 (变化列表, 新基线)
+
+    已有的预报时刻只列出变化超过阈值的字段；新进入预报窗口的时刻只在有降水时列出
+    （超短期预报每期都会滚动增加一个时刻，否则每期都会通知）。未达到阈值的小幅变化
+    不更新基线，持续的缓慢变化累积超过阈值后仍会通知。
+
+    Returns:
+        tuple: ([{"fcst_date", "fcst_time", "fields": {字段: {"old", "new"}}}], 新基线)
+    """
+    changes = []
+    updated = {}
+    for key, row in _rows(columns).items():
+        old_row = baseline.get(key)
+        if old_row is None:
+            updated[key] = row
+            if row["pty"] not in (None, 0):
+                changes.append({"fcst_date": key[0], "fcst_time": key[1],
+                                "fields": {field: {"old": None, "new": value} for field, value in row.items()
+                                           if value is not None}})
+            continue
+        fields = {field: {"old": old_row[field], "new": row[field]}
+                  for field in WATCHED_FIELDS if _changed(field, old_row[field], row[field])}
+        updated[key] = {field: row[field] if field in fields else old_row[field] for field in WATCHED_FIELDS}
+        if fields:
+            changes.append({"fcst_date": key[0], "fcst_time": key[1], "fields": fields})
+    return changes, updated
+
+
+class CellSubscription:
+    """一个网格的订阅状态：订阅会话、比较基线与最近一次通知的变化"""
+
+    def __init__(self):
+        self.sessions = weakref.WeakSet()
+        self.baseline: dict[tuple[str, str], dict] | None = None
+        self.issued_at: datetime | None = None
+        self.columns: dict[str, list] | None = None
+        self.changes: list[dict] = []
+
+
+class ForecastSubscriptions(IssuanceScheduler):
+    """weather://forecast/{nx}/{ny} 的订阅管理：每个超短期预报时次发布后刷新一次已订阅的网格，
+    与上一期解码结果比较，只在有意义的变化时通知订阅的会话（通知的 _meta.changes 只含变化的字段）"""
+
+    def __init__(self, concurrency: int = config.SUBSCRIPTION_CONCURRENCY,
+                 jitter: float = config.SUBSCRIPTION_JITTER_SECONDS):
+        # 订阅时已取得当前时次的预报，无需在启动时刷新
+        super().__init__(jitter)
+        self.concurrency = concurrency
+        self.cells: dict[tuple[int, int], CellSubscription] = {}
+
+    def prune(self) -> None:
+        """移除已没有订阅会话的网格（会话断开后 WeakSet 自动清空，或通知失败时被移除），
+        使其不再请求上游，也不再占用 SUBSCRIPTION_MAX_CELLS 名额"""
+        for cell in [cell for cell, state in self.cells.items() if not state.sessions]:
+            del self.cells[cell]
+
+    async def subscribe(self, cell: tuple[int, int], session) -> None:
+        """登记订阅；首次订阅该网格时立即获取一期预报作为比较基线"""
+        state = self.cells.get(cell)
+        if state is None:
+            self.prune()
+            if len(self.cells) >= config.SUBSCRIPTION_MAX_CELLS:
+                raise ValueError(f"订阅的网格数已达上限 {config.SUBSCRIPTION_MAX_CELLS}")
+            state = self.cells[cell] = CellSubscription()
+        state.sessions.add(session)
+        if state.baseline is None:
+            await self.refresh_cell(cell)
+
+    def unsubscribe(self, cell: tuple[int, int], session) -> None:
+        state = self.cells.get(cell)
+        if state is None:
+            return
+        state.sessions.discard(session)
+        if not state.sessions:
+            del self.cells[cell]
+
+    async def refresh_cell(self, cell: tuple[int, int]) -> list[dict]:
+        """获取网格当前发布时次的预报并与基线比较，有变化时通知订阅者，返回变化列表"""
+        state = self.cells.get(cell)
+        if state is None:
+            return []
+        if not state.sessions:
+            del self.cells[cell]
+            return []
+        try:
+            columns, issued_at = await fetch_ultra_srt_forecast(*cell, track=False, allow_stale=False)
+        except Exception as e:
+            _refreshes["failed"].inc()
+            logger.warning("刷新订阅网格失败",
+                           extra={"grid": cell, "error": str(e), "sample_key": "subscription_refresh"})
+            return []
+        if issued_at == state.issued_at:
+            return []
+
+        state.issued_at, state.columns = issued_at, columns
+        if state.baseline is None:
+            _, state.baseline = diff_forecast({}, columns)
+            return []
+        changes, state.baseline = diff_forecast(state.baseline, columns)
+        if not changes:
+            _refreshes["unchanged"].inc()
+            return []
+        _refreshes["changed"].inc()
+        state.changes = changes
+        await self.notify(cell, state, changes)
+        return changes
+
+    async def notify(self, cell: tuple[int, int], state: CellSubscription, changes: list[dict]) -> None:
+        notification = types.ServerNotification(types.ResourceUpdatedNotification(
+            params=types.ResourceUpdatedNotificationParams(
+                uri=forecast_uri(*cell),
+                _meta={"issued_at": f"{state.issued_at:%Y%m%d%H%M}", "changes": changes},
+            )
+        ))
+        for session in list(state.sessions):
+            try:
+                await session.send_notification(notification)
+                _notifications.inc()
+            except Exception as e:
+                # 会话已断开：不再向其发送
+                logger.info("订阅通知发送失败，移除该会话", extra={"grid": cell, "error": str(e)})
+                state.sessions.discard(session)
+        if not state.sessions and self.cells.get(cell) is state:
+            del self.cells[cell]
+
+    def read(self, cell: tuple[int, int]) -> dict | None:
+        """已订阅网格的最新一期预报与最近一次通知的变化（未订阅或尚无数据时为 None）"""
+        state = self.cells.get(cell)
+        if state is None or state.columns is None:
+            return None
+        return {"issued_at": state.issued_at, "columns": state.columns, "changes": state.changes}
+
+    async def refresh_all(self) -> None:
+        self.prune()
+        cells = list(self.cells)
+        results = await gather_limited(self.refresh_cell, cells, self.concurrency)
+        for cell, result in zip(cells, results):
+            if isinstance(result, Exception):
+                logger.error("刷新订阅网格失败", exc_info=result, extra={"grid": cell})
+
+    async def run_cycle(self) -> None:
+        await self.refresh_all()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# 模块位于项目根目录（与 server.py 同级），测试数据库沿用基准脚本的 grid_fixture
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+
+import api
+from archive import PRODUCT_ULTRA_SRT, ForecastArchive
+from stub_upstream import build_ultra_srt_payload
+
+ISSUED_AT = datetime(2026, 10, 17, 13, 30)
+
+
+def _columns(hours: int) -> dict[str, list]:
+    return {
+        "fcst_date": ["20261017"] * hours,
+        "fcst_time": [f"{hour:02d}00" for hour in range(hours)],
+        "temp": [20.0] * hours,
+    }
+
+
+def test_add_without_writer_flushes_instead_of_growing(tmp_path):
+    archive = ForecastArchive(tmp_path / "archive.db", batch_rows=10)
+    for nx in range(5):
+        archive.add(PRODUCT_ULTRA_SRT, nx, 1, ISSUED_AT, _columns(6))
+    stats = archive.stats()
+    assert stats["pending_rows"] < 10
+    assert stats["rows_written"] + stats["pending_rows"] == 30
+    assert archive.count() == stats["rows_written"]
+
+
+def test_ultra_fetch_decodes_once_for_response_and_archive(tmp_path, monkeypatch):
+    decoded = []
+    decode_items = api.decode_items
+
+    def counting_decode(items):
+        decoded.append(len(items))
+        return decode_items(items)
+
+    async def request_json(url):
+        return build_ultra_srt_payload(60, 127, "20261017", "1330")
+
+    archive = ForecastArchive(tmp_path / "archive.db")
+    monkeypatch.setenv("CN_WEATHER_API_KEY", "test")
+    monkeypatch.setattr(api, "decode_items", counting_decode)
+    monkeypatch.setattr(api, "request_json", request_json)
+    monkeypatch.setattr(api, "forecast_archive", archive)
+    monkeypatch.setattr(api, "forecast_cache", api.ForecastCache(16))
+
+    columns, _ = asyncio.run(api.fetch_ultra_srt_forecast(60, 127, track=False))
+    assert len(decoded) == 1
+    assert archive.stats()["pending_rows"] == len(columns["fcst_time"]) > 0
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import api
+from cache import ForecastCache, ultra_srt_issuance
+from metrics import instrument_tool, metrics
+
+
+class CountingFetch:
+    def __init__(self, value="forecast", delay: float = 0.01):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = ForecastCache()
+    fetch = CountingFetch()
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_fetch("cell", time.time() + 60, fetch) for _ in range(10)))
+
+    assert asyncio.run(run()) == ["forecast"] * 10
+    assert fetch.calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 9)
+
+
+def test_failed_or_empty_fetch_is_not_cached():
+    cache = ForecastCache()
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("cell", time.time() + 60, fail)
+        assert await cache.get_or_fetch("cell", time.time() + 60, CountingFetch(None)) is None
+        return await cache.get_or_fetch("cell", time.time() + 60, CountingFetch("fresh"))
+
+    assert asyncio.run(run()) == "fresh"
+
+
+def test_entry_expires_at_next_issuance(monkeypatch):
+    cache = ForecastCache()
+    _, next_publish = ultra_srt_issuance(datetime(2024, 1, 1, 13, 50))
+    fetch = CountingFetch()
+
+    monkeypatch.setattr(time, "time", lambda: next_publish.timestamp() - 1)
+    asyncio.run(cache.get_or_fetch("cell", next_publish.timestamp(), fetch))
+    asyncio.run(cache.get_or_fetch("cell", next_publish.timestamp(), fetch))
+    assert fetch.calls == 1
+
+    monkeypatch.setattr(time, "time", lambda: next_publish.timestamp())
+    assert cache.get("cell") is None
+
+
+@pytest.mark.parametrize("now, base, next_publish", [
+    (datetime(2024, 1, 1, 13, 44), datetime(2024, 1, 1, 12, 30), datetime(2024, 1, 1, 13, 45)),
+    (datetime(2024, 1, 1, 13, 45), datetime(2024, 1, 1, 13, 30), datetime(2024, 1, 1, 14, 45)),
+    (datetime(2024, 1, 1, 0, 10), datetime(2023, 12, 31, 23, 30), datetime(2024, 1, 1, 0, 45)),
+])
+def test_ultra_srt_issuance_slots(now, base, next_publish):
+    assert ultra_srt_issuance(now) == (base, next_publish)
+
+
+@pytest.fixture
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(api, "forecast_cache", ForecastCache())
+    monkeypatch.setattr(api, "last_good_forecasts", ForecastCache())
+
+
+def _issuance(hours_ago: int) -> tuple[datetime, datetime]:
+    return ultra_srt_issuance(datetime.now() - timedelta(hours=hours_ago))
+
+
+def test_fetch_cached_falls_back_to_last_good_forecast(fresh_caches):
+    old_issued, old_next = _issuance(1)
+    issued, next_publish = _issuance(0)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    async def run():
+        await api._fetch_cached(("old",), ("cell",), old_issued, old_next, CountingFetch({"t": [1]}), True)
+        return await api._fetch_cached(("new",), ("cell",), issued, next_publish, fail, True)
+
+    value, stale_issued_at = asyncio.run(run())
+    assert value == {"t": [1]}
+    assert stale_issued_at == old_issued
+
+
+def test_fetch_cached_raises_without_stale_data(fresh_caches):
+    issued, next_publish = _issuance(0)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    async def run(allow_stale: bool):
+        await api._fetch_cached(("new",), ("cell",), issued, next_publish, fail, allow_stale)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(True))
+
+    old_issued, old_next = _issuance(1)
+    asyncio.run(api._fetch_cached(("old",), ("cell",), old_issued, old_next, CountingFetch({"t": [1]}), True))
+    with pytest.raises(RuntimeError):
+        asyncio.run(run(False))
+
+
+def test_stale_fallback_is_counted_on_the_instrumented_tool(fresh_caches):
+    old_issued, old_next = _issuance(1)
+    issued, next_publish = _issuance(0)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    @instrument_tool
+    async def stale_tool_under_test():
+        # 在子任务中取数，且返回文本不带过期前缀：结果仍应按标记计为 stale
+        await asyncio.gather(api._fetch_cached(("new",), ("cell",), issued, next_publish, fail, True))
+        return "forecast"
+
+    @instrument_tool
+    async def fresh_tool_under_test():
+        return "[过期数据] 仅是文本"
+
+    async def run():
+        await api._fetch_cached(("old",), ("cell",), old_issued, old_next, CountingFetch({"t": [1]}), True)
+        await stale_tool_under_test()
+        await fresh_tool_under_test()
+
+    asyncio.run(run())
+    assert metrics.counter("tool_calls_total", tool="stale_tool_under_test", outcome="stale").value == 1
+    assert metrics.counter("tool_calls_total", tool="fresh_tool_under_test", outcome="ok").value == 1
+    assert metrics.counter("tool_calls_total", tool="fresh_tool_under_test", outcome="stale").value == 0
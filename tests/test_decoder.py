@@ -0,0 +1,108 @@
+import logging
+
+import pytest
+
+from decoder import ItemDecoder, decode_items, decode_observations, deg_to_dir
+
+HOURS = [("20240101", "2300"), ("20240102", "0000"), ("20240102", "0100")]
+READINGS = {
+    "T1H": ["1.5", "0.5", "-0.5"],
+    "SKY": ["1", "3", "4"],
+    "PTY": ["0", "1", "3"],
+    "RN1": ["无降水", "1.0mm", "1.0mm"],
+    "UUU": ["0.5", "0.7", "-0.2"],
+    "VEC": ["0", "350", "100"],
+    "WSD": ["1.2", "3.4", "5.6"],
+}
+
+EXPECTED = {
+    "fcst_date": ["20240101", "20240102", "20240102"],
+    "fcst_time": ["2300", "0000", "0100"],
+    "temp": [1.5, 0.5, -0.5],
+    "sky": [1, 3, 4],
+    "pty": [0, 1, 3],
+    "rn1": ["无降水", "1.0mm", "1.0mm"],
+    "wind_vec": [0.0, 350.0, 100.0],
+    "wind_speed": [1.2, 3.4, 5.6],
+    "humidity": [None, None, None],
+}
+
+
+def _item(category: str, hour: int) -> dict:
+    fcst_date, fcst_time = HOURS[hour]
+    return {"category": category, "fcstDate": fcst_date, "fcstTime": fcst_time,
+            "fcstValue": READINGS[category][hour]}
+
+
+def category_major() -> list[dict]:
+    return [_item(category, hour) for category in READINGS for hour in range(len(HOURS))]
+
+
+def time_major() -> list[dict]:
+    return [_item(category, hour) for hour in range(len(HOURS)) for category in READINGS]
+
+
+def _columns(decoded) -> dict[str, list]:
+    return decoded.to_columns(tuple(EXPECTED))
+
+
+@pytest.mark.parametrize("items", [category_major(), time_major()], ids=["category-major", "time-major"])
+def test_both_upstream_orderings_decode_to_the_same_columns(items):
+    assert _columns(decode_items(items)) == EXPECTED
+
+
+def test_pages_out_of_order_and_retried_pages_are_merged():
+    items = time_major()
+    decoder = ItemDecoder()
+    decoder.feed(items[len(READINGS):])
+    decoder.feed(items[:len(READINGS)])
+    # 重试的页面再次输入，后写覆盖先写
+    decoder.feed(items[len(READINGS):])
+    assert _columns(decoder.finish()) == EXPECTED
+
+
+def test_invalid_values_are_logged_and_left_missing(caplog):
+    items = [
+        {"category": "T1H", "fcstDate": "20240101", "fcstTime": "2300", "fcstValue": "abc"},
+        {"category": "SKY", "fcstDate": "20240101", "fcstTime": "2300", "fcstValue": "3.0"},
+        {"category": "PTY", "fcstDate": "20240101", "fcstTime": "2300", "fcstValue": "9"},
+        {"category": "WSD", "fcstDate": "20240101", "fcstTime": "2300", "fcstValue": ""},
+        {"category": "REH", "fcstTime": "2300", "fcstValue": "80"},
+        {"category": "VEC", "fcstDate": "20240101", "fcstValue": "90"},
+    ]
+    with caplog.at_level(logging.WARNING):
+        columns = decode_items(items).to_columns()
+
+    # 缺少 fcstDate 的条目记为空日期，排在最前
+    assert columns["fcst_date"] == ["", "20240101"]
+    assert columns["temp"] == [None, None]
+    assert columns["sky"] == [None, 3]
+    assert columns["pty"] == [None, None]
+    assert columns["wind_speed"] == [None, None]
+    assert columns["humidity"] == [80.0, None]
+    messages = [record.getMessage() for record in caplog.records]
+    assert "温度值处理错误" in messages
+    assert "降水类型代码处理错误" in messages
+    assert "预报条目缺少字段" in messages
+
+
+def test_undecoded_categories_do_not_add_rows():
+    items = category_major() + [{"category": "LGT", "fcstDate": "20240102", "fcstTime": "0200", "fcstValue": "0"}]
+    assert decode_items(items).to_columns()["fcst_time"] == EXPECTED["fcst_time"]
+
+
+def test_observations_use_base_time_and_rewrite_rain():
+    items = [
+        {"category": "T1H", "baseDate": "20240101", "baseTime": "1300", "obsrValue": "2.5"},
+        {"category": "RN1", "baseDate": "20240101", "baseTime": "1300", "obsrValue": "0"},
+    ]
+    columns = decode_observations(items).to_columns()
+    assert columns["fcst_time"] == ["1300"]
+    assert columns["temp"] == [2.5]
+    assert columns["rn1"] == ["无降水"]
+
+
+@pytest.mark.parametrize("deg, direction", [(0, "北"), (11.2, "北"), (11.25, "东北偏北"), (348.75, "北"),
+                                            (157.5, "东南偏南"), (337.5, "西北偏北"), (360, "北")])
+def test_wind_direction_bins(deg, direction):
+    assert deg_to_dir(deg) == direction
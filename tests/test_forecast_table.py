@@ -0,0 +1,64 @@
+import asyncio
+
+import api
+import server
+from forecast_table import limit_hours, render_compact, validate_fields
+
+COLUMNS = {
+    "fcst_date": ["20261017"] * 6,
+    "fcst_time": ["1400", "1500", "1600", "1700", "1800", "1900"],
+    "temp": [20.0, 21.5, None, 19.0, 18.0, 17.0],
+    "humidity": [60.0] * 6,
+    "sky": [1, 3, 4, 4, 4, 4],
+    "pty": [0, 0, 1, 1, 0, 0],
+    "rn1": ["无降水", "无降水", "1.0mm", "2.0mm", "无降水", "无降水"],
+    "wind_vec": [0.0, 90.0, None, 180.0, 270.0, 45.0],
+    "wind_speed": [1.0, 2.5, None, 3.0, 1.0, 0.5],
+}
+
+
+def test_render_compact_selected_fields():
+    lines = render_compact("北京市", "北京市", "朝阳区", COLUMNS, ["temp", "rn1", "wind"]).splitlines()
+    assert lines[0] == "北京市 北京市 朝阳区 逐小时预报"
+    assert lines[1] == "时间|气温℃|降水量mm|风向风速m/s"
+    assert lines[2] == "17日14时|20|-|北1"
+    assert lines[4] == "17日16时|-|1.0mm|-"
+    assert len(lines) == 2 + 6
+
+
+def test_render_compact_defaults_to_columns_with_data():
+    header = render_compact("北京市", "北京市", "朝阳区", COLUMNS).splitlines()[1]
+    assert "降水概率%" not in header and "气温℃" in header
+
+
+def test_limit_hours_keeps_the_leading_hours():
+    limited = limit_hours(COLUMNS, 2)
+    assert limited["fcst_time"] == ["1400", "1500"]
+    assert all(len(values) == 2 for values in limited.values())
+
+
+def test_render_compact_respects_max_chars_and_notes_the_cut():
+    full = render_compact("北京市", "北京市", "朝阳区", COLUMNS, ["temp"])
+    cut = render_compact("北京市", "北京市", "朝阳区", COLUMNS, ["temp"], max_chars=len(full) - 1)
+    assert len(cut) <= len(full) - 1
+    assert cut.splitlines()[-1].startswith("…另有 ")
+
+
+def test_unknown_fields_are_rejected_before_any_fetch(monkeypatch):
+    assert validate_fields(["temp", "wind"]) is None
+    assert "bogus" in validate_fields(["temp", "bogus"])
+
+    async def fetch(*args, **kwargs):
+        raise AssertionError("upstream must not be called")
+
+    monkeypatch.setattr(api, "fetch_ultra_srt_forecast", fetch)
+    monkeypatch.setattr(api, "fetch_vilage_forecast", fetch)
+    monkeypatch.setattr(api, "fetch_combined_forecast", fetch)
+    monkeypatch.setattr(server, "lookup_grid", fetch)
+    for call in (api.get_forecast_api, api.get_vilage_forecast_api, api.get_combined_forecast_api):
+        assert asyncio.run(call("北京市", "北京市", "朝阳区", 60, 127, True, ["bogus"])).startswith("Error: 不支持的字段")
+    for result in (
+        asyncio.run(server.get_forecast_by_name("北京市", "北京市", "朝阳区", True, ["bogus"])),
+        asyncio.run(server.get_forecast_batch([{"province": "北京市", "nx": 60, "ny": 127}], True, ["bogus"])),
+    ):
+        assert result.startswith("Error: 不支持的字段")
@@ -0,0 +1,23 @@
+import asyncio
+
+from utils import gather_limited
+
+
+def test_gather_limited_bounds_concurrency_and_keeps_order():
+    running = 0
+    peak = 0
+
+    async def call(n: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)
+        running -= 1
+        if n == 3:
+            raise ValueError(n)
+        return n * 10
+
+    results = asyncio.run(gather_limited(call, range(6), 2))
+    assert peak == 2
+    assert results[:3] == [0, 10, 20] and results[4:] == [40, 50]
+    assert isinstance(results[3], ValueError)
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import grid_projection
+import server
+from grid_projection import in_grid, latlon_to_grid, project, to_cell
+from location_index import GridBucketIndex, LocationIndex
+
+# 已知网格：与预报服务公布的经纬度 -> 网格对照表一致
+KNOWN_CELLS = [
+    (38.0, 126.0, (43, 136)),          # 投影基准点
+    (37.5665, 126.9780, (60, 127)),    # 首尔
+    (35.1796, 129.0756, (98, 76)),     # 釜山
+    (33.4996, 126.5312, (53, 38)),     # 济州
+]
+
+
+@pytest.mark.parametrize("lat, lon, cell", KNOWN_CELLS)
+def test_projection_matches_known_cells(lat, lon, cell):
+    assert latlon_to_grid(lat, lon) == cell
+    assert in_grid(*cell)
+    xs, ys = project([lat], [lon])
+    assert to_cell(xs[0], ys[0]) == cell
+
+
+def test_vectorized_and_python_projection_agree():
+    pytest.importorskip("numpy")
+    rng = random.Random(7)
+    lats = [rng.uniform(32.0, 39.0) for _ in range(500)]
+    lons = [rng.uniform(124.0, 132.0) for _ in range(500)]
+
+    xs, ys = project(lats, lons)
+    py_xs, py_ys = grid_projection._project_python(lats, lons)
+    assert xs == pytest.approx(py_xs, abs=1e-9)
+    assert ys == pytest.approx(py_ys, abs=1e-9)
+
+
+def test_nearest_matches_linear_scan():
+    rng = random.Random(11)
+    rows = [("p", "c", f"d{i}", rng.randint(1, 149), rng.randint(1, 253)) for i in range(2000)]
+    index = GridBucketIndex(rows)
+
+    for _ in range(300):
+        x, y = rng.uniform(-20, 170), rng.uniform(-20, 270)
+        distance, row_id = min(((r[3] - x) ** 2 + (r[4] - y) ** 2, i) for i, r in enumerate(rows))
+        row, found = index.nearest(x, y)
+        assert row == rows[row_id]
+        assert found == pytest.approx(distance ** 0.5)
+
+
+def test_tool_reports_cell_nearest_district_and_errors(monkeypatch):
+    rows = [("首尔", "首尔", "钟路区", 60, 127), ("釜山", "釜山", "中区", 98, 76)]
+    monkeypatch.setattr(server, "load_location_index", lambda: LocationIndex(rows))
+
+    lines = server.get_grid_by_coordinates([
+        {"lat": 37.5665, "lon": 126.9780},
+        {"lat": 0.0, "lon": 0.0},
+        {"lat": "north"},
+    ]).splitlines()
+
+    assert lines[0].startswith("[1] Lat: 37.5665, Lon: 126.978, Nx: 60, Ny: 127, Nearest(最近地区): 首尔 首尔 钟路区")
+    assert lines[1].endswith("(outside the forecast grid)")
+    assert lines[2].startswith("[3] Error: invalid coordinates")
@@ -0,0 +1,82 @@
+import asyncio
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import api
+import config
+from item_stream import ItemStreamParser
+from stub_upstream import build_vilage_payload
+from resilience import UpstreamError
+
+
+def _payload_bytes() -> bytes:
+    payload = build_vilage_payload(60, 127, "20240101", "0500", days=1)
+    payload["response"]["header"]["resultMsg"] = "정상"  # 多字节字符，便于在字符中间切分
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _parse(data: bytes, size: int) -> tuple[list[dict], dict]:
+    parser = ItemStreamParser()
+    items = []
+    for start in range(0, len(data), size):
+        items.extend(parser.feed(data[start:start + size]))
+    return items, parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 20])
+def test_items_survive_any_chunk_boundary(size):
+    data = _payload_bytes()
+    expected = json.loads(data)
+    items, skeleton = _parse(data, size)
+
+    assert items == expected["response"]["body"]["items"]["item"]
+    assert skeleton["response"]["header"]["resultMsg"] == "정상"
+    assert skeleton["response"]["body"]["items"]["item"] == []
+    assert skeleton["response"]["body"]["totalCount"] == len(items)
+
+
+def test_items_are_delivered_as_soon_as_complete():
+    data = _payload_bytes()
+    first_item_end = data.index(b"}", data.index(b'"item"')) + 1
+    parser = ItemStreamParser()
+
+    assert parser.feed(data[:first_item_end - 1]) == []
+    assert len(parser.feed(data[first_item_end - 1:first_item_end])) == 1
+    assert parser.item_count == 1
+
+
+def test_truncated_response_is_rejected():
+    data = _payload_bytes()
+    parser = ItemStreamParser()
+    parser.feed(data[:len(data) // 2])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_failed_page_cancels_sibling_pages(monkeypatch):
+    monkeypatch.setenv("CN_WEATHER_API_KEY", "test-key")
+    monkeypatch.setattr(api, "_vilage_total_hint", 3 * config.VILAGE_PAGE_SIZE)
+    cancelled = []
+
+    async def fake_stream_items(url: str, on_items) -> dict:
+        page = int(parse_qs(urlparse(url).query)["pageNo"][0])
+        if page == 2:
+            raise UpstreamError("page 2 failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(page)
+            raise
+        return {}
+
+    monkeypatch.setattr(api, "stream_items", fake_stream_items)
+
+    async def run():
+        with pytest.raises(UpstreamError, match="page 2 failed"):
+            await asyncio.wait_for(api.fetch_vilage_forecast(901, 902, allow_stale=False), 5)
+        # 异常传出时其余页已被取消，而不是留到事件循环关闭时
+        assert sorted(cancelled) == [1, 3]
+
+    asyncio.run(run())
@@ -0,0 +1,30 @@
+import server
+from grid_fixture import build_grid_db
+from location_index import LocationIndex
+
+ROWS = [
+    ("北京市", "北京市", "朝阳区东部", 60, 127),
+    ("北京市", "北京市", "朝阳区", 61, 127),
+    ("北京市", "北京市", "海淀区", 59, 128),
+]
+
+
+def test_substring_lookup_uses_index_from_first_query():
+    index = LocationIndex(ROWS)
+    assert "区" in index.fields[2].gram_values
+    assert index.find("北京", "北京", "海淀") == [ROWS[2]]
+    assert index.find("北京", "北京", "区", limit=1) == [ROWS[0]]
+    assert index.find("北京", "北京", "不存在") == []
+
+
+def test_index_and_sqlite_fallback_resolve_the_same_row(tmp_path, monkeypatch):
+    db = build_grid_db(tmp_path / "weather_grid.db", ROWS)
+    monkeypatch.setattr(server, "DB_PATH", db)
+    monkeypatch.setattr(server, "location_index", None)
+    monkeypatch.setattr(server, "_location_index_attempted", True)
+    index = LocationIndex.from_sqlite(db)
+
+    # 精确匹配优先于 id 更小的子串匹配行
+    for query in [("北京市", "北京市", "朝阳区"), ("北京", "北京", "朝阳"), ("北京", "北京", "不存在")]:
+        assert server.lookup_grid(*query) == index.lookup(*query)
+    assert server.lookup_grid("北京市", "北京市", "朝阳区") == ROWS[1]
@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import migrate
+from location_search import FTS_TABLE
+
+HEADER = "省份,城市,区县,网格X,网格Y\n"
+ROWS = [
+    "北京市,北京市,朝阳区,61,127",
+    "北京市,北京市,海淀区,59,128",
+    "上海市,上海市,浦东新区,62,125",
+]
+
+
+def _write_csv(path, rows):
+    path.write_text(HEADER + "\n".join(rows) + "\n", encoding="utf-8-sig")
+    return path
+
+
+def _grid(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute("SELECT id, district, grid_x, grid_y, row_hash FROM weather_grid ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def _fts_available():
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(x, tokenize = 'trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def test_incremental_import_only_writes_changed_rows(tmp_path):
+    db = tmp_path / "weather_grid.db"
+    assert migrate.migrate_to_sqlite(_write_csv(tmp_path / "v1.csv", ROWS), db) == 3
+    before = _grid(db)
+
+    changed = [ROWS[0], "北京市,北京市,海淀区,60,128", ROWS[2], "天津市,天津市,和平区,60,125", "天津市,,河西区,1,1"]
+    assert migrate.migrate_to_sqlite(_write_csv(tmp_path / "v2.csv", changed), db, incremental=True) == 2
+
+    after = _grid(db)
+    # 未变化的行保持原样，变化的行原地更新（id 不变），新行追加，无效行跳过
+    assert after[0] == before[0] and after[2] == before[2]
+    assert after[1][:4] == (before[1][0], "海淀区", 60, 128)
+    assert after[1][4] == migrate.row_hash(("北京市", "北京市", "海淀区", 60, 128))
+    assert [row[1] for row in after] == ["朝阳区", "海淀区", "浦东新区", "和平区"]
+
+    assert migrate.migrate_to_sqlite(tmp_path / "v2.csv", db, incremental=True) == 0
+    assert _grid(db) == after
+
+
+@pytest.mark.skipif(not _fts_available(), reason="SQLite 不支持 FTS5 trigram")
+def test_incremental_import_rebuilds_missing_search_index(tmp_path):
+    db = tmp_path / "weather_grid.db"
+    source = _write_csv(tmp_path / "grid.csv", ROWS)
+    migrate.migrate_to_sqlite(source, db)
+
+    conn = sqlite3.connect(db)
+    conn.execute(f"DROP TABLE {FTS_TABLE}")
+    conn.commit()
+    conn.close()
+
+    assert migrate.migrate_to_sqlite(source, db, incremental=True) == 0
+    conn = sqlite3.connect(db)
+    try:
+        assert migrate.table_exists(conn, FTS_TABLE)
+        assert conn.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}").fetchone()[0] == len(ROWS)
+    finally:
+        conn.close()
@@ -0,0 +1,31 @@
+import asyncio
+
+import config
+import logs
+import server
+
+
+def _started_prewarmer(monkeypatch, enabled):
+    monkeypatch.setattr(config, "PREWARM_ENABLED", enabled)
+    monkeypatch.setattr(config, "ARCHIVE_ENABLED", False)
+    monkeypatch.setattr(config, "METRICS_PORT", None)
+    monkeypatch.setattr(config, "LOG_FILE", "")
+    monkeypatch.setattr(config, "LOG_STDERR", False)
+
+    async def scenario():
+        resources = await server._start_resources()
+        try:
+            return resources["prewarmer"]
+        finally:
+            await server._stop_resources(resources)
+            logs.shutdown_logging()
+
+    return asyncio.run(scenario())
+
+
+def test_stdio_sessions_do_not_prewarm_by_default(monkeypatch):
+    assert _started_prewarmer(monkeypatch, None) is None
+
+
+def test_prewarm_runs_when_enabled(monkeypatch):
+    assert _started_prewarmer(monkeypatch, True) is not None
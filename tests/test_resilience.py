@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+import config
+import utils
+from resilience import CircuitBreaker, RateLimitedError, TokenBucket, TransientUpstreamError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    """已打开并过了冷却期的熔断器：下一个请求是半开探测"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 31.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    monkeypatch.setattr(utils, "upstream_breaker", breaker)
+    return breaker
+
+
+def _empty_limiter(rate: float) -> TokenBucket:
+    limiter = TokenBucket(rate, 1.0)
+    limiter._tokens = 0.0
+    return limiter
+
+
+async def _ok(timeout: float) -> str:
+    return "ok"
+
+
+def test_rate_limited_probe_releases_half_open_slot(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(utils, "upstream_limiter", _empty_limiter(rate=0.001))
+
+    with pytest.raises(RateLimitedError):
+        asyncio.run(utils._call_upstream(_ok, "test"))
+
+    # 探测没有发出：熔断器仍为半开，并允许下一个请求探测
+    assert half_open_breaker.state == CircuitBreaker.HALF_OPEN
+    monkeypatch.setattr(utils, "upstream_limiter", TokenBucket(100.0, 10.0))
+    assert asyncio.run(utils._call_upstream(_ok, "test")) == "ok"
+    assert half_open_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_releases_half_open_slot(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(utils, "upstream_limiter", _empty_limiter(rate=0.1))
+    monkeypatch.setattr(config, "API_RATE_LIMIT_MAX_WAIT", 60.0)
+
+    async def cancel_while_waiting():
+        task = asyncio.create_task(utils._call_upstream(_ok, "test"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_waiting())
+
+    assert half_open_breaker.state == CircuitBreaker.HALF_OPEN
+    assert half_open_breaker.allow()
+
+
+def test_failed_probe_reopens(half_open_breaker, monkeypatch):
+    monkeypatch.setattr(utils, "upstream_limiter", TokenBucket(100.0, 10.0))
+
+    async def fail(timeout: float):
+        raise TransientUpstreamError("503")
+
+    with pytest.raises(Exception):
+        asyncio.run(utils._call_upstream(fail, "test"))
+    assert half_open_breaker.state == CircuitBreaker.OPEN
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import main
+from grid_fixture import build_grid_db
+
+ROWS = [
+    ("北京市", "北京市", "朝阳区", 61, 127),
+    ("北京市", "北京市", "海淀区", 59, 128),
+    ("上海市", "上海市", "浦东新区", 62, 125),
+]
+
+
+@pytest.fixture
+def grid_db(tmp_path):
+    return build_grid_db(tmp_path / "weather_grid.db", ROWS)
+
+
+def test_resolve_batch_keeps_input_order_and_misses(grid_db):
+    conn = sqlite3.connect(grid_db)
+    try:
+        queries = [ROWS[2][:3], ("北京市", "北京市", "不存在"), ROWS[0][:3], ROWS[0][:3]]
+        assert main.resolve_batch(conn, queries) == [(62, 125), None, (61, 127), (61, 127)]
+        # 临时表在批次之间复用，上一批的行不会混入
+        assert main.resolve_batch(conn, [ROWS[1][:3]]) == [(59, 128)]
+        assert main.resolve_batch(conn, []) == []
+    finally:
+        conn.close()
+
+
+def test_resolve_locations_batches_and_strips_names(grid_db):
+    rows = [(" 北京市", "北京市 ", "海淀区", "extra"), ("北京市", None, "朝阳区")] + [r[:3] for r in ROWS]
+    results = list(main.resolve_locations(rows, grid_db, batch_size=2))
+
+    assert [row for row, _ in results] == rows
+    assert [grid for _, grid in results] == [(59, 128), None, (61, 127), (59, 128), (62, 125)]
+
+
+def test_resolve_csv_appends_grid_columns(grid_db, tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text("id,省份,城市,区县\n1,北京市,北京市,朝阳区\n2,北京市,北京市,不存在\n", encoding="utf-8-sig")
+    output = tmp_path / "out.csv"
+
+    total, resolved, _ = main.resolve_csv(source, output, grid_db)
+
+    assert (total, resolved) == (2, 1)
+    assert output.read_text(encoding="utf-8").splitlines() == [
+        "id,省份,城市,区县,网格X,网格Y",
+        "1,北京市,北京市,朝阳区,61,127",
+        "2,北京市,北京市,不存在,,",
+    ]
+
+
+def test_missing_database_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(main.resolve_locations([ROWS[0][:3]], tmp_path / "missing.db"))
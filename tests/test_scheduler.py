@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime
+
+from scheduler import IssuanceScheduler
+
+
+class CountingScheduler(IssuanceScheduler):
+    def __init__(self, start_delay=None):
+        super().__init__(jitter=0, start_delay=start_delay)
+        self.cycles = 0
+
+    def seconds_until_next_cycle(self, now=None) -> float:
+        return 0
+
+    async def run_cycle(self) -> None:
+        self.cycles += 1
+        if self.cycles == 1:
+            raise RuntimeError("first cycle fails")
+
+
+def test_next_cycle_is_aligned_to_the_next_issuance():
+    scheduler = IssuanceScheduler(jitter=0)
+    # 超短期预报每小时 45 分发布
+    assert scheduler.seconds_until_next_cycle(datetime(2026, 10, 17, 13, 40)) == 5 * 60
+    assert scheduler.seconds_until_next_cycle(datetime(2026, 10, 17, 13, 50)) == 55 * 60
+
+
+def test_failed_cycles_do_not_stop_the_task():
+    async def scenario():
+        scheduler = CountingScheduler(start_delay=0)
+        scheduler.start()
+        for _ in range(20):
+            await asyncio.sleep(0)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.cycles > 1
+    assert scheduler._task is None
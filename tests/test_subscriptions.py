@@ -0,0 +1,53 @@
+import asyncio
+import gc
+from datetime import datetime
+
+import config
+import subscriptions
+from subscriptions import ForecastSubscriptions
+
+
+class FakeSession:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def send_notification(self, notification) -> None:
+        if self.fail:
+            raise ConnectionError("closed")
+
+
+def test_cells_without_sessions_are_pruned(monkeypatch):
+    fetched = []
+
+    async def fetch(nx, ny, track=True, allow_stale=True):
+        fetched.append((nx, ny))
+        raise RuntimeError("no upstream")
+
+    monkeypatch.setattr(subscriptions, "fetch_ultra_srt_forecast", fetch)
+    monkeypatch.setattr(config, "SUBSCRIPTION_MAX_CELLS", 1)
+    subs = ForecastSubscriptions()
+
+    async def scenario():
+        session = FakeSession()
+        await subs.subscribe((1, 1), session)
+        # 会话断开（被回收）后网格不再刷新，也不再占用订阅名额
+        del session
+        gc.collect()
+        fetched.clear()
+        await subs.refresh_all()
+        assert fetched == []
+        assert subs.cells == {}
+        await subs.subscribe((2, 2), FakeSession())
+
+    asyncio.run(scenario())
+
+
+def test_notify_drops_cell_when_last_session_fails():
+    subs = ForecastSubscriptions()
+    state = subs.cells[(1, 1)] = subscriptions.CellSubscription()
+    session = FakeSession(fail=True)
+    state.sessions.add(session)
+    state.issued_at = datetime(2026, 10, 17, 12, 30)
+
+    asyncio.run(subs.notify((1, 1), state, []))
+    assert (1, 1) not in subs.cells
@@ -0,0 +1,55 @@
+from archive import PRODUCT_ULTRA_SRT, PRODUCT_ULTRA_SRT_NCST, PRODUCT_VILAGE
+from timeline import TIMELINE_COLUMNS, merge_timeline
+
+
+def _columns(rows: list[dict]) -> dict[str, list]:
+    names = {name for row in rows for name in row}
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def test_finer_product_wins_and_coarser_fills_gaps():
+    timeline = merge_timeline({
+        PRODUCT_VILAGE: _columns([
+            {"fcst_date": "20240101", "fcst_time": "1400", "temp": 5.0, "sky": "3", "pop": 30.0},
+            {"fcst_date": "20240101", "fcst_time": "1500", "temp": 6.0, "sky": "4", "pop": 60.0},
+        ]),
+        PRODUCT_ULTRA_SRT: _columns([
+            {"fcst_date": "20240101", "fcst_time": "1400", "temp": 4.0, "sky": "1", "pop": None},
+        ]),
+    })
+
+    assert set(timeline) == set(TIMELINE_COLUMNS)
+    assert timeline["fcst_time"] == ["1400", "1500"]
+    assert timeline["temp"] == [4.0, 6.0]
+    assert timeline["sky"] == ["1", "4"]
+    # 超短期预报没有降水概率，由短期预报补齐
+    assert timeline["pop"] == [30.0, 60.0]
+    assert timeline["source"] == [PRODUCT_ULTRA_SRT, PRODUCT_VILAGE]
+
+
+def test_forecasts_before_the_observation_are_dropped():
+    timeline = merge_timeline({
+        PRODUCT_ULTRA_SRT_NCST: _columns([
+            {"fcst_date": "20240101", "fcst_time": "1300", "temp": 3.5},
+        ]),
+        PRODUCT_VILAGE: _columns([
+            {"fcst_date": "20240101", "fcst_time": "1200", "temp": 2.0, "sky": "1"},
+            {"fcst_date": "20240101", "fcst_time": "1300", "temp": 3.0, "sky": "3"},
+            {"fcst_date": "20240102", "fcst_time": "0000", "temp": 1.0, "sky": "4"},
+        ]),
+    })
+
+    assert list(zip(timeline["fcst_date"], timeline["fcst_time"])) == [("20240101", "1300"), ("20240102", "0000")]
+    assert timeline["temp"] == [3.5, 1.0]
+    # 实况没有天空状况
+    assert timeline["sky"] == ["3", "4"]
+    assert timeline["source"] == [PRODUCT_ULTRA_SRT_NCST, PRODUCT_VILAGE]
+
+
+def test_empty_observation_keeps_all_forecasts():
+    timeline = merge_timeline({
+        PRODUCT_ULTRA_SRT_NCST: {"fcst_date": [], "fcst_time": []},
+        PRODUCT_VILAGE: _columns([{"fcst_date": "20240101", "fcst_time": "1200", "temp": 2.0}]),
+    })
+    assert timeline["fcst_time"] == ["1200"]
+    assert timeline["source"] == [PRODUCT_VILAGE]
@@ -0,0 +1,57 @@
+from archive import PRODUCT_ULTRA_SRT, PRODUCT_ULTRA_SRT_NCST, PRODUCT_VILAGE
+from decoder import FORECAST_COLUMNS
+
+# 合并时的优先级：时间粒度越细、越接近当前的产品越优先（实况 > 超短期预报 > 短期预报）
+TIMELINE_PRECEDENCE = (PRODUCT_ULTRA_SRT_NCST, PRODUCT_ULTRA_SRT, PRODUCT_VILAGE)
+
+# 时间线中各行数据来源的中文名称
+SOURCE_LABELS = {
+    PRODUCT_ULTRA_SRT_NCST: "实况",
+    PRODUCT_ULTRA_SRT: "超短期预报",
+    PRODUCT_VILAGE: "短期预报",
+}
+
+# 合并后的列：各产品的预报列加上每行的数据来源
+TIMELINE_COLUMNS = FORECAST_COLUMNS + ("source",)
+
+_VALUE_COLUMNS = tuple(name for name in FORECAST_COLUMNS if name not in ("fcst_date", "fcst_time"))
+
+
+def merge_timeline(products: dict[str, dict[str, list]]) -> dict[str, list]:
+    """把多个产品按列存放的数据合并为一条按时间排序、每个时刻一行的时间线
+
+    同一时刻出现在多个产品中时，按 TIMELINE_PRECEDENCE 取优先级最高的产品的取值，
+    该产品缺少的字段（如超短期预报没有降水概率、实况没有天空状况）再由次一级的产品补齐；
+    source 列记录该行的主要来源。有实况时，早于观测时刻的预报已经过时，不再列出。
+
+    Args:
+        products: 产品标识 -> 按列存放的数据（decoder.DecodedForecast.to_columns() 的格式）
+
+    Returns:
+        dict: TIMELINE_COLUMNS 中的各列，等长
+    """
+    rows: dict[tuple[str, str], dict] = {}
+    for product in sorted(products, key=TIMELINE_PRECEDENCE.index):
+        columns = products[product]
+        for i, (fcst_date, fcst_time) in enumerate(zip(columns['fcst_date'], columns['fcst_time'])):
+            row = rows.get((fcst_date, fcst_time))
+            if row is None:
+                rows[(fcst_date, fcst_time)] = row = {'source': product}
+            for name in _VALUE_COLUMNS:
+                values = columns.get(name)
+                if values is not None and values[i] is not None and row.get(name) is None:
+                    row[name] = values[i]
+
+    observed = products.get(PRODUCT_ULTRA_SRT_NCST)
+    start = min(zip(observed['fcst_date'], observed['fcst_time'])) if observed and observed['fcst_time'] else None
+    keys = sorted(key for key in rows if start is None or key >= start)
+
+    timeline = {name: [] for name in TIMELINE_COLUMNS}
+    for key in keys:
+        row = rows[key]
+        timeline['fcst_date'].append(key[0])
+        timeline['fcst_time'].append(key[1])
+        for name in _VALUE_COLUMNS:
+            timeline[name].append(row.get(name))
+        timeline['source'].append(row['source'])
+    return timeline
@@ -1,19 +1,260 @@
+import asyncio
+import time
 import httpx
-from typing import Any
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
+from urllib.parse import urlsplit
+
+import config
+import logs
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitedError,
+    TokenBucket,
+    TransientUpstreamError,
+    UpstreamError,
+    backoff_delay,
+)
+from item_stream import ItemStreamParser
+from metrics import metrics
 
 USER_AGENT = "cn-weather-app/1.0"
 
-async def make_api_request(url: str) -> dict[str, Any] | None:
-    """Make a request to the API with proper error handling."""
+logger = logs.get_logger("utils")
+
+# 由服务器生命周期托管的共享连接池客户端（未设置时退化为单次请求客户端）
+_shared_client: httpx.AsyncClient | None = None
+_client_factory: Callable[[], httpx.AsyncClient] | None = None
+
+# 上游调用的速率限制与熔断器（进程内所有请求共用）
+upstream_limiter = TokenBucket(config.API_RATE_LIMIT_PER_SECOND, config.API_RATE_LIMIT_BURST)
+upstream_breaker = CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT)
+metrics.register_collector(
+    "upstream", lambda: {"circuit_open": int(upstream_breaker.state != CircuitBreaker.CLOSED)}
+)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """创建带 keep-alive 连接池的长生命周期 HTTP 客户端"""
+    http2 = config.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("未安装 h2 依赖，HTTP/2 已禁用，回退到 HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT, "Accept": "application/json"},
+        limits=limits,
+        http2=http2,
+        timeout=config.REQUEST_TIMEOUT,
+    )
+
+
+def set_shared_client(client: httpx.AsyncClient | None) -> None:
+    """注册（或清除）供 make_api_request 复用的共享客户端"""
+    global _shared_client
+    _shared_client = client
+
+
+def set_shared_client_factory(factory: Callable[[], httpx.AsyncClient] | None) -> None:
+    """登记（或清除）共享客户端的工厂：未注册共享客户端时，首次请求上游才用它创建
+
+    httpx 传输层与 SSL 上下文的初始化约需 0.2 秒，只解析地名的会话不必付出这部分启动开销。
+    """
+    global _client_factory
+    _client_factory = factory
+
+
+def get_shared_client() -> httpx.AsyncClient | None:
+    """返回当前注册的共享客户端"""
+    return _shared_client
+
+
+T = TypeVar("T")
+A = TypeVar("A")
+
+
+def _check_status(response: httpx.Response) -> None:
+    """429 / 5xx 抛出可重试错误，其余非 2xx 状态抛出 UpstreamError"""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TransientUpstreamError(f"HTTP {response.status_code}")
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise UpstreamError(str(e)) from e
+
+
+async def _get_json(client: httpx.AsyncClient, url: str, headers: dict | None = None,
+                    timeout: float = config.REQUEST_TIMEOUT) -> dict[str, Any]:
+    """使用给定客户端发送 GET 请求并解析 JSON，临时性错误抛出 TransientUpstreamError"""
+    try:
+        response = await client.get(url, headers=headers, timeout=timeout)
+    except httpx.TransportError as e:
+        # 超时、连接失败等网络层错误
+        raise TransientUpstreamError(f"{type(e).__name__}: {e}") from e
+
+    _check_status(response)
+    metrics.inc("upstream_response_bytes_total", len(response.content), endpoint=_endpoint(url))
+    try:
+        return response.json()
+    except ValueError as e:
+        raise UpstreamError(str(e)) from e
+
+
+async def _stream_items(client: httpx.AsyncClient, url: str, on_items: Callable[[list[dict]], None],
+                        headers: dict | None = None, timeout: float = config.REQUEST_TIMEOUT) -> dict[str, Any]:
+    """流式接收响应，边到达边解析预报条目并交给 on_items，返回去掉条目后的响应骨架"""
+    parser = ItemStreamParser()
+    received = 0
+    try:
+        async with client.stream("GET", url, headers=headers, timeout=timeout) as response:
+            _check_status(response)
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                items = parser.feed(chunk)
+                if items:
+                    on_items(items)
+    except httpx.TransportError as e:
+        raise TransientUpstreamError(f"{type(e).__name__}: {e}") from e
+    finally:
+        metrics.inc("upstream_response_bytes_total", received, endpoint=_endpoint(url))
+    try:
+        return parser.close()
+    except ValueError as e:
+        raise UpstreamError(str(e)) from e
+
+
+async def _with_client(call: Callable[[httpx.AsyncClient, dict | None], Awaitable[T]]) -> T:
+    if _shared_client is None and _client_factory is not None:
+        set_shared_client(_client_factory())
+    if _shared_client is not None:
+        return await call(_shared_client, None)
+
+    # 未在服务器中运行（如直接执行 api.py）时，使用一次性客户端
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/json"
     }
     async with httpx.AsyncClient() as client:
+        return await call(client, headers)
+
+
+def _endpoint(url: str) -> str:
+    """指标标签用的接口名（URL 路径的最后一段，如 getUltraSrtFcst）"""
+    return urlsplit(url).path.rsplit("/", 1)[-1]
+
+
+async def _call_upstream(attempt_once: Callable[[float], Awaitable[T]], endpoint: str) -> T:
+    """以速率限制、重试与熔断保护执行一次上游调用，attempt_once 接收本次尝试的超时时间
+
+    Raises:
+        CircuitOpenError: 熔断器打开，未发出请求
+        RateLimitedError: 在允许的等待时间内没有可用令牌
+        UpstreamError: 重试耗尽或遇到不可重试的错误
+    """
+    deadline = time.monotonic() + config.RETRY_TOTAL_DEADLINE
+    attempt = 0
+    while True:
+        if not upstream_breaker.allow():
+            metrics.inc("upstream_rejected_total", endpoint=endpoint, reason="circuit_open")
+            raise CircuitOpenError(f"上游服务暂不可用（熔断中，{upstream_breaker.retry_after():.0f} 秒后重试）")
+        # 半开状态下 allow() 放行的是唯一的探测请求；探测既未成功也未失败（被限速、取消或抛出
+        # 其他异常）时必须交还探测名额，否则熔断器会一直停在半开状态拒绝所有请求
+        probe = upstream_breaker.state == CircuitBreaker.HALF_OPEN
+        settled = False
         try:
-            response = await client.get(url, headers=headers, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"API 请求错误: {e}")
-            return None
\ No newline at end of file
+            try:
+                await upstream_limiter.acquire(config.API_RATE_LIMIT_MAX_WAIT)
+            except RateLimitedError:
+                metrics.inc("upstream_rejected_total", endpoint=endpoint, reason="rate_limited")
+                raise
+            remaining = deadline - time.monotonic()
+            start = time.perf_counter()
+            try:
+                data = await attempt_once(max(0.1, min(config.REQUEST_TIMEOUT, remaining)))
+            except TransientUpstreamError as e:
+                metrics.observe("upstream_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+                metrics.inc("upstream_requests_total", endpoint=endpoint, outcome="transient_error")
+                upstream_breaker.record_failure()
+                settled = True
+                attempt += 1
+                delay = backoff_delay(attempt - 1, config.RETRY_BACKOFF_BASE, config.RETRY_BACKOFF_MAX)
+                if attempt >= config.RETRY_MAX_ATTEMPTS or time.monotonic() + delay >= deadline:
+                    raise UpstreamError(f"上游请求失败（已尝试 {attempt} 次）: {e}") from e
+                # 上游故障时每个请求都会重试，按接口采样
+                logger.warning("API 请求临时性错误，稍后重试",
+                               extra={"endpoint": endpoint, "attempt": attempt, "delay_s": round(delay, 2),
+                                      "error": str(e), "sample_key": f"retry:{endpoint}"})
+                metrics.inc("upstream_retries_total", endpoint=endpoint)
+                await asyncio.sleep(delay)
+                continue
+            except UpstreamError:
+                metrics.observe("upstream_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+                metrics.inc("upstream_requests_total", endpoint=endpoint, outcome="error")
+                upstream_breaker.record_failure()
+                settled = True
+                raise
+
+            metrics.observe("upstream_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+            metrics.inc("upstream_requests_total", endpoint=endpoint, outcome="ok")
+            upstream_breaker.record_success()
+            settled = True
+            return data
+        finally:
+            if probe and not settled:
+                upstream_breaker.release_probe()
+
+
+async def request_json(url: str) -> dict[str, Any]:
+    """经速率限制、重试与熔断保护请求上游接口并解析 JSON"""
+    return await _call_upstream(
+        lambda timeout: _with_client(lambda client, headers: _get_json(client, url, headers, timeout)),
+        _endpoint(url),
+    )
+
+
+async def stream_items(url: str, on_items: Callable[[list[dict]], None]) -> dict[str, Any]:
+    """经速率限制、重试与熔断保护流式请求上游接口
+
+    预报条目在到达时即交给 on_items，不保留完整响应；重试时已交付的条目会再次交付，
+    on_items 需要能处理重复条目。
+
+    Returns:
+        dict: 去掉条目数组的响应骨架（header、totalCount 等）
+    """
+    return await _call_upstream(
+        lambda timeout: _with_client(lambda client, headers: _stream_items(client, url, on_items, headers, timeout)),
+        _endpoint(url),
+    )
+
+
+async def make_api_request(url: str) -> dict[str, Any] | None:
+    """Make a request to the API with proper error handling."""
+    try:
+        return await request_json(url)
+    except UpstreamError as e:
+        # url 含服务密钥，只记录接口名
+        logger.error("API 请求错误", extra={"endpoint": _endpoint(url), "error": str(e)})
+        return None
+
+
+async def gather_limited(call: Callable[[A], Awaitable[T]], args: Iterable[A], limit: int) -> list[T | BaseException]:
+    """对每个参数调用 call，同时进行的调用不超过 limit 个
+
+    Returns:
+        list: 按 args 顺序排列的结果；调用出错时对应位置为其异常（同 gather(return_exceptions=True)）
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(arg: A) -> T:
+        async with semaphore:
+            return await call(arg)
+
+    return await asyncio.gather(*(bounded(arg) for arg in args), return_exceptions=True)